@@ -1,17 +1,28 @@
-import time
 import signal
 import os
-import sqlite3
+import asyncio
+import uvicorn
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from src.channels.telegram import TelegramChannel
 from src.agents.personal_assistant import PersonalAssistant
+from src.db import connect
+from src.inbox import Inbox
+from src.runtime import AssistantRuntime, create_channel
+from src.sharding import HashRing, launched_worker_processes
+from src.webhooks import create_webhook_app
 
 # Load .env variables
 load_dotenv()
 
-# Clean up any old OAuth tokens to ensure a fresh auth flow
+# Started by launcher.py, this process only receives messages (polling or webhooks) and the
+# worker processes (started with WORKER_INDEX) answer them. Run on its own, it does both.
+WORKER_PROCESSES = launched_worker_processes()
+WORKER_INDEX = os.getenv("WORKER_INDEX")
+FRONT_END_ONLY = WORKER_PROCESSES > 0 and WORKER_INDEX is None
+
+# Clean up any old OAuth tokens to ensure a fresh auth flow (worker processes share the front-end's state)
 token_path = "token.json"
-if os.path.exists(token_path):
+if WORKER_INDEX is None and os.path.exists(token_path):
     try:
         os.remove(token_path)
         print(f"Removed existing token file to force fresh authentication")
@@ -23,95 +34,104 @@ os.makedirs("db", exist_ok=True)
 
 # Clear any existing database
 db_path = "db/checkpoints.sqlite"
-if os.path.exists(db_path):
+if WORKER_INDEX is None and os.path.exists(db_path):
     try:
         os.remove(db_path)
         print(f"Removed existing database: {db_path}")
     except Exception as e:
         print(f"Error removing existing database: {e}")
 
-# Initialize fresh sqlite3 DB for saving agent memory
-conn = sqlite3.connect(db_path, check_same_thread=False)
-print(f"Created new database connection: {db_path}")
+# Initialize fresh sqlite3 DB for saving agent memory (only used where messages are answered)
+conn = None
+if not FRONT_END_ONLY:
+    conn = connect(db_path)
+    print(f"Created new database connection: {db_path}")
+
+# Channels served together, e.g. "telegram,slack,whatsapp" (CHANNEL is the single-channel setting of older .env files)
+CHANNELS = [name.strip() for name in os.getenv("CHANNELS", os.getenv("CHANNEL", "telegram")).split(",") if name.strip()]
 
-# Use telegram for communicating with the agent
-telegram = TelegramChannel()
-# Use Slack for communicating with the agent
-# slack = SlackChannel()
+# Received messages are stored in the durable inbox until they are answered,
+# each conversation is assigned to one worker process by the hash ring
+inbox = Inbox(ring=HashRing(range(WORKER_PROCESSES)) if WORKER_PROCESSES > 0 else None)
+
+# Initiate personal assistant
+personal_assistant = None if FRONT_END_ONLY else PersonalAssistant(conn)
 
-# Configuration for the Langgraph checkpoints, specifying thread ID
-config = {"configurable": {"thread_id": "1"}}
+# One runtime for all channels: shared assistant, inbox, dispatcher and workers
+runtime = AssistantRuntime(
+    [create_channel(name) for name in CHANNELS],
+    inbox,
+    personal_assistant,
+    db_path,
+    workers=int(os.getenv("WEBHOOK_WORKERS", "4")),
+    max_queue=int(os.getenv("WEBHOOK_MAX_QUEUE", "100")),
+    # Messages of a conversation arriving within this window are answered in one turn (0 = disabled)
+    debounce=float(os.getenv("DEBOUNCE_SECONDS", "0")),
+    debounce_max_wait=float(os.getenv("DEBOUNCE_MAX_WAIT", "10")),
+    metrics_log_interval=int(os.getenv("METRICS_LOG_INTERVAL", "0"))
+)
 
-# Flag to track if cleanup has been done
-cleanup_completed = False
+# WhatsApp and Telegram in webhook mode receive their messages through the FastAPI server
+telegram = runtime.channels.get("telegram")
+NEEDS_SERVER = "whatsapp" in runtime.channels or (telegram is not None and telegram.mode == "webhook")
 
-def cleanup_and_exit():
-    """Handle cleanup and exit gracefully"""
-    global cleanup_completed
-    if not cleanup_completed:
+@asynccontextmanager
+async def session(app=None):
+    """Run the runtime, saying goodbye on the chat channels before they are closed"""
+    async with runtime.run():
+        print(f"Personal Assistant Manager is running on {', '.join(CHANNELS)}")
         try:
-            print("\nCleaning up and exiting...")
-            # Send goodbye message
-            telegram.send_message("👋 Goodbye! Session ended.")
-            # Close database connection
-            if conn:
-                conn.close()
-                print("Database connection closed")
-            cleanup_completed = True
-        except Exception as e:
-            print(f"Error during cleanup: {e}")
+            yield
         finally:
-            exit(0)
+            await cleanup()
 
-def signal_handler(signum, frame):
-    """Handle signal interrupts"""
-    print("\nSignal received, ending session...")
-    cleanup_and_exit()
+async def main():
+    """Run the channels and the workers on one event loop until a signal is received"""
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
 
-# Register signal handlers
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
+    async with session():
+        await stop.wait()
+        print("\nSignal received, ending session...")
 
-# Initiate personal assistant
-personal_assistant = PersonalAssistant(conn)
+async def cleanup():
+    """Handle cleanup gracefully"""
+    try:
+        print("\nCleaning up and exiting...")
+        # Send goodbye message (WhatsApp answers need a recipient, so only the chat channels get one)
+        for name in ("telegram", "slack"):
+            if name in runtime.channels:
+                await runtime.dispatcher.dispatch(name, "👋 Goodbye! Session ended.")
+    except Exception as e:
+        print(f"Error during cleanup: {e}")
 
-def monitor_channel(after_timestamp, config):
-    print("Starting to monitor messages...")
-    
-    while True:
-        try:
-            new_messages = telegram.receive_messages(after_timestamp)
-            
-            if new_messages:
-                for message in new_messages:                    
-                    # Process message
-                    print(f"\nProcessing message: {message['text']}")
-                    sent_message = (
-                        f"Message: {message['text']}\n"
-                        f"Current Date/time: {message['date']}"
-                    )
-                    
-                    # Invoke personal assistant and get response
-                    try:
-                        answer = personal_assistant.invoke(sent_message, config=config)
-                        print(f"Sending response: {answer[:100]}...")
-                        telegram.send_message(answer)
-                    except Exception as e:
-                        error_msg = f"Error processing message: {str(e)}"
-                        print(error_msg)
-                        telegram.send_message(f"Sorry, I encountered an error: {str(e)}")
-            
-            after_timestamp = int(time.time())
-            time.sleep(1)  # Check more frequently with shorter sleep
-            
-        except Exception as e:
-            print(f"Error in monitor_channel: {str(e)}")
-            time.sleep(1)
+def close_databases():
+    # Close database connections
+    inbox.close()
+    if conn:
+        conn.close()
+        print("Database connection closed")
 
-if __name__ == "__main__":
-    print("Personal Assistant Manager is running")
+def serve():
+    """Run the channels until a signal is received (also the front-end started by launcher.py)"""
     try:
-        monitor_channel(int(time.time()), config)
+        if NEEDS_SERVER:
+            # The server runs the session for its lifetime and handles the signals
+            uvicorn.run(create_webhook_app(runtime, lifespan=session), host="0.0.0.0", port=int(os.getenv("PORT", "5000")))
+        else:
+            asyncio.run(main())
     except Exception as e:
         print(f"Fatal error: {str(e)}")
-        cleanup_and_exit()
\ No newline at end of file
+    finally:
+        close_databases()
+
+if __name__ == "__main__":
+    if WORKER_INDEX is not None:
+        try:
+            asyncio.run(runtime.run_worker(int(WORKER_INDEX)))
+        finally:
+            close_databases()
+    else:
+        serve()
@@ -1,67 +1,67 @@
+import os
 import uvicorn
 import asyncio
-import sqlite3
-from fastapi import FastAPI, Form
 from dotenv import load_dotenv
-from src.channels.whatsapp import WhatsAppChannel
 from src.agents.personal_assistant import PersonalAssistant
-from src.utils import get_current_date_time
+from src.db import connect
+from src.inbox import Inbox
+from src.runtime import AssistantRuntime, create_channel
+from src.sharding import HashRing, launched_worker_processes
+from src.webhooks import create_webhook_app
 
 # Load .env variables from the environment file
 load_dotenv()
 
-# Initiate FastAPI app
-app = FastAPI()
+db_path = "db/checkpoints.sqlite"
+os.makedirs("db", exist_ok=True)
+
+# Started by launcher.py, this process only receives messages and the worker processes
+# (started with WORKER_INDEX) answer them. Run on its own, it answers them itself.
+WORKER_PROCESSES = launched_worker_processes()
+WORKER_INDEX = os.getenv("WORKER_INDEX")
+FRONT_END_ONLY = WORKER_PROCESSES > 0 and WORKER_INDEX is None
 
 # Initialize sqlite3 DB for saving agent memory
-conn = sqlite3.connect("db/checkpoints.sqlite", check_same_thread=False)
+conn = None if FRONT_END_ONLY else connect(db_path)
 
 # Initiate personal assistant instance
-personal_assistant = PersonalAssistant(conn)
-
-# Configuration for the Langgraph agent, specifying thread ID
-config = {"configurable": {"thread_id": "1"}}
+personal_assistant = None if FRONT_END_ONLY else PersonalAssistant(conn)
 
-async def process_message_async(to_whatsapp_number, incoming_message):
-    """
-    Processes the incoming message asynchronously:
-    1. Formats the message with the current date and time.
-    2. Invokes the personal assistant to get a response.
-    3. Sends the response to the provided WhatsApp number.
-    """
-    # Format the message with current date/time
-    message = (
-        f"Message: {incoming_message}\n"
-        f"Current Date/time: {get_current_date_time()}"
-    )
-    
-    # Invoke the personal assistant to generate a response
-    answer = personal_assistant.invoke(message, config=config)
+# WhatsApp, plus Telegram when its updates are pushed to /telegram/webhook (TELEGRAM_MODE="webhook")
+CHANNELS = ["whatsapp", "telegram"] if os.getenv("TELEGRAM_MODE", "polling") == "webhook" else ["whatsapp"]
 
-    # Send the response via Twilio WhatsApp
-    whatsapp = WhatsAppChannel()
-    await asyncio.to_thread(
-        whatsapp.send_message,
-        to_number=to_whatsapp_number,
-        body=answer
-    )
+# Received messages are stored in the durable inbox until they are answered,
+# each conversation is assigned to one worker process by the hash ring
+inbox = Inbox(ring=HashRing(range(WORKER_PROCESSES)) if WORKER_PROCESSES > 0 else None)
 
-@app.post("/whatsapp/webhook")
-async def whatsapp_webhook(Body: str = Form(...), From: str = Form(...)):
-    """
-    Webhook endpoint that handles incoming messages from WhatsApp.
-    Receives the message and triggers an asynchronous task to process it.
-    """
-    incoming_message = Body
-    from_number = From
-    print(f"Message received from {from_number}: {incoming_message}")
+# Channels, assistant, inbox and workers served together
+runtime = AssistantRuntime(
+    [create_channel(name) for name in CHANNELS],
+    inbox,
+    personal_assistant,
+    db_path,
+    workers=int(os.getenv("WEBHOOK_WORKERS", "4")),
+    max_queue=int(os.getenv("WEBHOOK_MAX_QUEUE", "100")),
+    debounce=float(os.getenv("DEBOUNCE_SECONDS", "0")),
+    debounce_max_wait=float(os.getenv("DEBOUNCE_MAX_WAIT", "10")),
+    metrics_log_interval=int(os.getenv("METRICS_LOG_INTERVAL", "0"))
+)
 
-    # Create an asynchronous task to process the message without blocking
-    asyncio.create_task(process_message_async(from_number, incoming_message))
+# Initiate FastAPI app, the runtime runs for the server's lifetime
+app = create_webhook_app(runtime)
 
-    # Respond with a status indicating that the message was received
-    return "Message received", 200
+def serve():
+    """Run the webhook server (also the front-end started by launcher.py)"""
+    try:
+        uvicorn.run(app, host="0.0.0.0", port=5000)
+    finally:
+        inbox.close()
 
 if __name__ == "__main__":
-    # Start the FastAPI application on the specified host and port
-    uvicorn.run(app, host="0.0.0.0", port=5000)
+    if WORKER_INDEX is not None:
+        try:
+            asyncio.run(runtime.run_worker(int(WORKER_INDEX)))
+        finally:
+            inbox.close()
+    else:
+        serve()
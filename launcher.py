@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import importlib
+import subprocess
+import threading
+from dotenv import load_dotenv
+
+# Load .env variables from the environment file
+load_dotenv()
+
+# App run behind the launcher: python launcher.py [app_whatsapp.py|app.py]
+APP_FILE = sys.argv[1] if len(sys.argv) > 1 else "app_whatsapp.py"
+
+# Number of worker processes answering messages (defaults to one per CPU core)
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "0")) or os.cpu_count()
+# Read by the app (imported below) and by the worker processes: only processes started
+# by the launcher leave the answers to the workers
+os.environ["WORKER_PROCESSES"] = str(WORKER_PROCESSES)
+os.environ["LAUNCHER"] = "1"
+# Seconds the workers get to finish their current turn after SIGTERM before they are killed
+WORKER_STOP_TIMEOUT = 30
+
+def start_worker(index):
+    """Start the worker process answering the conversations assigned to `index` by the hash ring"""
+    return subprocess.Popen(
+        [sys.executable, APP_FILE],
+        env={**os.environ, "WORKER_INDEX": str(index)}
+    )
+
+def supervise(workers, stopping):
+    """Restart worker processes that exit, their claimed messages are released on startup"""
+    while not stopping.wait(1):
+        for index, process in enumerate(workers):
+            if process.poll() is not None:
+                print(f"Worker {index} exited with code {process.returncode}, restarting it")
+                workers[index] = start_worker(index)
+
+if __name__ == "__main__":
+    # The front-end: receives the messages (webhooks or polling), stores them in the inbox
+    # and wakes the worker owning the conversation up
+    app = importlib.import_module(os.path.splitext(os.path.basename(APP_FILE))[0])
+
+    # Unfinished messages may be assigned to workers of a previous run with a different size
+    print(f"Reassigned {app.inbox.reassign()} unfinished messages to {WORKER_PROCESSES} workers")
+
+    workers = [start_worker(index) for index in range(WORKER_PROCESSES)]
+    stopping = threading.Event()
+    threading.Thread(target=supervise, args=(workers, stopping), name="supervisor", daemon=True).start()
+    try:
+        app.serve()
+    finally:
+        stopping.set()
+        for process in workers:
+            process.terminate()
+        deadline = time.monotonic() + WORKER_STOP_TIMEOUT
+        for index, process in enumerate(workers):
+            try:
+                process.wait(timeout=max(0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                # Its claimed messages are released when the next run starts
+                print(f"Worker {index} did not stop in time, killing it")
+                process.kill()
+                process.wait()
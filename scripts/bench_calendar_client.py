@@ -0,0 +1,117 @@
+"""
+Per-call overhead of get_calendar_events against a local fake Calendar server
+(tests/fakes/google_calendar.py), before and after the Google service clients were cached:
+
+- before: every call loads token.json, builds a new service (build()) on a new
+  httplib2 connection, then lists the events, as the tools did until user-022
+- after: the GetCalendarEvents tool, on the service cached by get_google_service
+  and its pooled keep-alive connection (the calendar store is disabled)
+
+The fake answers over plain HTTP on loopback, so the TLS handshake every new
+connection costs against Google is not included.
+
+Usage: python scripts/bench_calendar_client.py [--calls 100] [--threads 8]
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import statistics
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+START_DATE = "2026-10-17"
+END_DATE = "2026-10-18"
+
+
+def measure(func, calls):
+    """Mean and median milliseconds of `calls` calls, after a first warm-up call"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+        durations = []
+        for _ in range(calls):
+            started = time.perf_counter()
+            func()
+            durations.append(time.perf_counter() - started)
+    return statistics.mean(durations) * 1000, statistics.median(durations) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=8, help="threads sharing the cached client in the concurrency check")
+    parser.add_argument("--port", type=int, default=8769)
+    args = parser.parse_args()
+
+    from datetime import datetime, timezone
+    from tests.fakes.google import serve, write_token
+    from tests.fakes.google_calendar import FakeCalendar
+
+    calendar = FakeCalendar()
+    calendar.add_events(8, start=datetime.fromisoformat(f"{START_DATE}T00:00:00+00:00"))
+    base_url = serve(calendar.app, args.port)
+    os.environ.update(GOOGLE_API_BASE_URL=base_url, CALENDAR_STORE="false")
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        write_token("token.json")
+
+        from google.oauth2.credentials import Credentials
+        from googleapiclient.discovery import build
+        from src.utils import SCOPES
+        from src.tools.calendar.get_events import get_calendar_events
+
+        def before():
+            creds = Credentials.from_authorized_user_file("token.json", SCOPES)
+            service = build("calendar", "v3", credentials=creds, client_options={"api_endpoint": f"{base_url}/calendar/v3/"})
+            return service.events().list(
+                calendarId="primary",
+                timeMin=f"{START_DATE}T00:00:00Z",
+                timeMax=f"{END_DATE}T00:00:00Z",
+                singleEvents=True,
+                orderBy="startTime"
+            ).execute()
+
+        def after():
+            return get_calendar_events.invoke({"start_date": START_DATE, "end_date": END_DATE})
+
+        calendar.connections.clear()
+        before_mean, before_median = measure(before, args.calls)
+        before_connections = len(calendar.connections)
+        calendar.connections.clear()
+        after_mean, after_median = measure(after, args.calls)
+        after_connections = len(calendar.connections)
+
+        # The cached client is shared by the worker threads
+        errors = []
+        def worker():
+            for _ in range(args.calls // args.threads):
+                try:
+                    answer = after()
+                    assert "Meeting" in answer, answer
+                except Exception as e:
+                    errors.append(e)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+    from src.metrics import metrics
+    print(f"before (load token.json + build() + list): mean {before_mean:.2f} ms, median {before_median:.2f} ms, "
+          f"{before_connections} TCP connections for {args.calls + 1} calls")
+    print(f"after (GetCalendarEvents, cached client): mean {after_mean:.2f} ms, median {after_median:.2f} ms, "
+          f"{after_connections} TCP connections for {args.calls + 1} calls")
+    print(f"{args.threads} threads on the cached client: {len(errors)} errors, "
+          f"{metrics.snapshot()['counters'].get('google_services.created', 0)} service built")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Micro-benchmark of the per-message state reset of PersonalAssistant, with fake LLMs
+and a file-backed SQLite checkpoint database:
+
+- drop: the old reset, dropping every table of the checkpoint database, creating a new
+  SqliteSaver and recompiling the manager graph before each message
+- thread: the current reset, running each message on its own checkpoint thread and
+  deleting that thread's checkpoints once answered (PersonalAssistant.clear_state)
+
+Usage: python scripts/bench_state_reset.py [messages]
+"""
+import io
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+from tests.fakes.llm import install_fake_llms
+from src.agents.personal_assistant import PersonalAssistant
+
+
+def drop_tables_reset(assistant):
+    """The reset done before every message until per-turn threads were introduced"""
+    cursor = assistant.db_connection.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    for (table,) in cursor.fetchall():
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    assistant.db_connection.commit()
+    assistant.checkpointer = SqliteSaver(assistant.db_connection)
+    assistant.manager_agent.memory = assistant.checkpointer
+    assistant.manager_agent.agent = None
+    assistant.manager_agent.initiat_agent()
+
+
+def run(assistant, strategy, messages):
+    reset = total = 0.0
+    for i in range(messages + 1):
+        config = {"configurable": {"thread_id": f"{strategy}:{i}"}}
+        started = time.perf_counter()
+        if strategy == "drop":
+            reset_started = time.perf_counter()
+            drop_tables_reset(assistant)
+            reset_time = time.perf_counter() - reset_started
+            assistant.assistant_orchestrator.invoke("What's on my calendar today?", config=config)
+        else:
+            assistant.assistant_orchestrator.invoke("What's on my calendar today?", config=config)
+            reset_started = time.perf_counter()
+            assistant.clear_state(config["configurable"]["thread_id"])
+            reset_time = time.perf_counter() - reset_started
+        # The first message warms up the graphs and the database
+        if i:
+            reset += reset_time
+            total += time.perf_counter() - started
+    return reset / messages, total / messages
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    install_fake_llms()
+    with tempfile.TemporaryDirectory() as directory:
+        connection = sqlite3.connect(os.path.join(directory, "checkpoints.sqlite"), check_same_thread=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            assistant = PersonalAssistant(connection)
+            results = {strategy: run(assistant, strategy, messages) for strategy in ("drop", "thread")}
+    print(f"{messages} messages, fake LLMs, file-backed SQLite")
+    for strategy, (reset, total) in results.items():
+        print(f"  {strategy:<7} reset {reset * 1000:6.2f} ms/message, total {total * 1000:6.2f} ms/message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Load test of the WhatsApp webhook server (app_whatsapp.py) with fake LLMs: `senders`
+simultaneous senders post `messages` messages each to /whatsapp/webhook, and the
+answers are collected from the dispatcher instead of Twilio.
+
+Every fake LLM call takes `latency` seconds (a turn makes 3 calls: manager, sub-agent,
+manager) and the answer repeats the sender's text, so answers sent to the wrong sender
+or out of order are counted. Runs in a temporary directory (inbox and checkpoints).
+
+Usage: python scripts/load_test.py [--senders 50] [--messages 2] [--workers 4] [--latency 0.2]
+"""
+import io
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(app_whatsapp, senders, messages, timeout):
+    import httpx
+
+    answers = {}
+    started = {}
+
+    def send(text, sender=None):
+        answers.setdefault(sender, []).append((time.monotonic(), text))
+
+    # No rate limit on the fake Twilio sender, the test measures the assistant side
+    app_whatsapp.runtime.dispatcher.register("whatsapp", send, rate=10000, burst=10000)
+    app = app_whatsapp.app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test") as client:
+            async def sender(index):
+                for number in range(messages):
+                    started[(f"+{index}", number)] = time.monotonic()
+                    response = await client.post("/whatsapp/webhook", data={
+                        "Body": f"msg {number} from {index}",
+                        "From": f"+{index}",
+                        "MessageSid": f"SM{index}_{number}"
+                    })
+                    response.raise_for_status()
+
+            test_started = time.monotonic()
+            await asyncio.gather(*(sender(index) for index in range(senders)))
+            while sum(len(received) for received in answers.values()) < senders * messages:
+                if time.monotonic() - test_started > timeout:
+                    raise TimeoutError(f"Only {sum(map(len, answers.values()))} of {senders * messages} answers after {timeout}s")
+                await asyncio.sleep(0.01)
+            elapsed = time.monotonic() - test_started
+
+    latencies = []
+    wrong = 0
+    for index in range(senders):
+        for number, (answered_at, text) in enumerate(answers.get(f"+{index}", [])):
+            latencies.append(answered_at - started[(f"+{index}", number)])
+            if f"msg {number} from {index}" not in text:
+                wrong += 1
+    return elapsed, latencies, wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--senders", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=2, help="messages per sender")
+    parser.add_argument("--workers", type=int, default=4, help="WEBHOOK_WORKERS")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per fake LLM call")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for every answer")
+    args = parser.parse_args()
+
+    os.environ.update(
+        WEBHOOK_WORKERS=str(args.workers),
+        WEBHOOK_MAX_QUEUE=str(max(100, args.senders * args.messages)),
+        WORKER_PROCESSES="0",
+        TWILIO_ACCOUNT_SID=os.getenv("TWILIO_ACCOUNT_SID", "AC-load-test"),
+        TWILIO_AUTH_TOKEN=os.getenv("TWILIO_AUTH_TOKEN", "load-test"),
+        OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "fake")
+    )
+    from tests.fakes.llm import install_fake_llms
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        os.environ["INBOX_PATH"] = os.path.join(directory, "db", "inbox.sqlite")
+        with contextlib.redirect_stdout(io.StringIO()):
+            install_fake_llms(latency=args.latency)
+            import app_whatsapp
+            elapsed, latencies, wrong = asyncio.run(run(app_whatsapp, args.senders, args.messages, args.timeout))
+        app_whatsapp.inbox.close()
+        app_whatsapp.conn.close()
+
+    total = args.senders * args.messages
+    print(
+        f"WEBHOOK_WORKERS={args.workers}: {total} messages from {args.senders} senders in {elapsed:.2f}s "
+        f"-> {total / elapsed:.1f} msg/s, latency p50 {percentile(latencies, 0.5):.2f}s "
+        f"p95 {percentile(latencies, 0.95):.2f}s, misrouted or out of order: {wrong}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Startup profile of the assistant: time and peak memory of `import src.agents.personal_assistant`
+(median of several fresh interpreters), the heavy tool dependencies loaded by it, and the
+slowest modules reported by `python -X importtime`.
+
+Usage: python scripts/profile_startup.py [--runs 7] [--tree PATH] [--top 15]
+--tree profiles another checkout (e.g. a git worktree of an older commit) to compare with.
+The baseline measured when the tool imports were made lazy is kept in scripts/startup_baseline.txt.
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages only the tools need, they should not be imported at startup
+HEAVY_PACKAGES = [
+    "selenium", "webdriver_manager", "googleapiclient", "notion_client",
+    "slack_sdk", "tavily", "bs4", "html2text"
+]
+
+MEASURE = f"""
+import sys, time, resource
+started = time.perf_counter()
+import src.agents.personal_assistant
+elapsed = time.perf_counter() - started
+loaded = [name for name in {HEAVY_PACKAGES!r} if name in sys.modules]
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, ",".join(loaded) or "-")
+"""
+
+
+def run_python(tree, *args):
+    env = {**os.environ, "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "fake")}
+    return subprocess.run([sys.executable, *args], cwd=tree, env=env, capture_output=True, text=True, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--tree", default=ROOT)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    times, peaks = [], []
+    for _ in range(args.runs):
+        elapsed, max_rss, loaded = run_python(args.tree, "-c", MEASURE).stdout.split()
+        times.append(float(elapsed))
+        peaks.append(int(max_rss))
+    print(f"tree: {args.tree}")
+    print(f"import src.agents.personal_assistant ({args.runs} runs, median)")
+    print(f"  import time: {statistics.median(times) * 1000:.0f} ms")
+    print(f"  max RSS:     {statistics.median(peaks) / 1024:.1f} MB")
+    print(f"  heavy packages loaded: {loaded}")
+
+    # -X importtime lines: "import time: self [us] | cumulative | imported package", children
+    # first and indented by 2 spaces per level. A package costs the cumulative time of the
+    # imports made from outside it, so each package is counted once.
+    report = run_python(args.tree, "-X", "importtime", "-c", "import src.agents.personal_assistant").stderr
+    packages = {}
+    ancestors = []
+    for line in reversed(report.splitlines()[1:]):
+        fields = line.split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        package = name.strip().split(".")[0]
+        del ancestors[depth:]
+        if package not in ancestors:
+            packages[package] = packages.get(package, 0) + int(fields[1])
+        ancestors.append(package)
+    print("  slowest packages (-X importtime, cumulative):")
+    for package, cumulative in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"    {cumulative / 1000:8.1f} ms  {package}")
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
-from .agent import Agent
+from .agent import Agent, get_compiled_agent
 from .agents_orchestrator import AgentsOrchestrator
+from .intent_router import IntentRouter, IntentRule
+from .pass_through import PassThroughPolicy
 
-__all__ = ['Agent', 'AgentsOrchestrator']
+__all__ = ['Agent', 'AgentsOrchestrator', 'IntentRouter', 'IntentRule', 'PassThroughPolicy', 'get_compiled_agent']
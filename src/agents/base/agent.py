@@ -1,7 +1,80 @@
-from typing import List
-from langgraph.prebuilt import create_react_agent
+import asyncio
+import hashlib
+import threading
+from contextvars import ContextVar
+from typing import List, Optional
+from langgraph.prebuilt import ToolNode, create_react_agent
+from langgraph.prebuilt.tool_node import TOOL_CALL_ERROR_TEMPLATE
+from src.deadline import Deadline, DeadlineExceeded, get_deadline
+from src.metrics import metrics
 from src.utils import get_llm_by_provider
 
+def handle_tool_error(error: Exception) -> str:
+    """
+    Tool errors are returned to the LLM as an error ToolMessage, except a passed deadline:
+    it stops the whole turn, the orchestrator answers with what it got so far.
+    """
+    if isinstance(error, DeadlineExceeded):
+        raise error
+    return TOOL_CALL_ERROR_TEMPLATE.format(error=repr(error))
+
+# Slots of the tool calls of the current async tool node step, see BoundedToolNode
+_tool_call_slots = ContextVar("tool_call_slots", default=None)
+
+class BoundedToolNode(ToolNode):
+    """
+    ToolNode running at most config["max_concurrency"] tool calls of a step at a time.
+    The sync API already sizes its thread pool from it, the async one gathers every call.
+    """
+    async def _afunc(self, input, config, *, store):
+        max_concurrency = config.get("max_concurrency")
+        token = _tool_call_slots.set(asyncio.Semaphore(max_concurrency) if max_concurrency else None)
+        try:
+            return await super()._afunc(input, config, store=store)
+        finally:
+            _tool_call_slots.reset(token)
+
+    async def _arun_one(self, *args, **kwargs):
+        slots = _tool_call_slots.get()
+        if slots is None:
+            return await super()._arun_one(*args, **kwargs)
+        async with slots:
+            return await super()._arun_one(*args, **kwargs)
+
+# Process-wide cache of compiled agent graphs, see get_compiled_agent
+_compiled_agents = {}
+_compiled_agents_lock = threading.Lock()
+
+def get_compiled_agent(model, temperature, tools, system_prompt, checkpointer=None):
+    """
+    Return the compiled ReAct graph for the given model, temperature, tool set,
+    system prompt and checkpointer, compiling it only on the first request.
+    Tools and checkpointer are keyed by identity, the cached graph keeps them alive.
+    """
+    key = (
+        model,
+        temperature,
+        tuple(id(tool) for tool in tools),
+        hashlib.sha256(system_prompt.encode()).hexdigest(),
+        id(checkpointer) if checkpointer else None
+    )
+    with _compiled_agents_lock:
+        agent = _compiled_agents.get(key)
+        if agent is not None:
+            metrics.increment("agent_cache.hits")
+            return agent
+
+        metrics.increment("agent_cache.misses")
+        llm = get_llm_by_provider(model, temperature)
+        agent = create_react_agent(
+            llm, 
+            tools=BoundedToolNode(list(tools), handle_tool_errors=handle_tool_error),
+            state_modifier=system_prompt,
+            **({"checkpointer": checkpointer} if checkpointer else {"checkpointer": False}) # set to False to avoid "MULTIPLE_SUBGRAPHS" error
+        )
+        _compiled_agents[key] = agent
+        return agent
+
 class Agent:
     def __init__(
         self, 
@@ -12,7 +85,8 @@ class Agent:
         sub_agents: List['Agent'],  # List of sub-agents that the main agent can sned message to
         model: str,  # LLM model (in provider/model format e.g., "openai/gpt-4o", "gemini/gemini-1.5-flash")
         temperature: float,  # Temperature setting for the LLM (affects creativity/randomness),
-        memory=None # Agent memory storage (Optional)
+        memory=None, # Agent memory storage (Optional)
+        async_memory=None # Async agent memory storage used by ainvoke/astream (Optional)
 
     ):
         self.name = name
@@ -23,15 +97,26 @@ class Agent:
         self.model = model
         self.temperature = temperature
         self.agent = None 
+        self.async_agent = None
         self.memory = memory
+        self.async_memory = async_memory
 
-    def invoke(self, *args, **kwargs):
+    def invoke(self, *args, deadline: Optional[Deadline] = None, **kwargs):
         if not self.agent:
             self.initiat_agent()
+        deadline = deadline or get_deadline()
         
         print(f"--- Calling {self.name} ---")
-        response = self.agent.invoke(*args, **kwargs)
-        return response
+        if deadline is None:
+            response = self.agent.invoke(*args, **kwargs)
+            return response
+        
+        # Run the graph step by step so the deadline is checked between steps
+        deadline.check(self.name)
+        state = None
+        for state in self.agent.stream(*args, stream_mode="values", **kwargs):
+            deadline.check(self.name, state)
+        return state
     
     def stream(self, *args, **kwargs):
         if not self.agent:
@@ -41,11 +126,77 @@ class Agent:
         for chunk in self.agent.stream(*args, **kwargs):
             yield chunk
 
+    def update_state(self, *args, **kwargs):
+        if not self.agent:
+            self.initiat_agent()
+        return self.agent.update_state(*args, **kwargs)
+
+    def _has_sync_memory_only(self):
+        # Sync checkpointers (e.g. SqliteSaver) don't implement the async checkpoint API
+        return self.memory is not None and self.async_memory is None
+
+    async def ainvoke(self, *args, deadline: Optional[Deadline] = None, **kwargs):
+        deadline = deadline or get_deadline()
+        if self._has_sync_memory_only():
+            # Run the sync graph in a worker thread so the event loop is not blocked
+            call = asyncio.to_thread(self.invoke, *args, deadline=deadline, **kwargs)
+            if deadline is None:
+                return await call
+            try:
+                return await asyncio.wait_for(call, timeout=deadline.remaining())
+            except asyncio.TimeoutError:
+                # The thread can't be interrupted, it stops at its next deadline check
+                deadline.cancel()
+                raise deadline.exceeded(self.name)
+        if not self.async_agent:
+            self.initiat_async_agent()
+
+        print(f"--- Calling {self.name} (async) ---")
+        if deadline is None:
+            response = await self.async_agent.ainvoke(*args, **kwargs)
+            return response
+
+        # Cancel the graph (including in-flight LLM and tool calls) when the deadline passes
+        state = None
+        async def run():
+            nonlocal state
+            async for state in self.async_agent.astream(*args, stream_mode="values", **kwargs):
+                pass
+        try:
+            await asyncio.wait_for(run(), timeout=deadline.remaining())
+        except asyncio.TimeoutError:
+            raise deadline.exceeded(self.name, state)
+        return state
+
+    async def astream(self, *args, **kwargs):
+        if self._has_sync_memory_only():
+            raise RuntimeError(f"{self.name} needs an async checkpointer (async_memory) to stream asynchronously")
+        if not self.async_agent:
+            self.initiat_async_agent()
+
+        print(f"--- Calling {self.name} (async) ---")
+        async for chunk in self.async_agent.astream(*args, **kwargs):
+            yield chunk
+
+    async def aupdate_state(self, *args, **kwargs):
+        if self._has_sync_memory_only():
+            return await asyncio.to_thread(self.update_state, *args, **kwargs)
+        if not self.async_agent:
+            self.initiat_async_agent()
+        return await self.async_agent.aupdate_state(*args, **kwargs)
+
+    def _compile_agent(self, checkpointer):
+        return get_compiled_agent(self.model, self.temperature, self.tools, self.system_prompt, checkpointer)
+
     def initiat_agent(self):
-        llm = get_llm_by_provider(self.model, self.temperature)
-        self.agent = create_react_agent(
-            llm, 
-            tools=self.tools, 
-            state_modifier=self.system_prompt,
-            **({"checkpointer": self.memory} if self.memory else {"checkpointer": False}) # set to False to avoid "MULTIPLE_SUBGRAPHS" error
-        )
+        self.agent = self._compile_agent(self.memory)
+        # Agents without async memory share the same graph for the async API
+        self.async_agent = None if self.async_memory else self.agent
+
+    def initiat_async_agent(self):
+        if not self.async_memory:
+            if not self.agent:
+                self.initiat_agent()
+            self.async_agent = self.agent
+            return
+        self.async_agent = self._compile_agent(self.async_memory)
@@ -1,32 +1,44 @@
+import os
+import time
 from pydantic import Field, create_model
 from .agent import Agent
+from .intent_router import IntentRouter
+from .pass_through import PassThroughPolicy
+from src.deadline import Deadline, DeadlineExceeded, get_deadline
+from src.metrics import metrics
+from src.prompts import DIRECT_TOOLS_PROMPT
+from src.tools.direct_tool import DirectTool
 from src.tools.send_message import SendMessage
 from typing import List, Dict, Any, Optional
-from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.messages import HumanMessage, ToolMessage
 from langchain_core.tools import BaseTool
 
-def execute_send_message(args):
-    """
-    Execute the SendMessage tool to schedule a meeting or send a message to an agent.
-    Args: dict containing 'recipient' and 'message' keys.
-    Returns: str indicating the result.
-    """
-    recipient = args.get("recipient", "unknown")
-    message = args.get("message", "")
-    # Simulate sending to calendar_agent (replace with actual logic)
-    try:
-        # Placeholder for actual scheduling logic (e.g., Google Calendar API)
-        return f"Message sent to {recipient}: {message}"
-    except Exception as e:
-        return f"Failed to send message: {str(e)}"
-
 class AgentsOrchestrator:
-    def __init__(self, main_agent, agents):
+    def __init__(
+        self,
+        main_agent,
+        agents,
+        max_parallel_tool_calls: Optional[int] = None,
+        router: Optional[IntentRouter] = None,
+        direct_tools: Optional[List[BaseTool]] = None,
+        pass_through: Optional[PassThroughPolicy] = None
+    ):
         self.main_agent = main_agent
+        # Optional fast-path router sending unambiguous requests straight to a sub-agent
+        self.router = router
+        # Optional policy returning a single sub-agent answer without a final manager call
+        self.pass_through = pass_through
         self.agents = {agent.name: agent for agent in agents}
         self.agent_mapping = {}
+        # Maximum number of sub-agent tool calls dispatched concurrently (1 = sequential)
+        if max_parallel_tool_calls is None:
+            max_parallel_tool_calls = int(os.getenv("MAX_PARALLEL_TOOL_CALLS", "4"))
+        self.max_parallel_tool_calls = max(1, max_parallel_tool_calls)
         self._populate_agent_mapping()
         
+        # Expose selected leaf tools directly to the main agent (before it gets compiled)
+        self._add_direct_tools(direct_tools or [])
+        
         # Add send message tools to agents with sub-agents
         self._add_send_message_tool()
         
@@ -47,148 +59,162 @@ class AgentsOrchestrator:
         """Get an agent by its name"""
         return self.agent_mapping.get(name)
 
-    def _process_tool_call(self, tool_call, config: Dict[str, Any]) -> Optional[ToolMessage]:
-        """Process a single tool call and return its ToolMessage response"""
-        try:
-            # Get the tool call ID and args
-            tool_call_id = tool_call.id
-            tool_name = getattr(tool_call, 'name', 'SendMessage')
-            
-            # Get the recipient and message from the arguments
-            args = getattr(tool_call, 'args', {})
-            recipient = args.get('recipient', 'unknown')
-            message = args.get('message', '')
-            
-            print(f"Processing tool call {tool_call_id} to {recipient}")
-            
-            # Get the appropriate agent
-            agent = self._get_agent_by_name(recipient)
-            
-            # If we found a valid agent, invoke it
-            if agent:
-                # Create a clean state for the agent
-                agent_state = {"messages": [HumanMessage(content=message)]}
-                
-                # Invoke the agent
-                print(f"Invoking {recipient} agent...")
-                agent_response = agent.invoke(agent_state, config=config)
-                
-                # Extract the content from the response
-                if isinstance(agent_response, dict) and 'messages' in agent_response:
-                    # Get the last message from the agent response
-                    agent_messages = agent_response.get('messages', [])
-                    last_message = agent_messages[-1] if agent_messages else None
-                    content = last_message.content if hasattr(last_message, 'content') else str(last_message)
-                else:
-                    # Handle non-dict responses
-                    content = str(agent_response)
-                    
-                print(f"Got response from {recipient}: {content[:50]}...")
-            else:
-                # No agent found
-                content = f"Error: Agent '{recipient}' not found"
-                print(f"Agent {recipient} not found")
-            
-            # Create and return the tool message
-            tool_message = ToolMessage(
-                tool_call_id=tool_call_id,
-                content=content,
-                name=tool_name
-            )
-            
-            print(f"Created tool message for {tool_call_id}")
-            return tool_message
-            
-        except Exception as e:
-            # Log the error
-            print(f"Error processing tool call: {str(e)}")
-            
-            # Return error message as tool response
-            return ToolMessage(
-                tool_call_id=tool_call.id,
-                content=f"Error: {str(e)}",
-                name="SendMessage"
-            )
-
-    def invoke(self, message: str, config: Dict[str, Any] = None) -> str:
+    def _extract_content(self, response) -> str:
+        """Extract the content of the last message of an agent response"""
+        if isinstance(response, dict) and 'messages' in response:
+            # Get the last message from the agent response
+            messages = response.get('messages', [])
+            last_message = messages[-1] if messages else None
+            return last_message.content if hasattr(last_message, 'content') else str(last_message)
+        # Handle non-dict responses
+        return str(response)
+
+    def _manager_config(self, config: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Config of the manager graph runs: its tool node runs the SendMessage calls
+        of a turn at most max_parallel_tool_calls at a time (see BoundedToolNode)
+        """
+        return {**(config or {}), "max_concurrency": self.max_parallel_tool_calls}
+
+    def _get_returned_tool_messages(self, response) -> List[ToolMessage]:
+        """
+        Return the tool messages the main agent stopped on. With a pass-through
+        policy SendMessage returns directly, so the graph ends after delegating.
+        """
+        if not isinstance(response, dict):
+            return []
+        tool_messages = []
+        for response_message in reversed(response.get('messages', [])):
+            if not isinstance(response_message, ToolMessage):
+                break
+            tool_messages.insert(0, response_message)
+        return tool_messages
+
+    def _pass_through(self, message: str, contents: List[str]) -> Optional[str]:
+        """Return the sub-agent answer if the pass-through policy lets it skip the manager"""
+        if not self.pass_through:
+            return None
+        if len(contents) != 1 or not self.pass_through.accepts(message, contents[0]):
+            metrics.increment("pass_through.rephrased")
+            return None
+        metrics.increment("pass_through.skipped_manager_calls")
+        print("Passing the sub-agent answer through to the user")
+        return self.pass_through.format(contents[0])
+
+    def _route(self, message: str) -> Optional[Agent]:
+        """Return the sub-agent picked by the fast-path router, if any"""
+        if not self.router:
+            return None
+        agent = self._get_agent_by_name(self.router.route(message) or "")
+        if agent:
+            print(f"Fast path: routing message directly to {agent.name}")
+        return agent
+
+    def _record_fast_path(self, elapsed: float):
+        # Estimate the saving against the average turn that went through the manager
+        average_manager_turn = metrics.average("orchestrator.manager_turn_seconds")
+        if average_manager_turn:
+            metrics.increment("router.latency_saved_seconds", max(0.0, average_manager_turn - elapsed))
+        metrics.observe("orchestrator.fast_path_turn_seconds", elapsed)
+
+    def _invoke_fast_path(self, agent: Agent, message: str, config: Dict[str, Any], deadline: Optional[Deadline] = None) -> str:
+        start = time.perf_counter()
+        response = agent.invoke({"messages": [HumanMessage(content=message)]}, config=config, deadline=deadline)
+        self._record_fast_path(time.perf_counter() - start)
+        return self._extract_content(response)
+
+    async def _ainvoke_fast_path(self, agent: Agent, message: str, config: Dict[str, Any], deadline: Optional[Deadline] = None) -> str:
+        start = time.perf_counter()
+        response = await agent.ainvoke({"messages": [HumanMessage(content=message)]}, config=config, deadline=deadline)
+        self._record_fast_path(time.perf_counter() - start)
+        return self._extract_content(response)
+
+    def _partial_answer(self, error: DeadlineExceeded) -> str:
+        """Report the sub-agent answers gathered before the deadline passed"""
+        metrics.increment("orchestrator.partial_answers")
+        tool_messages = []
+        if isinstance(error.partial_state, dict):
+            tool_messages = [m for m in error.partial_state.get('messages', []) if isinstance(m, ToolMessage)]
+        results = [
+            tool_message.content for tool_message in tool_messages
+            if not str(tool_message.content).startswith("Error")
+        ]
+        answer = "Sorry, I ran out of time before finishing your request."
+        if results:
+            answer += "\n\nHere is what I got so far:\n" + "\n\n".join(results)
+        return answer
+
+    def invoke(self, message: str, config: Dict[str, Any] = None, deadline: Optional[Deadline] = None) -> str:
         """Invoke the orchestrator with a message"""
+        deadline = deadline or get_deadline()
         try:
             print(f"Processing message: {message}")
             
+            # Unambiguous requests go straight to the sub-agent that handles them
+            routed_agent = self._route(message)
+            if routed_agent:
+                return self._invoke_fast_path(routed_agent, message, config, deadline)
+            
             # Start with a completely fresh state
             fresh_state = {"messages": [HumanMessage(content=message)]}
+            manager_config = self._manager_config(config)
             
-            # First invocation to get initial response
-            print("Getting initial response...")
-            response = self.main_agent.invoke(fresh_state, config=config)
-            
-            if not isinstance(response, dict) or 'messages' not in response:
-                print("No messages in response, returning as is")
-                return str(response)
-            
-            response_messages = response.get('messages', [])
-            last_message = response_messages[-1] if response_messages else None
+            # The manager graph runs the SendMessage calls itself and writes the answer
+            print("Getting response...")
+            turn_start = time.perf_counter()
+            response = self.main_agent.invoke(fresh_state, config=manager_config, deadline=deadline)
             
-            # Check for tool calls in the response
-            if not (isinstance(last_message, AIMessage) and hasattr(last_message, 'tool_calls') and last_message.tool_calls):
-                print("No tool calls found, returning response")
-                return last_message.content if isinstance(last_message, AIMessage) else str(last_message)
+            # The main agent stopped after delegating, answer directly or let it carry on.
+            # It may delegate again when resumed, so keep going until it writes an answer.
+            returned_tool_messages = self._get_returned_tool_messages(response)
+            while returned_tool_messages:
+                answer = self._pass_through(message, [tool_message.content for tool_message in returned_tool_messages])
+                if answer is not None:
+                    metrics.observe("orchestrator.manager_turn_seconds", time.perf_counter() - turn_start)
+                    return answer
+                response = self.main_agent.invoke({"messages": []}, config=manager_config, deadline=deadline)
+                returned_tool_messages = self._get_returned_tool_messages(response)
             
-            # We have tool calls to process
-            print(f"Found {len(last_message.tool_calls)} tool calls to process")
-            
-            # Process all tool calls in sequence
-            updated_messages = response_messages.copy()
-            had_errors = False
-            error_messages = []
-            
-            for tool_call in last_message.tool_calls:
-                print(f"Processing tool call: {tool_call.name} to {tool_call.args.get('recipient', 'unknown')}")
-                tool_response = self._process_tool_call(tool_call, config)
-                
-                if tool_response:
-                    print(f"Adding tool response for {tool_call.id}")
-                    updated_messages.append(tool_response)
-                    
-                    # Check if this tool response contains an error
-                    if hasattr(tool_response, 'content') and "ERROR:" in tool_response.content:
-                        had_errors = True
-                        error_messages.append(tool_response.content)
-                
-            # Update the graph state with all messages including tool responses
-            print(f"Updating state with {len(updated_messages)} messages including tool responses")
-            self.main_agent.agent.update_state(config, {"messages": updated_messages})
+            metrics.observe("orchestrator.manager_turn_seconds", time.perf_counter() - turn_start)
+            return self._extract_content(response)
+        except DeadlineExceeded as e:
+            return self._partial_answer(e)
+        except Exception as e:
+            print(f"Error in orchestrator.invoke: {str(e)}")
+            return f"ERROR: I encountered an error processing your request: {str(e)}"
+
+    async def ainvoke(self, message: str, config: Dict[str, Any] = None, deadline: Optional[Deadline] = None) -> str:
+        """Invoke the orchestrator with a message without blocking the event loop"""
+        deadline = deadline or get_deadline()
+        try:
+            print(f"Processing message: {message}")
             
-            # If we had errors, modify the state to include error information
-            if had_errors:
-                error_state = {"messages": updated_messages + [
-                    HumanMessage(content=f"There were errors processing the request:\n{', '.join(error_messages)}\nPlease report these errors to the user.")
-                ]}
-                self.main_agent.agent.update_state(config, error_state)
-                print("Added error information to state")
+            routed_agent = self._route(message)
+            if routed_agent:
+                return await self._ainvoke_fast_path(routed_agent, message, config, deadline)
             
-            # Get final response after processing all tool calls
-            print("Getting final response after tool processing...")
-            final_response = self.main_agent.invoke(None, config=config)
+            fresh_state = {"messages": [HumanMessage(content=message)]}
+            manager_config = self._manager_config(config)
             
-            # Check the final response for errors
-            final_content = ""
-            if isinstance(final_response, dict) and 'messages' in final_response:
-                final_messages = final_response.get('messages', [])
-                final_message = final_messages[-1] if final_messages else None
-                final_content = final_message.content if isinstance(final_message, AIMessage) else str(final_response)
-            else:
-                final_content = str(final_response)
+            print("Getting response...")
+            turn_start = time.perf_counter()
+            response = await self.main_agent.ainvoke(fresh_state, config=manager_config, deadline=deadline)
             
-            # If we had errors but they're not reflected in the final response, prepend them
-            if had_errors and not any(error_msg in final_content for error_msg in error_messages):
-                error_summary = "ERROR: The requested operation failed due to the following issues:\n" + "\n".join(error_messages)
-                print("Adding error information to final response")
-                return error_summary
+            returned_tool_messages = self._get_returned_tool_messages(response)
+            while returned_tool_messages:
+                answer = self._pass_through(message, [tool_message.content for tool_message in returned_tool_messages])
+                if answer is not None:
+                    metrics.observe("orchestrator.manager_turn_seconds", time.perf_counter() - turn_start)
+                    return answer
+                response = await self.main_agent.ainvoke({"messages": []}, config=manager_config, deadline=deadline)
+                returned_tool_messages = self._get_returned_tool_messages(response)
             
-            return final_content
+            metrics.observe("orchestrator.manager_turn_seconds", time.perf_counter() - turn_start)
+            return self._extract_content(response)
+        except DeadlineExceeded as e:
+            return self._partial_answer(e)
         except Exception as e:
-            print(f"Error in orchestrator.invoke: {str(e)}")
+            print(f"Error in orchestrator.ainvoke: {str(e)}")
             return f"ERROR: I encountered an error processing your request: {str(e)}"
 
     def stream(self, message, **kwargs):
@@ -197,6 +223,12 @@ class AgentsOrchestrator:
         for chunk in self.main_agent.stream(messages, **kwargs):
             yield chunk
 
+    async def astream(self, message, **kwargs):
+        """Stream response from the orchestrator asynchronously"""
+        messages = {"messages": [("human", message)]}
+        async for chunk in self.main_agent.astream(messages, **kwargs):
+            yield chunk
+
     def _create_dynamic_send_message_tool(self, agent: "Agent") -> "SendMessage":
         """
         Creates a dynamic send message tool for agents with sub-agents.
@@ -216,10 +248,21 @@ class AgentsOrchestrator:
         )
 
         # Create the SendMessage tool instance
-        send_message_tool = SendMessage(args_schema=DynamicSendMessageInput)
+        # Under a pass-through policy the agent stops after delegating so its answer can be returned as is
+        send_message_tool = SendMessage(args_schema=DynamicSendMessageInput, return_direct=self.pass_through is not None)
         send_message_tool.agent_mapping = self.agent_mapping  # Dynamically bind agent_mapping
         return send_message_tool
 
+    def _add_direct_tools(self, tools: List[BaseTool]):
+        """
+        Adds leaf tools to the main agent so simple reads skip the sub-agent LLM hop.
+        """
+        if not tools:
+            return
+        self.main_agent.tools.extend(DirectTool(tool) for tool in tools)
+        self.main_agent.system_prompt += DIRECT_TOOLS_PROMPT.format(tools=", ".join(tool.name for tool in tools))
+        print(f"Direct tools for {self.main_agent.name}: {[tool.name for tool in tools]}")
+
     def _add_send_message_tool(self):
         """
         Adds the send message tool to agents with sub-agents.
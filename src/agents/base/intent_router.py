@@ -0,0 +1,68 @@
+import re
+from typing import List, Optional
+from src.metrics import metrics
+
+# Messages matching any of these look like several requests in one, they are left to the manager
+MULTI_INTENT_PATTERNS = [
+    r"\b(and|then|also|after that|as well)\b",
+    r";",
+]
+
+
+class IntentRule:
+    """
+    Routes a message to an agent when it matches one of the patterns and none
+    of the exclude patterns.
+    """
+    def __init__(self, agent_name: str, patterns: List[str], exclude_patterns: List[str] = None):
+        self.agent_name = agent_name
+        self.patterns = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+        self.exclude_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in exclude_patterns or []]
+
+    def matches(self, text: str) -> bool:
+        if any(pattern.search(text) for pattern in self.exclude_patterns):
+            return False
+        return any(pattern.search(text) for pattern in self.patterns)
+
+
+class IntentRouter:
+    """
+    Local, deterministic pre-router placed in front of the manager agent.
+    A message is routed only when exactly one rule matches and it doesn't look
+    like a multi-step request, otherwise the manager handles it as usual.
+    """
+    def __init__(self, rules: List[IntentRule], multi_intent_patterns: List[str] = None):
+        self.rules = rules
+        self.multi_intent_patterns = [
+            re.compile(pattern, re.IGNORECASE)
+            for pattern in (MULTI_INTENT_PATTERNS if multi_intent_patterns is None else multi_intent_patterns)
+        ]
+
+    def _get_text(self, message: str) -> str:
+        # Channels send "Message: <text>\nCurrent Date/time: <date>", only route on the text
+        match = re.match(r"Message:\s*(.*?)(?:\nCurrent Date/time:.*)?$", message, re.DOTALL)
+        return match.group(1) if match else message
+
+    def route(self, message: str) -> Optional[str]:
+        """Return the name of the agent that should handle the message, or None"""
+        text = self._get_text(message)
+        agent_name = None
+        if not any(pattern.search(text) for pattern in self.multi_intent_patterns):
+            matches = {rule.agent_name for rule in self.rules if rule.matches(text)}
+            if len(matches) == 1:
+                agent_name = matches.pop()
+
+        metrics.increment("router.hits" if agent_name else "router.misses")
+        return agent_name
+
+    def stats(self):
+        """Return the hit rate of the router and the estimated latency it saved"""
+        counters = metrics.snapshot()["counters"]
+        hits = counters.get("router.hits", 0)
+        total = hits + counters.get("router.misses", 0)
+        return {
+            "hits": hits,
+            "total": total,
+            "hit_rate": hits / total if total else 0.0,
+            "latency_saved_seconds": counters.get("router.latency_saved_seconds", 0.0)
+        }
@@ -0,0 +1,43 @@
+import re
+from typing import Callable, List, Optional
+from .intent_router import MULTI_INTENT_PATTERNS
+
+# Sub-agent answers containing any of these are always rephrased by the manager
+ERROR_PATTERNS = [r"\berror\b", r"\bfailed\b", r"\bunable to\b"]
+
+
+def tidy_answer(content: str) -> str:
+    """Cheap formatting step applied to passed-through answers"""
+    return re.sub(r"\n{3,}", "\n\n", content).strip()
+
+
+class PassThroughPolicy:
+    """
+    Decides when the answer of a single successful delegation is already
+    user-ready and can be returned without another manager LLM call.
+    """
+    def __init__(
+        self,
+        max_chars: int = 1500,
+        exclude_patterns: List[str] = None,
+        formatter: Optional[Callable[[str], str]] = tidy_answer
+    ):
+        self.max_chars = max_chars
+        self.exclude_patterns = [
+            re.compile(pattern, re.IGNORECASE)
+            for pattern in (ERROR_PATTERNS if exclude_patterns is None else exclude_patterns)
+        ]
+        self.multi_intent_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in MULTI_INTENT_PATTERNS]
+        self.formatter = formatter
+
+    def accepts(self, message: str, content: str) -> bool:
+        """Return True if the sub-agent content can be sent to the user as is"""
+        if not content or len(content) > self.max_chars:
+            return False
+        # Multi-step requests may still need other delegations
+        if any(pattern.search(message) for pattern in self.multi_intent_patterns):
+            return False
+        return not any(pattern.search(content) for pattern in self.exclude_patterns)
+
+    def format(self, content: str) -> str:
+        return self.formatter(content) if self.formatter else content
@@ -1,21 +1,73 @@
+import os
+import uuid
+import asyncio
+import threading
+from contextvars import copy_context
+from functools import partial
 from langgraph.checkpoint.sqlite import SqliteSaver
-from src.agents.base import Agent, AgentsOrchestrator
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from src.agents.base import Agent, AgentsOrchestrator, IntentRouter, IntentRule, PassThroughPolicy
 from src.prompts import *
 from src.tools.calendar import *
 from src.tools.email import *
 from src.tools.notion import *
 from src.tools.slack import *
 from src.tools.research import *
-from src.utils import get_current_date_time
+from src.deadline import Deadline, deadline_scope
+from src.metrics import metrics
+from src.utils import get_current_date_time, warm_up_llm_clients, awarm_up_llm_clients, start_credential_manager
+from src.gmail_mirror import start_gmail_mirror
+from src.calendar_store import start_calendar_store
 import sqlite3
 
+# Extra time given to the orchestrator to report partial results once the deadline has passed
+DEADLINE_GRACE_SECONDS = 5
+
+TIMEOUT_ANSWER = "Sorry, your request took too long and was cancelled. Please try again."
+
+# Read-only requests that the fast-path router can send straight to a sub-agent
+FAST_PATH_RULES = [
+    IntentRule(
+        "calendar_agent",
+        patterns=[r"\b(what'?s|what is|show|list|check|get|do i have|any)\b.*\b(calendar|schedule|agenda|meetings?|events?)\b"],
+        exclude_patterns=[r"\b(book|create|add|cancel|move|reschedule|invite|delete|set up|schedule (a|an|the|with))\b"]
+    ),
+    IntentRule(
+        "notion_agent",
+        patterns=[r"\b(what'?s|what are|show|list|get|check)\b.*\b(to-?do|tasks?)\b"],
+        exclude_patterns=[r"\b(add|create|new|remind|complete|mark|delete)\b"]
+    ),
+    IntentRule(
+        "email_agent",
+        patterns=[r"\b(read|show|check|list|any|get)\b.*\b(e-?mails?|inbox|mails?)\b"],
+        exclude_patterns=[r"\b(send|reply|write|draft|forward|compose)\b"]
+    ),
+    IntentRule(
+        "slack_agent",
+        patterns=[r"\b(read|show|check|any|get)\b.*\bslack\b"],
+        exclude_patterns=[r"\b(send|post|reply|tell|write)\b"]
+    ),
+]
+
+def conversation_config(channel, sender):
+    """
+    Config of a conversation: each sender (chat id, phone number...) gets its own
+    checkpoint thread, so concurrent users never share state.
+    """
+    return {"configurable": {"thread_id": f"{channel}:{sender}"}}
+
 class PersonalAssistant:
-    def __init__(self, db_connection):
-        # Store db connection
+    def __init__(self, db_connection, async_db_connection=None):
+        # Store db connections (the async one is an aiosqlite connection used by ainvoke)
         self.db_connection = db_connection
+        self.async_db_connection = async_db_connection
         
-        # Create sqlite checkpointer for managing manager memory
+        # Create sqlite checkpointers for managing manager memory
         self.checkpointer = SqliteSaver(db_connection)
+        self.async_checkpointer = AsyncSqliteSaver(async_db_connection) if async_db_connection else None
+        
+        # Time allowed to answer a message (REQUEST_TIMEOUT_SECONDS)
+        self.request_timeout = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "120"))
         
         # Initialize individual agents
         self.email_agent = Agent(
@@ -23,7 +75,7 @@ class PersonalAssistant:
             description="Email agent can manage GMAIL inbox including read and send emails",
             model="openai/gpt-4o-mini",
             system_prompt=EMAIL_AGENT_PROMPT.format(date_time=get_current_date_time()),
-            tools=[read_emails, send_email, find_contact_email],
+            tools=[read_emails, search_emails, send_email, find_contact_email],
             sub_agents=[],
             temperature=0.1
         )
@@ -83,9 +135,42 @@ class PersonalAssistant:
                 self.researcher_agent
             ],
             temperature=0.1,
-            memory=self.checkpointer # only manager has memory feature
+            memory=self.checkpointer, # only manager has memory feature
+            async_memory=self.async_checkpointer
         )
 
+        # Open the LLM provider connections while the rest of the app starts
+        self.llm_models = [self.manager_agent.model] + [agent.model for agent in self.manager_agent.sub_agents]
+        warm_up_llm_clients(self.llm_models)
+        # Same for the Google credentials used by the email and calendar tools
+        start_credential_manager()
+        # Local Gmail mirror (GMAIL_MIRROR=true), synced in the background
+        start_gmail_mirror()
+        # Local calendar store (CALENDAR_STORE=true), synced in the background
+        start_calendar_store()
+
+        # Fast-path routing is opt-in (FAST_PATH_ROUTING=true)
+        router = None
+        if os.getenv("FAST_PATH_ROUTING", "false").lower() == "true":
+            router = IntentRouter(FAST_PATH_RULES)
+
+        # Leaf tools the manager may call directly, by name (e.g. DIRECT_TOOLS=GetMyTodoList,GetCalendarEvents)
+        available_direct_tools = {
+            tool.name: tool
+            for tool in [get_my_todo_list, get_calendar_events, read_emails, search_emails, find_contact_email, get_slack_messages, search_web]
+        }
+        direct_tools = []
+        for tool_name in filter(None, (name.strip() for name in os.getenv("DIRECT_TOOLS", "").split(","))):
+            if tool_name in available_direct_tools:
+                direct_tools.append(available_direct_tools[tool_name])
+            else:
+                print(f"Unknown direct tool '{tool_name}', available: {list(available_direct_tools)}")
+
+        # Returning a single sub-agent answer without rephrasing is opt-in (PASS_THROUGH_ANSWERS=true)
+        pass_through = None
+        if os.getenv("PASS_THROUGH_ANSWERS", "false").lower() == "true":
+            pass_through = PassThroughPolicy(max_chars=int(os.getenv("PASS_THROUGH_MAX_CHARS", "1500")))
+
         # Initialize the orchestrator
         self.assistant_orchestrator = AgentsOrchestrator(
             main_agent=self.manager_agent,
@@ -96,46 +181,127 @@ class PersonalAssistant:
                 self.notion_agent,
                 self.slack_agent,
                 self.researcher_agent
-            ]
+            ],
+            router=router,
+            direct_tools=direct_tools,
+            pass_through=pass_through
         )
 
-    def clear_state(self):
-        """Clear all stored state from the database"""
+    def _turn_config(self, config):
+        """
+        Give the turn its own checkpoint thread (derived from the conversation thread id)
+        so that every message starts from a fresh state.
+        """
+        config = dict(config or {})
+        configurable = dict(config.get("configurable", {}))
+        conversation_id = configurable.get("thread_id", "default")
+        configurable["thread_id"] = f"{conversation_id}:{uuid.uuid4().hex}"
+        config["configurable"] = configurable
+        return config
+
+    def clear_state(self, thread_id):
+        """Delete the stored checkpoints of a single thread"""
         try:
-            print("Completely clearing database state...")
-            # Get a cursor for the database
-            cursor = self.db_connection.cursor()
-            
-            # Drop all tables in the database to completely clear the state
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = cursor.fetchall()
-            
-            for table in tables:
-                cursor.execute(f"DROP TABLE IF EXISTS {table[0]}")
-            
-            # Commit the changes
-            self.db_connection.commit()
-            
-            # Reinitialize the checkpointer after clearing the database
-            self.checkpointer = SqliteSaver(self.db_connection)
-            
-            # Reinitialize the manager agent with the new checkpointer
-            self.manager_agent.memory = self.checkpointer
-            self.manager_agent.agent = None
-            self.manager_agent.initiat_agent()
-            
-            print("Database state cleared successfully")
+            self.checkpointer.delete_thread(thread_id)
         except Exception as e:
-            print(f"Error clearing database state: {e}")
+            print(f"Error clearing state of thread {thread_id}: {e}")
 
-    def invoke(self, message, **kwargs):
-        """Invoke the personal assistant with a fresh state"""
-        # Clear any existing state before processing
-        self.clear_state()
-        
-        # Now invoke with a fresh state
+    async def aclear_state(self, thread_id):
+        """Async version of clear_state"""
+        if not self.async_checkpointer:
+            return await asyncio.to_thread(self.clear_state, thread_id)
+        try:
+            await self.async_checkpointer.adelete_thread(thread_id)
+        except Exception as e:
+            print(f"Error clearing state of thread {thread_id}: {e}")
+
+    def _run_until_deadline(self, deadline, func, cleanup):
+        """
+        Run func in a daemon thread and stop waiting for it once the deadline (plus
+        a grace period for partial results) has passed, so a stuck LLM or tool call
+        can't stall the caller. The thread runs cleanup itself when func returns:
+        an abandoned turn keeps writing checkpoints until its next deadline check,
+        so its state can only be deleted once it has stopped.
+        """
+        result = {}
+        context = copy_context()
+
+        def run():
+            try:
+                result["answer"] = context.run(func)
+            except Exception as e:
+                result["error"] = e
+            finally:
+                cleanup()
+
+        thread = threading.Thread(target=run, name="assistant-turn", daemon=True)
+        thread.start()
+        thread.join(deadline.remaining() + DEADLINE_GRACE_SECONDS)
+        if thread.is_alive():
+            deadline.cancel()
+            metrics.increment("timeouts.request")
+            print("Request cancelled after its deadline")
+            return TIMEOUT_ANSWER
+        if "error" in result:
+            raise result["error"]
+        return result["answer"]
+
+    def invoke(self, message, config=None, timeout=None, **kwargs):
+        """Invoke the personal assistant with a fresh state, within the request deadline"""
+        metrics.increment("assistant.turns")
+        turn_config = self._turn_config(config)
+        deadline = Deadline(timeout or self.request_timeout)
         print("Invoking assistant with fresh state...")
-        return self.assistant_orchestrator.invoke(message, **kwargs)
+        with deadline_scope(deadline):
+            return self._run_until_deadline(
+                deadline,
+                partial(
+                    self.assistant_orchestrator.invoke,
+                    message,
+                    config=turn_config,
+                    deadline=deadline,
+                    **kwargs
+                ),
+                # The turn's checkpoints are not needed once it is answered (or abandoned)
+                cleanup=partial(self.clear_state, turn_config["configurable"]["thread_id"])
+            )
+
+    def _set_async_checkpointer(self, async_checkpointer):
+        self.async_checkpointer = async_checkpointer
+        self.manager_agent.async_memory = async_checkpointer
+        self.manager_agent.async_agent = None
+
+    def set_async_connection(self, async_db_connection):
+        """
+        Attach an aiosqlite connection (to the same database) for the async API.
+        Must be called from the event loop that will run ainvoke.
+        """
+        self.async_db_connection = async_db_connection
+        self._set_async_checkpointer(AsyncSqliteSaver(async_db_connection))
+
+    async def awarm_up(self):
+        """Open the async LLM connections used by ainvoke, on the loop that will run it"""
+        await awarm_up_llm_clients(self.llm_models)
+
+    async def ainvoke(self, message, config=None, timeout=None, **kwargs):
+        """Invoke the personal assistant with a fresh state without blocking the event loop"""
+        metrics.increment("assistant.turns")
+        turn_config = self._turn_config(config)
+        deadline = Deadline(timeout or self.request_timeout)
+        try:
+            print("Invoking assistant with fresh state...")
+            with deadline_scope(deadline):
+                return await asyncio.wait_for(
+                    self.assistant_orchestrator.ainvoke(message, config=turn_config, deadline=deadline, **kwargs),
+                    timeout=deadline.remaining() + DEADLINE_GRACE_SECONDS
+                )
+        except asyncio.TimeoutError:
+            deadline.cancel()
+            metrics.increment("timeouts.request")
+            print("Request cancelled after its deadline")
+            return TIMEOUT_ANSWER
+        finally:
+            await self.aclear_state(turn_config["configurable"]["thread_id"])
 
     def __getattr__(self, name):
         return getattr(self.assistant_orchestrator, name)
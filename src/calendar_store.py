@@ -0,0 +1,214 @@
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from src.db import connect
+from src.metrics import metrics
+from src.utils import get_google_service
+from src.tools.calendar.get_events import event_fields, to_rfc3339
+
+# Fields of a stored event, in table order
+FIELDS = ("id", "summary", "description", "start", "start_ts", "end_ts")
+
+
+class CalendarStore:
+    """
+    Local SQLite copy of the primary calendar events (expanded recurring instances), so
+    range questions ("what's on today/this week") don't need a Calendar API call.
+
+    The first sync lists every event ending after `days` days ago and keeps the
+    nextSyncToken; later syncs only fetch the events changed since (cancelled ones are
+    removed), and a full sync is done again when Calendar answers 410 Gone.
+
+    Events are indexed on their start time: an event overlaps [start, end) when it starts
+    before `end` and ends after `start`, and since no event lasts longer than the longest
+    one stored (kept in sync_state), only the starts in [start - longest, end) are read.
+    Metrics: calendar_store.events and calendar_store.sync_lag_seconds (read at every
+    snapshot) gauges, calendar_store.sync_seconds.
+    """
+    def __init__(self, path=None, days=None, sync_interval=None):
+        self.path = path or os.getenv("CALENDAR_STORE_PATH", "db/calendar.sqlite")
+        self.days = days or int(os.getenv("CALENDAR_STORE_DAYS", "30"))
+        self.sync_interval = sync_interval or float(os.getenv("CALENDAR_SYNC_INTERVAL", "60"))
+        self._lock = threading.Lock()
+        # A single sync runs at a time (background thread or explicit call)
+        self._sync_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.conn = connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                id TEXT PRIMARY KEY,
+                summary TEXT,
+                description TEXT,
+                start TEXT,
+                start_ts REAL NOT NULL,
+                end_ts REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS events_start_ts ON events (start_ts);
+            CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self.conn.commit()
+
+    def _get_state(self, key):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    @property
+    def sync_token(self):
+        return self._get_state("sync_token")
+
+    def covers(self, start):
+        """Whether a full sync completed and it copied the events from `start` (timestamp) on"""
+        window_start = self._get_state("window_start")
+        return self.sync_token is not None and start >= float(window_start)
+
+    def sync_lag(self):
+        """Seconds since the last successful sync (None before the first one)"""
+        synced_at = self._get_state("synced_at")
+        return time.time() - float(synced_at) if synced_at else None
+
+    def staleness_note(self):
+        """Line added to the answers when the store missed its last syncs (None when it is current)"""
+        lag = self.sync_lag()
+        if lag is None or lag < 2 * self.sync_interval:
+            return None
+        return f"Note: calendar last synced {int(lag // 60)} minutes ago, recent changes may be missing."
+
+    def _store(self, events, state=None, replace=False):
+        """Apply fetched events in one transaction: cancelled ones are deleted, the others inserted or updated"""
+        cancelled = [(event['id'],) for event in events if event.get('status') == 'cancelled']
+        rows = [
+            tuple(event_fields(event)[field] for field in FIELDS)
+            for event in events if event.get('status') != 'cancelled'
+        ]
+        with self._lock, self.conn:
+            if replace:
+                self.conn.execute("DELETE FROM events")
+                self.conn.execute("DELETE FROM sync_state WHERE key = 'longest'")
+            # Only grows until the next full sync, a too long value just reads a few more rows
+            longest = max([row[5] - row[4] for row in rows] + [self._longest()])
+            self.conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('longest', ?)", (str(longest),))
+            self.conn.executemany(f"INSERT OR REPLACE INTO events ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})", rows)
+            self.conn.executemany("DELETE FROM events WHERE id = ?", cancelled)
+            if state is not None:
+                state = {**state, "synced_at": str(time.time())}
+                self.conn.executemany("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", list(state.items()))
+        return len(rows) + len(cancelled)
+
+    def _longest(self):
+        """Duration (seconds) of the longest stored event, the caller holds the lock"""
+        row = self.conn.execute("SELECT value FROM sync_state WHERE key = 'longest'").fetchone()
+        return float(row["value"]) if row else 0
+
+    def _list(self, service, **params):
+        """All the events of a sync and the nextSyncToken given with its last page"""
+        events = []
+        page_token = None
+        while True:
+            response = service.events().list(calendarId='primary', singleEvents=True, pageToken=page_token, **params).execute()
+            events.extend(response.get('items', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return events, response.get('nextSyncToken')
+
+    def _full_sync(self, service):
+        window_start = datetime.now(timezone.utc) - timedelta(days=self.days)
+        events, sync_token = self._list(service, timeMin=to_rfc3339(window_start), maxResults=2500)
+        state = {"sync_token": sync_token, "window_start": str(window_start.timestamp())}
+        metrics.increment("calendar_store.full_syncs")
+        return self._store(events, state, replace=True)
+
+    def sync(self, service=None):
+        """Bring the store up to date, returns the number of events added, changed or deleted"""
+        from googleapiclient.errors import HttpError
+        service = service or get_google_service("calendar", "v3")
+        with self._sync_lock, metrics.timer("calendar_store.sync_seconds"):
+            sync_token = self.sync_token
+            if sync_token is None:
+                changes = self._full_sync(service)
+            else:
+                try:
+                    events, sync_token = self._list(service, syncToken=sync_token)
+                    changes = self._store(events, {"sync_token": sync_token})
+                except HttpError as e:
+                    # 410 Gone: the sync token expired, start over
+                    if e.resp.status != 410:
+                        raise
+                    print("Calendar sync token expired, syncing the store again")
+                    changes = self._full_sync(service)
+        metrics.increment("calendar_store.changes", changes)
+        self.update_metrics()
+        return changes
+
+    def put(self, event):
+        """Write an event created through the API to the store right away (the next sync returns it again)"""
+        self._store([event])
+
+    def query(self, start, end):
+        """Events overlapping [start, end) (timestamps), by start time"""
+        with self._lock:
+            longest = self._longest()
+            rows = self.conn.execute(
+                "SELECT * FROM events WHERE start_ts >= ? AND start_ts < ? AND end_ts > ? ORDER BY start_ts",
+                (start - longest, end, start)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            count = self.conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        return {"events": count, "sync_lag_seconds": self.sync_lag()}
+
+    def update_metrics(self):
+        stats = self.stats()
+        metrics.set_gauge("calendar_store.events", stats["events"])
+        # Read when the metrics are, so it keeps growing while the syncs fail or stall
+        metrics.set_gauge_function("calendar_store.sync_lag_seconds", self.sync_lag)
+
+    def start(self):
+        """Sync now and then every sync_interval seconds in a background thread"""
+        def run():
+            while True:
+                try:
+                    self.sync()
+                except Exception as e:
+                    print(f"Error syncing the calendar store: {e}")
+                    metrics.increment("calendar_store.sync_errors")
+                    self.update_metrics()
+                if self._stopped.wait(self.sync_interval):
+                    return
+
+        thread = threading.Thread(target=run, name="calendar-store-sync", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stopped.set()
+
+    def close(self):
+        self.stop()
+        metrics.remove_gauge("calendar_store.sync_lag_seconds")
+        with self._lock:
+            self.conn.close()
+
+
+_calendar_store = None
+_calendar_store_lock = threading.Lock()
+
+def get_calendar_store():
+    """Return the process-wide calendar store, or None when it is disabled (CALENDAR_STORE=false)"""
+    global _calendar_store
+    if os.getenv("CALENDAR_STORE", "false").lower() != "true":
+        return None
+    with _calendar_store_lock:
+        if _calendar_store is None:
+            _calendar_store = CalendarStore()
+        return _calendar_store
+
+def start_calendar_store():
+    """Start syncing the calendar store in the background when it is enabled"""
+    store = get_calendar_store()
+    return store.start() if store else None
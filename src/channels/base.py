@@ -0,0 +1,39 @@
+import asyncio
+from abc import ABC, abstractmethod
+
+
+class Channel(ABC):
+    """
+    Common async interface of the messaging channels served by the runtime (src/runtime.py).
+
+    A channel receives messages through `listen` (polling or push) or through a webhook
+    of the FastAPI server, and sends answers with `send`. Received messages are dicts
+    holding at least "text" and "date"; `id_field` names the channel's message ID used
+    to deduplicate redeliveries and `sender_field` the conversation they belong to.
+    """
+    name = None
+    id_field = None
+    sender_field = None
+
+    async def start(self, receive=True):
+        """Open the channel's clients on the event loop that will use them (only to send without `receive`)"""
+
+    async def stop(self):
+        """Close the channel's clients"""
+
+    async def listen(self, on_messages):
+        """
+        Await on_messages(messages) on the event loop for every batch of received messages.
+        Webhook channels receive their messages through the server, so they just wait.
+        """
+        await asyncio.Event().wait()
+
+    @abstractmethod
+    async def send(self, text, sender=None):
+        """Send one message (at most the channel's length limit) to the sender of a conversation"""
+
+    def message_id(self, message):
+        return message[self.id_field]
+
+    def sender(self, message):
+        return message.get(self.sender_field)
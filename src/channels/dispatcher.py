@@ -0,0 +1,124 @@
+import os
+import time
+import asyncio
+import inspect
+import threading
+from src.metrics import metrics
+
+# Default (max characters per message, messages per second, burst) for each channel
+CHANNEL_LIMITS = {
+    "telegram": (4096, 1.0, 3),
+    "whatsapp": (1600, 1.0, 3),
+    "slack": (4000, 1.0, 3),
+}
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter: `rate` tokens are added per second, up to `capacity`.
+    Shared by threads and coroutines, async callers wait without blocking the loop.
+    """
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token and return how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self):
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def wait(self):
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def split_message(text: str, max_chars: int):
+    """
+    Split a text into chunks of at most max_chars, preferring paragraph, then
+    line, then word boundaries so formatting stays intact whenever possible.
+    """
+    chunks = []
+    while len(text) > max_chars:
+        window = text[:max_chars]
+        for separator in ("\n\n", "\n", " "):
+            cut = window.rfind(separator)
+            if cut > 0:
+                break
+        else:
+            cut = max_chars
+        chunks.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+class OutboundDispatcher:
+    """
+    Single exit point for answers sent to the user. Each registered channel gets
+    its own token bucket and maximum message length; long answers are chunked
+    and every send is timed in the send_latency.<channel> histogram.
+    """
+    def __init__(self):
+        self.channels = {}
+
+    def register(self, name, send, max_chars=None, rate=None, burst=None):
+        """
+        Register the function sending one message on a channel. It receives the text
+        as first argument plus the keyword arguments given to dispatch, and may be async.
+        Limits default to CHANNEL_LIMITS, overridable with <NAME>_SEND_RATE / <NAME>_SEND_BURST.
+        """
+        default_max_chars, default_rate, default_burst = CHANNEL_LIMITS.get(name, (4000, 1.0, 3))
+        rate = rate or float(os.getenv(f"{name.upper()}_SEND_RATE", default_rate))
+        burst = burst or int(os.getenv(f"{name.upper()}_SEND_BURST", default_burst))
+        self.channels[name] = {
+            "send": send,
+            "is_async": inspect.iscoroutinefunction(send),
+            "max_chars": max_chars or default_max_chars,
+            "bucket": TokenBucket(rate, burst)
+        }
+
+    async def dispatch(self, name, text, **kwargs):
+        """Send a text on the given channel, chunked and rate limited. Returns the result of each send."""
+        channel = self.channels[name]
+        chunks = split_message(text, channel["max_chars"])
+        metrics.increment(f"outbound.{name}.messages")
+        metrics.increment(f"outbound.{name}.chunks", len(chunks))
+
+        results = []
+        for chunk in chunks:
+            await channel["bucket"].acquire()
+            with metrics.timer(f"send_latency.{name}"):
+                if channel["is_async"]:
+                    result = await channel["send"](chunk, **kwargs)
+                else:
+                    result = await asyncio.to_thread(channel["send"], chunk, **kwargs)
+            results.append(result)
+        return results
+
+    def dispatch_sync(self, name, text, **kwargs):
+        """Blocking variant of dispatch for synchronous senders"""
+        channel = self.channels[name]
+        chunks = split_message(text, channel["max_chars"])
+        metrics.increment(f"outbound.{name}.messages")
+        metrics.increment(f"outbound.{name}.chunks", len(chunks))
+
+        results = []
+        for chunk in chunks:
+            channel["bucket"].wait()
+            with metrics.timer(f"send_latency.{name}"):
+                results.append(channel["send"](chunk, **kwargs))
+        return results
@@ -1,46 +1,238 @@
 import os
+import time
+import asyncio
 import requests
 from datetime import datetime
+from src.metrics import metrics
+from src.channels.base import Channel
+
+# Seconds to wait for the Slack API
+REQUEST_TIMEOUT = 10
+# Messages requested per conversations.history page
+HISTORY_PAGE_SIZE = 200
+
+class SlackChannel(Channel):
+    name = "slack"
+    id_field = "ts"
+    sender_field = "channel"
 
-class SlackChannel():
     def __init__(self):
         self.token = os.getenv("SLACK_BOT_TOKEN")
         self.channel_id = os.getenv("SLACK_CHANNEL_ID")
+        # App-level token (xapp-...) required by Socket Mode, polling is used without it
+        self.app_token = os.getenv("SLACK_APP_TOKEN")
+        # Web API server, can point to a local fake Slack server
+        self.api_base_url = os.getenv("SLACK_API_BASE_URL", "https://slack.com/api").rstrip("/")
+        # Adaptive polling interval bounds (fallback when Socket Mode isn't available)
+        self.min_poll_interval = float(os.getenv("SLACK_MIN_POLL_INTERVAL", "1"))
+        self.max_poll_interval = float(os.getenv("SLACK_MAX_POLL_INTERVAL", "30"))
+        # File where the timestamp of the newest stored message is persisted so restarts resume where they stopped
+        self.last_ts_path = os.getenv("SLACK_LAST_TS_PATH", "db/slack_last_ts")
+        # Timestamp of the newest stored message, polling only asks for newer ones
+        self.last_ts = self._load_last_ts()
+        # Timestamp of the newest polled message, becomes last_ts once its messages are stored
+        self.polled_ts = self.last_ts
+        self.socket_client = None
+        # Session reused for every call so the HTTPS connection stays open
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {self.token}"
+
+    def _load_last_ts(self):
+        # Without a saved timestamp, only messages sent from now on are answered
+        try:
+            with open(self.last_ts_path) as f:
+                return float(f.read().strip())
+        except (OSError, ValueError):
+            return time.time()
+
+    def _save_last_ts(self):
+        try:
+            with open(self.last_ts_path, "w") as f:
+                f.write(f"{self.last_ts:.6f}")
+        except OSError as e:
+            print(f"Error saving Slack timestamp: {e}")
+
+    def commit_ts(self, ts=None):
+        """
+        Move last_ts past the polled messages (or the message with the given ts) and persist
+        it, once they are stored: a restart then asks Slack for the newer messages only.
+        """
+        ts = self.polled_ts if ts is None else ts
+        if ts > self.last_ts:
+            self.last_ts = ts
+            self._save_last_ts()
 
     def send_message(self, text):
-        url = "https://slack.com/api/chat.postMessage"
-        headers = {
-            "Authorization": f"Bearer {self.token}",
-            "Content-Type": "application/json"
-        }
+        url = f"{self.api_base_url}/chat.postMessage"
         payload = {
             "channel": self.channel_id,
             "text": text
         }
-        response = requests.post(url, json=payload, headers=headers).json()
+        response = self.session.post(url, json=payload, timeout=REQUEST_TIMEOUT).json()
         if not response.get("ok"):
             return "Failed to send message"
         return "Message sent successfully on Slack"
 
-    def receive_messages(self, after_timestamp):
-        url = "https://slack.com/api/conversations.history"
-        headers = {
-            "Authorization": f"Bearer {self.token}"
+    async def send(self, text, sender=None):
+        # Answers go to the configured channel
+        return await asyncio.to_thread(self.send_message, text)
+
+    def _parse_message(self, message):
+        """Convert a Slack message (history item or event) into a message dict, or None if it should be ignored"""
+        # Skip edits, joins and the bot's own answers
+        if message.get("subtype") or message.get("bot_id") or not message.get("text"):
+            return None
+        ts = float(message["ts"])
+        return {
+            "text": message["text"],
+            "date": datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M"),
+            "ts": message["ts"],
+            "channel": message.get("channel", self.channel_id),
+            "received_at": time.monotonic(),
         }
+
+    def _get_history(self, oldest):
+        """
+        Return all messages newer than `oldest`, oldest first, following the cursor
+        when a burst doesn't fit in one page. Raises on HTTP errors (including 429).
+        """
+        url = f"{self.api_base_url}/conversations.history"
         params = {
             "channel": self.channel_id,
-            "oldest": after_timestamp
+            "oldest": f"{float(oldest):.6f}",
+            "limit": HISTORY_PAGE_SIZE
         }
-        response = requests.get(url, headers=headers, params=params).json()
-        if not response.get("ok"):
+        messages = []
+        while True:
+            response = self.session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            data = response.json()
+            metrics.increment("slack.history_calls")
+            if not data.get("ok"):
+                print(f"Slack error in conversations.history: {data.get('error')}")
+                break
+            messages.extend(data.get("messages", []))
+            cursor = data.get("response_metadata", {}).get("next_cursor")
+            if not data.get("has_more") or not cursor:
+                break
+            params["cursor"] = cursor
+        # Slack returns the newest messages first
+        return sorted(messages, key=lambda message: float(message["ts"]))
+
+    def receive_messages(self, after_timestamp):
+        try:
+            history = self._get_history(after_timestamp)
+        except requests.RequestException as e:
+            print(f"Error in receive_messages: {e}")
             return []
 
         new_messages = []
-        for message in response.get("messages", []):
+        for message in history:
             if float(message["ts"]) > after_timestamp:
-                new_messages.append({
-                    "text": message["text"],
-                    "date": datetime.fromtimestamp(float(message["ts"])).strftime("%Y-%m-%d %H:%M")
-                })
+                parsed = self._parse_message(message)
+                if parsed:
+                    new_messages.append(parsed)
+
+        return new_messages
+
+    def poll_messages(self):
+        """Return the messages received since the last stored one, call commit_ts once they are stored"""
+        history = self._get_history(self.last_ts)
+        new_messages = []
+        for message in history:
+            self.polled_ts = max(self.polled_ts, float(message["ts"]))
+            parsed = self._parse_message(message)
+            if parsed:
+                new_messages.append(parsed)
+        return new_messages
+
+    def start_socket_mode(self, on_message):
+        """
+        Receive messages as events pushed over a Socket Mode websocket, calling
+        on_message(message) from the client's thread for each of them.
+        Returns False if Socket Mode is not configured or could not connect.
+        """
+        if not self.app_token:
+            return False
+        from slack_sdk import WebClient
+        from slack_sdk.socket_mode import SocketModeClient
+        from slack_sdk.socket_mode.response import SocketModeResponse
+
+        def handle(client, request):
+            # Acknowledge first, otherwise Slack redelivers the event
+            client.send_socket_mode_response(SocketModeResponse(envelope_id=request.envelope_id))
+            if request.type != "events_api":
+                return
+            event = request.payload.get("event", {})
+            if event.get("type") != "message" or event.get("channel") != self.channel_id:
+                return
+            message = self._parse_message(event)
+            if message:
+                metrics.increment("slack.events")
+                on_message(message)
+
+        try:
+            web_client = WebClient(token=self.token, base_url=f"{self.api_base_url}/", timeout=REQUEST_TIMEOUT)
+            self.socket_client = SocketModeClient(app_token=self.app_token, web_client=web_client)
+            self.socket_client.socket_mode_request_listeners.append(handle)
+            self.socket_client.connect()
+            print("Connected to Slack with Socket Mode")
+            return True
+        except Exception as e:
+            print(f"Socket Mode unavailable, falling back to polling: {e}")
+            self.socket_client = None
+            return False
+
+    async def listen(self, on_messages):
+        """
+        Await on_messages(messages) on the event loop for every batch of incoming messages:
+        through Socket Mode events when available, otherwise by polling with an interval
+        that grows while the channel is idle and resets as soon as a message arrives.
+        Messages sent since the last stored one (e.g. while the app was down) are polled first.
+        """
+        loop = asyncio.get_running_loop()
+
+        def on_message(message):
+            def commit(stored):
+                if not stored.cancelled() and stored.exception() is None:
+                    self.commit_ts(float(message["ts"]))
+            asyncio.run_coroutine_threadsafe(on_messages([message]), loop).add_done_callback(commit)
+
+        if self.app_token:
+            try:
+                new_messages = await asyncio.to_thread(self.poll_messages)
+                if new_messages:
+                    await on_messages(new_messages)
+                self.commit_ts()
+            except Exception as e:
+                print(f"Error catching up with Slack: {e}")
+        if await asyncio.to_thread(self.start_socket_mode, on_message):
+            try:
+                await asyncio.Event().wait()
+            finally:
+                self.socket_client.close()
 
-        return new_messages
\ No newline at end of file
+        interval = self.min_poll_interval
+        while True:
+            try:
+                new_messages = await asyncio.to_thread(self.poll_messages)
+                if new_messages:
+                    await on_messages(new_messages)
+                # Only move past the messages once they are safely stored
+                self.commit_ts()
+                interval = self.min_poll_interval if new_messages else min(interval * 2, self.max_poll_interval)
+            except requests.HTTPError as e:
+                if e.response is not None and e.response.status_code == 429:
+                    # Rate limited, wait as long as Slack asks
+                    interval = max(interval, float(e.response.headers.get("Retry-After", self.max_poll_interval)))
+                    metrics.increment("slack.rate_limited")
+                print(f"Error in Slack polling: {e}")
+            except requests.RequestException as e:
+                print(f"Error in Slack polling: {e}")
+                interval = min(interval * 2, self.max_poll_interval)
+            except Exception as e:
+                # e.g. the inbox couldn't store the messages, they are polled again
+                print(f"Error while polling Slack: {str(e)}")
+                interval = min(interval * 2, self.max_poll_interval)
+            metrics.set_gauge("slack.poll_interval", interval)
+            await asyncio.sleep(interval)
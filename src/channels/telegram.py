@@ -1,121 +1,261 @@
 import os
+import time
 import asyncio
 import re
 from telegram import Bot, Update
 from telegram.constants import ParseMode
+from telegram.request import HTTPXRequest
 from telegram.error import TelegramError, TimedOut, NetworkError
+from src.channels.base import Channel
 
+# Longest text accepted by sendMessage
+MAX_MESSAGE_LENGTH = 4096
+# Markdown v1 inline link: [text](url)
+MARKDOWN_LINK = re.compile(r"\[[^\]\n]*\]\([^)\s]+\)")
+
+
+class TelegramChannel(Channel):
+    name = "telegram"
+    id_field = "update_id"
+    sender_field = "chat_id"
 
-class TelegramChannel:
     def __init__(self):
         self.token = os.getenv("TELEGRAM_TOKEN")
         self.chat_id = os.getenv("CHAT_ID")
-        self.bot = Bot(token=self.token)
-        self.last_update_id = 0  # Track the last update ID for offset
+        # "polling" (getUpdates long polling) or "webhook" (updates pushed to /telegram/webhook)
+        self.mode = os.getenv("TELEGRAM_MODE", "polling")
+        self.webhook_url = os.getenv("TELEGRAM_WEBHOOK_URL")
+        self.webhook_secret = os.getenv("TELEGRAM_WEBHOOK_SECRET")
+        # Seconds Telegram holds a getUpdates request open
+        self.poll_timeout = int(os.getenv("TELEGRAM_POLL_TIMEOUT", "30"))
+        # Bot API server, can point to a local stub standing in for Telegram
+        self.api_base_url = os.getenv("TELEGRAM_API_BASE_URL", "https://api.telegram.org").rstrip("/")
+        # Pool sized for concurrent replies, getUpdates uses its own connection
+        self.bot = Bot(
+            token=self.token,
+            base_url=f"{self.api_base_url}/bot",
+            base_file_url=f"{self.api_base_url}/file/bot",
+            request=HTTPXRequest(connection_pool_size=int(os.getenv("TELEGRAM_CONNECTION_POOL_SIZE", "8")))
+        )
+        # File where the last update ID is persisted so restarts resume where they stopped
+        self.offset_path = os.getenv("TELEGRAM_OFFSET_PATH", "db/telegram_offset")
+        self.last_update_id = self._load_offset()  # Track the last update ID for offset
+        # Last update ID of the latest poll, becomes last_update_id once its messages are stored
+        self.polled_update_id = self.last_update_id
+
+    def _load_offset(self):
+        try:
+            with open(self.offset_path) as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _save_offset(self):
+        try:
+            with open(self.offset_path, "w") as f:
+                f.write(str(self.last_update_id))
+        except OSError as e:
+            print(f"Error saving Telegram offset: {e}")
 
     def _escape_markdown(self, text):
         """Escape markdown special characters to prevent formatting errors"""
         # Characters that need to be escaped in Markdown v1
         markdown_chars = ['_', '*', '`', '[']
-        
+
         # Escape each character with a backslash
         for char in markdown_chars:
             text = text.replace(char, '\\' + char)
-            
+
         return text
 
-    def send_message(self, text):
-        try:
-            # Try to send with Markdown formatting first
-            try:
-                loop = asyncio.get_event_loop()
-            except RuntimeError:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-            
-            # Attempt to send with MarkdownV2 (which has stricter escaping requirements)
-            try:
-                message = loop.run_until_complete(
-                    self.bot.send_message(chat_id=self.chat_id, text=text, parse_mode=ParseMode.MARKDOWN)
-                )
-                print(f"Message sent to Telegram: {text[:50]}...")
-                return "Message sent successfully on Telegram"
-            except TelegramError as e:
-                if "Can't parse entities" in str(e):
-                    # Try with escaped markdown
-                    escaped_text = self._escape_markdown(text)
-                    message = loop.run_until_complete(
-                        self.bot.send_message(chat_id=self.chat_id, text=escaped_text, parse_mode=ParseMode.MARKDOWN)
-                    )
-                    print(f"Message sent with escaped markdown: {escaped_text[:50]}...")
-                    return "Message sent successfully with escaped formatting"
+    def _is_valid_markdown(self, text):
+        """
+        Check that Telegram will parse the text as Markdown v1: every *bold*, _italic_,
+        `code` and ```pre``` entity is closed, entities aren't nested and links are complete.
+        """
+        i = 0
+        open_entity = None
+        while i < len(text):
+            char = text[i]
+            if char == "\\" and open_entity is None and i + 1 < len(text) and text[i + 1] in "_*`[":
+                i += 2
+                continue
+            if open_entity in ("```", "`"):
+                # Nothing is parsed inside code, only look for the closing delimiter
+                end = text.find(open_entity, i)
+                if end == -1:
+                    return False
+                i = end + len(open_entity)
+                open_entity = None
+                continue
+            if text.startswith("```", i):
+                open_entity = "```"
+                i += 3
+                continue
+            if char in "*_`":
+                if open_entity is None:
+                    open_entity = char
+                elif open_entity == char:
+                    open_entity = None
                 else:
-                    raise
+                    return False
+            elif char == "[" and open_entity is None:
+                link = MARKDOWN_LINK.match(text, i)
+                if not link:
+                    return False
+                i = link.end()
+                continue
+            i += 1
+        return open_entity is None
+
+    def _format_message(self, text):
+        """Return the text to send and its parse mode, escaping Markdown Telegram would reject"""
+        if self._is_valid_markdown(text):
+            return text, ParseMode.MARKDOWN
+        escaped_text = self._escape_markdown(text)
+        if len(escaped_text) <= MAX_MESSAGE_LENGTH:
+            return escaped_text, ParseMode.MARKDOWN
+        return text, None
+
+    def _parse_update(self, update, after_timestamp=0):
+        """Convert a Telegram update into a message dict, or None if it should be ignored"""
+        if not (isinstance(update, Update) and update.message and update.message.text):
+            return None
+        message = update.message
+
+        # Check if the message is from the configured chat_id
+        if str(message.chat_id) != str(self.chat_id) or message.date.timestamp() <= after_timestamp:
+            return None
+        print(f"Processed message: {message.text}")
+        return {
+            "text": message.text,
+            "date": message.date.strftime("%Y-%m-%d %H:%M"),
+            "chat_id": str(message.chat_id),
+            "update_id": update.update_id,
+            "received_at": time.monotonic(),
+        }
+
+    async def initialize(self):
+        """Initialize the bot's HTTP clients, must run on the loop that will use them"""
+        await self.bot.initialize()
+
+    async def shutdown(self):
+        await self.bot.shutdown()
+
+    async def start(self, receive=True):
+        """Initialize the bot and register the webhook, or remove it so getUpdates works"""
+        await self.initialize()
+        if not receive:
+            return
+        if self.mode == "webhook":
+            if self.webhook_url:
+                await self.set_webhook(f"{self.webhook_url.rstrip('/')}/telegram/webhook", self.webhook_secret)
+        else:
+            await self.delete_webhook()
+
+    async def stop(self):
+        await self.shutdown()
+
+    async def set_webhook(self, url, secret_token=None):
+        """Ask Telegram to push message updates to the given URL instead of being polled"""
+        await self.bot.set_webhook(url=url, secret_token=secret_token, allowed_updates=["message"])
+        print(f"Telegram webhook set to {url}")
+
+    async def delete_webhook(self):
+        """Remove the webhook, getUpdates is rejected by Telegram while one is set"""
+        await self.bot.delete_webhook()
+
+    def parse_webhook_update(self, data):
+        """
+        Convert the JSON body of a webhook request into a message dict, or None if it
+        should be ignored. Redeliveries keep their update_id, the inbox deduplicates them.
+        """
+        update = Update.de_json(data, self.bot)
+        return self._parse_update(update) if update else None
+
+    async def asend_message(self, text):
+        """
+        Send a message with a single API call: the Markdown is validated locally and
+        escaped when it would be rejected, instead of trying the send several times.
+        """
+        formatted_text, parse_mode = self._format_message(text)
+        try:
+            await self.bot.send_message(chat_id=self.chat_id, text=formatted_text, parse_mode=parse_mode)
+            print(f"Message sent to Telegram: {text[:50]}...")
+            return "Message sent successfully on Telegram"
         except TelegramError as e:
-            # If all attempts with Markdown fail, send without formatting
+            if parse_mode is None or "Can't parse entities" not in str(e):
+                print(f"Error sending message: {e}")
+                return f"Failed to send message: {str(e)}"
+            # The local validation missed something, send without formatting
             print(f"Markdown error, sending without formatting: {e}")
             try:
-                try:
-                    loop = asyncio.get_event_loop()
-                except RuntimeError:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                
-                message = loop.run_until_complete(
-                    self.bot.send_message(chat_id=self.chat_id, text=text, parse_mode=None)
-                )
+                await self.bot.send_message(chat_id=self.chat_id, text=text, parse_mode=None)
                 print(f"Message sent without formatting: {text[:50]}...")
                 return "Message sent successfully on Telegram (without formatting)"
             except TelegramError as e2:
                 print(f"Error sending message without formatting: {e2}")
                 return f"Failed to send message: {str(e2)}"
 
-    def receive_messages(self, after_timestamp):
-        try:
-            # Create a new event loop if there isn't one available
-            try:
-                loop = asyncio.get_event_loop()
-            except RuntimeError:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-            
-            # Use offset to get only new updates
-            updates = loop.run_until_complete(
-                self.bot.get_updates(offset=self.last_update_id + 1, timeout=5)
-            )
-            
-            # Debug log
-            if updates:
-                print(f"Received {len(updates)} updates from Telegram")
-            
-            new_messages = []
-            for update in updates:
-                # Update our last_update_id
-                if update.update_id > self.last_update_id:
-                    self.last_update_id = update.update_id
-                
-                if isinstance(update, Update) and update.message and update.message.text:
-                    message = update.message
-                    
-                    # Check if the message is from the configured chat_id
-                    if str(message.chat_id) == str(self.chat_id):
-                        if message.date.timestamp() > after_timestamp:
-                            new_messages.append({
-                                "text": message.text,
-                                "date": message.date.strftime("%Y-%m-%d %H:%M"),
-                            })
-                            print(f"Processed message: {message.text}")
-            
-            return new_messages
-        except TimedOut:
-            # This is expected with long polling, just return empty list
-            return []
-        except NetworkError as e:
-            print(f"Network error in receive_messages: {e}")
-            return []
-        except TelegramError as e:
-            print(f"Telegram error in receive_messages: {e}")
-            return []
-        except Exception as e:
-            print(f"Unexpected error in receive_messages: {e}")
+    async def send(self, text, sender=None):
+        # Answers go to the configured chat
+        return await self.asend_message(text)
+
+    def commit_offset(self):
+        """
+        Move the offset past the polled updates and persist it, once their messages are
+        stored: the next getUpdates confirms them to Telegram and a restart doesn't receive them again.
+        """
+        if self.polled_update_id > self.last_update_id:
+            self.last_update_id = self.polled_update_id
+            self._save_offset()
+
+    async def poll_messages(self, timeout=30):
+        """
+        Long poll Telegram for new messages. The request stays open up to `timeout`
+        seconds until an update arrives. Call commit_offset once the messages are stored,
+        until then the same updates are returned again by the next poll.
+        """
+        updates = await self.bot.get_updates(
+            offset=self.last_update_id + 1,
+            timeout=timeout,
+            allowed_updates=["message"]
+        )
+        if not updates:
             return []
+
+        print(f"Received {len(updates)} updates from Telegram")
+        new_messages = []
+        self.polled_update_id = self.last_update_id
+        for update in updates:
+            self.polled_update_id = max(self.polled_update_id, update.update_id)
+            message = self._parse_update(update)
+            if message:
+                new_messages.append(message)
+        return new_messages
+
+    async def listen(self, on_messages):
+        """
+        Long poll Telegram and hand new messages to on_messages. Polling never waits for
+        a message to be answered, so the next getUpdates is issued right away.
+        In webhook mode, updates arrive through the server instead.
+        """
+        if self.mode == "webhook":
+            return await super().listen(on_messages)
+        print("Starting to monitor messages...")
+        while True:
+            try:
+                new_messages = await self.poll_messages(timeout=self.poll_timeout)
+                if new_messages:
+                    await on_messages(new_messages)
+                # Confirm the updates to Telegram only once they are safely stored
+                self.commit_offset()
+            except TimedOut:
+                # Expected with long polling when no update arrives in time
+                continue
+            except (NetworkError, TelegramError) as e:
+                print(f"Telegram error while polling: {e}")
+                await asyncio.sleep(1)
+            except Exception as e:
+                print(f"Error while polling Telegram: {str(e)}")
+                await asyncio.sleep(1)
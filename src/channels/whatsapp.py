@@ -1,13 +1,33 @@
 import os
+import uuid
+import asyncio
+import threading
 from twilio.rest import Client
+from src.channels.base import Channel
+from src.utils import get_current_date_time
 
+# Twilio client shared by all channel instances, it keeps its HTTP connections open between replies
+_client = None
+_client_lock = threading.Lock()
+
+def get_twilio_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
+        return _client
+
+
+class WhatsAppChannel(Channel):
+    name = "whatsapp"
+    id_field = "sid"
+    sender_field = "from"
 
-class WhatsAppChannel:
     def __init__(self):
         """
-        Initializes the WhatsAppChannel with Twilio client.
+        Initializes the WhatsAppChannel with the shared Twilio client.
         """
-        self.client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
+        self.client = get_twilio_client()
 
     def send_message(self, to_number, body):
         """
@@ -23,6 +43,20 @@ class WhatsAppChannel:
         except Exception as e:
             return f"Failed to send message: {e}"
 
+    async def send(self, text, sender=None):
+        # The sender is the user's WhatsApp number
+        return await asyncio.to_thread(self.send_message, to_number=sender, body=text)
+
+    def parse_webhook_message(self, body, from_number, message_sid=None):
+        """Convert the form fields of a Twilio webhook request into a message dict"""
+        return {
+            "text": body,
+            "date": get_current_date_time(),
+            "from": from_number,
+            # Twilio retries keep their MessageSid, the inbox deduplicates them
+            "sid": message_sid or uuid.uuid4().hex,
+        }
+
     def receive_messages(self):
         """
         Receiving messages is handled via webhooks.
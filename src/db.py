@@ -0,0 +1,36 @@
+import sqlite3
+import aiosqlite
+from contextlib import asynccontextmanager
+
+# Milliseconds a connection waits for another writer before failing with "database is locked"
+BUSY_TIMEOUT_MS = 5000
+
+# WAL lets readers (and other processes) run while a write is in progress,
+# NORMAL sync skips the fsync on every commit (still safe with WAL)
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+)
+
+def connect(path):
+    """
+    Open the sqlite3 connection shared by the threads of the process.
+    Callers serialize their use of it (SqliteSaver and Inbox hold a lock around
+    every statement), so there is a single writer per connection.
+    """
+    conn = sqlite3.connect(path, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+@asynccontextmanager
+async def aconnect(path):
+    """
+    Open an aiosqlite connection: every statement is queued to the connection's
+    own thread, which acts as the single writer for the coroutines using it.
+    """
+    async with aiosqlite.connect(path) as conn:
+        for pragma in PRAGMAS:
+            await conn.execute(pragma)
+        yield conn
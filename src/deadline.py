@@ -0,0 +1,82 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from src.metrics import metrics
+
+# Smallest timeout handed to network calls, so an almost expired deadline still fails cleanly
+MIN_TIMEOUT = 0.5
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when a request runs past its deadline. Carries the stage that timed
+    out and the partial state reached so far (if any).
+    """
+    def __init__(self, stage: str, partial_state=None):
+        super().__init__(f"{stage} did not finish before the request deadline")
+        self.stage = stage
+        self.partial_state = partial_state
+
+
+class Deadline:
+    """
+    Request-scoped deadline created for each message and carried through the
+    orchestrator, agents and tools. Tools read it through get_timeout/check_deadline.
+    """
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.cancelled = False
+
+    def remaining(self) -> float:
+        if self.cancelled:
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def cancel(self):
+        """Make every stage still running under this deadline stop at its next check"""
+        self.cancelled = True
+
+    def exceeded(self, stage: str, partial_state=None) -> DeadlineExceeded:
+        """Count a timeout of the given stage and return the exception to raise"""
+        metrics.increment(f"timeouts.{stage}")
+        print(f"Deadline exceeded in {stage}")
+        return DeadlineExceeded(stage, partial_state)
+
+    def check(self, stage: str, partial_state=None):
+        if self.expired:
+            raise self.exceeded(stage, partial_state)
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+def get_deadline() -> Optional[Deadline]:
+    """Return the deadline of the request being processed, if any"""
+    return _current_deadline.get()
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]):
+    """Make the deadline visible to everything running in this context (including copied contexts)"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+def get_timeout(default: float) -> float:
+    """Timeout for a blocking call: the default, capped by the time left on the request deadline"""
+    deadline = get_deadline()
+    if deadline is None:
+        return default
+    return max(MIN_TIMEOUT, min(default, deadline.remaining()))
+
+def check_deadline(stage: str):
+    """Raise DeadlineExceeded if the current request deadline has passed"""
+    deadline = get_deadline()
+    if deadline is not None:
+        deadline.check(stage)
@@ -0,0 +1,291 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+from src.db import connect
+from src.metrics import metrics
+from src.utils import get_google_service
+from src.tools.email.read_emails import list_message_ids, fetch_messages, message_fields, GET_BATCH_SIZE
+
+# Gmail history records applied to the mirror
+HISTORY_TYPES = ["messageAdded", "messageDeleted", "labelAdded", "labelRemoved"]
+# Messages with these labels are left out of the mirror, as Gmail leaves them out of searches
+HIDDEN_LABELS = {"TRASH", "SPAM"}
+# Fields of a mirrored message, in table order
+FIELDS = ("id", "thread_id", "internal_date", "subject", "sender", "date", "snippet")
+
+
+class GmailMirror:
+    """
+    Local SQLite copy of the metadata (subject, sender, date, snippet) of the recent Gmail
+    messages, with an FTS5 index over subject, sender and snippet, so reading and searching
+    emails doesn't need a Gmail API call.
+
+    The first sync lists the messages of the last `days` days (at most `max_messages`, the
+    newest ones); later syncs only apply the changes returned by history.list since the
+    stored historyId (a full sync is done again when Gmail no longer has that history).
+    Messages moved to the trash or spam are removed, and copied again when restored.
+    The start of the copied window is kept, see covers: older emails are read through the
+    API. Metrics: gmail_mirror.sync_lag_seconds (read at every snapshot),
+    gmail_mirror.messages and gmail_mirror.index_bytes gauges, gmail_mirror.sync_seconds.
+    """
+    def __init__(self, path=None, days=None, max_messages=None):
+        self.path = path or os.getenv("GMAIL_MIRROR_PATH", "db/gmail.sqlite")
+        self.days = days or int(os.getenv("GMAIL_MIRROR_DAYS", "90"))
+        self.max_messages = max_messages or int(os.getenv("GMAIL_MIRROR_MAX_MESSAGES", "5000"))
+        self._lock = threading.Lock()
+        # A single sync runs at a time (background thread or explicit call)
+        self._sync_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.conn = connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                pk INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                thread_id TEXT,
+                internal_date INTEGER NOT NULL,
+                subject TEXT,
+                sender TEXT,
+                date TEXT,
+                snippet TEXT
+            );
+            CREATE INDEX IF NOT EXISTS messages_internal_date ON messages (internal_date);
+            CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                subject, sender, snippet, content='messages', content_rowid='pk'
+            );
+            -- Keep the full-text index in step with the messages table
+            CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+                INSERT INTO messages_fts (rowid, subject, sender, snippet) VALUES (new.pk, new.subject, new.sender, new.snippet);
+            END;
+            CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, subject, sender, snippet) VALUES ('delete', old.pk, old.subject, old.sender, old.snippet);
+            END;
+            CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE ON messages BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, subject, sender, snippet) VALUES ('delete', old.pk, old.subject, old.sender, old.snippet);
+                INSERT INTO messages_fts (rowid, subject, sender, snippet) VALUES (new.pk, new.subject, new.sender, new.snippet);
+            END;
+            CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self.conn.commit()
+
+    def _get_state(self, key):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    @property
+    def history_id(self):
+        return self._get_state("history_id")
+
+    @property
+    def ready(self) -> bool:
+        """Whether a full sync completed, so queries can be answered locally"""
+        return self.history_id is not None
+
+    def covers(self, after):
+        """Whether a full sync completed and it copied every message received from `after` (timestamp) on"""
+        window_start = self._get_state("window_start")
+        return self.ready and window_start is not None and after is not None and after >= float(window_start)
+
+    def sync_lag(self):
+        """Seconds since the last successful sync (None before the first one)"""
+        synced_at = self._get_state("synced_at")
+        return time.time() - float(synced_at) if synced_at else None
+
+    def _store(self, messages, deleted_ids=(), history_id=None, replace=False, state=None):
+        """Apply fetched messages and deletions (and the new historyId and sync `state`) in one transaction"""
+        rows = [tuple(message_fields(message)[field] for field in FIELDS) for message in messages]
+        with self._lock, self.conn:
+            if replace:
+                self.conn.execute("DELETE FROM messages")
+            self.conn.executemany(
+                f"INSERT INTO messages ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))}) "
+                "ON CONFLICT (id) DO UPDATE SET thread_id = excluded.thread_id, internal_date = excluded.internal_date, "
+                "subject = excluded.subject, sender = excluded.sender, date = excluded.date, snippet = excluded.snippet",
+                rows
+            )
+            self.conn.executemany("DELETE FROM messages WHERE id = ?", [(message_id,) for message_id in deleted_ids])
+            state = {**(state or {}), "synced_at": str(time.time())}
+            if history_id is not None:
+                state["history_id"] = str(history_id)
+            self.conn.executemany("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", list(state.items()))
+
+    def _fetch(self, service, message_ids):
+        """
+        Metadata of the messages, deleted ones skipped. Fails when others still can't be read,
+        so the sync is retried from the same point instead of losing them.
+        """
+        messages = []
+        unread = []
+        for start in range(0, len(message_ids), GET_BATCH_SIZE):
+            messages.extend(fetch_messages(service, message_ids[start:start + GET_BATCH_SIZE], unread))
+        if unread:
+            raise RuntimeError(f"{len(unread)} emails couldn't be read")
+        return messages
+
+    def _full_sync(self, service):
+        # Read the historyId first, changes made while listing are applied by the next sync
+        history_id = service.users().getProfile(userId='me').execute()["historyId"]
+        window_start = time.time() - self.days * 24 * 3600
+        message_ids = list(list_message_ids(service, f"newer_than:{self.days}d", self.max_messages))
+        messages = self._fetch(service, message_ids)
+        capped = len(message_ids) >= self.max_messages
+        if capped and messages:
+            # The older messages of the window were left out: the copy starts after the
+            # second of the oldest one kept (others received that second may be missing)
+            window_start = min(int(message['internalDate']) for message in messages) // 1000 + 1
+        state = {"window_start": str(window_start), "capped": str(int(capped))}
+        self._store(messages, history_id=history_id, replace=True, state=state)
+        metrics.increment("gmail_mirror.full_syncs")
+        return len(message_ids)
+
+    def _incremental_sync(self, service, start_history_id):
+        # Last change of every message, in history order: True to (re)fetch it, False to remove it
+        changes = {}
+        history_id = start_history_id
+        page_token = None
+        while True:
+            response = service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=HISTORY_TYPES,
+                pageToken=page_token
+            ).execute()
+            for record in response.get("history", []):
+                for change in record.get("messagesAdded", []):
+                    changes[change["message"]["id"]] = not HIDDEN_LABELS & set(change["message"].get("labelIds", []))
+                for change in record.get("messagesDeleted", []):
+                    changes[change["message"]["id"]] = False
+                # Moved to the trash or spam, or restored from there
+                for change in record.get("labelsAdded", []):
+                    if HIDDEN_LABELS & set(change.get("labelIds", [])):
+                        changes[change["message"]["id"]] = False
+                for change in record.get("labelsRemoved", []):
+                    if HIDDEN_LABELS & set(change.get("labelIds", [])):
+                        changes[change["message"]["id"]] = True
+            history_id = response.get("historyId", history_id)
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+        added = [message_id for message_id, visible in changes.items() if visible]
+        messages = self._fetch(service, added)
+        # A message taken out of the spam can still be in the trash (or the other way around)
+        hidden = [message['id'] for message in messages if HIDDEN_LABELS & set(message.get('labelIds', []))]
+        messages = [message for message in messages if message['id'] not in hidden]
+        deleted = [message_id for message_id, visible in changes.items() if not visible] + hidden
+        self._store(messages, deleted, history_id=history_id)
+        return len(changes)
+
+    def sync(self, service=None):
+        """Bring the mirror up to date, returns the number of messages added, changed or deleted"""
+        from googleapiclient.errors import HttpError
+        service = service or get_google_service('gmail', 'v1')
+        with self._sync_lock, metrics.timer("gmail_mirror.sync_seconds"):
+            history_id = self.history_id
+            # Mirrors synced before the window start was kept are synced again
+            if history_id is None or self._get_state("window_start") is None:
+                changes = self._full_sync(service)
+            else:
+                try:
+                    changes = self._incremental_sync(service, history_id)
+                except HttpError as e:
+                    # 404: the history is too old (Gmail keeps about a week), start over
+                    if e.resp.status != 404:
+                        raise
+                    print("Gmail history expired, syncing the mirror again")
+                    changes = self._full_sync(service)
+        metrics.increment("gmail_mirror.changes", changes)
+        self.update_metrics()
+        return changes
+
+    def query(self, after, before, sender=None, limit=100):
+        """Messages received between two timestamps (seconds), optionally from a sender, newest first"""
+        sql = "SELECT * FROM messages WHERE internal_date >= ? AND internal_date < ?"
+        params = [int(after) * 1000, int(before) * 1000]
+        if sender:
+            sql += " AND sender LIKE ?"
+            params.append(f"%{sender}%")
+        with self._lock:
+            rows = self.conn.execute(sql + " ORDER BY internal_date DESC LIMIT ?", (*params, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def search(self, text, limit=20, after=None):
+        """
+        Messages whose subject, sender or snippet contain all the words of the text (and
+        received from `after` on, a timestamp), best matches first
+        """
+        words = re.findall(r"\w+", text)
+        if not words:
+            return []
+        # Quote every word so FTS5 operators in the text are matched literally
+        match = " ".join(f'"{word}"' for word in words)
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT messages.* FROM messages_fts JOIN messages ON messages.pk = messages_fts.rowid "
+                "WHERE messages_fts MATCH ? AND messages.internal_date >= ? ORDER BY bm25(messages_fts) LIMIT ?",
+                (match, int(after or 0) * 1000, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            count = self.conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+            page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+            page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        return {"messages": count, "index_bytes": page_count * page_size, "sync_lag_seconds": self.sync_lag()}
+
+    def update_metrics(self):
+        stats = self.stats()
+        metrics.set_gauge("gmail_mirror.messages", stats["messages"])
+        metrics.set_gauge("gmail_mirror.index_bytes", stats["index_bytes"])
+        # Read when the metrics are, so it keeps growing while the syncs fail or stall
+        metrics.set_gauge_function("gmail_mirror.sync_lag_seconds", self.sync_lag)
+
+    def start(self, interval=None):
+        """Sync now and then every `interval` seconds in a background thread"""
+        interval = interval or float(os.getenv("GMAIL_SYNC_INTERVAL", "60"))
+
+        def run():
+            while True:
+                try:
+                    self.sync()
+                except Exception as e:
+                    print(f"Error syncing the Gmail mirror: {e}")
+                    metrics.increment("gmail_mirror.sync_errors")
+                    self.update_metrics()
+                if self._stopped.wait(interval):
+                    return
+
+        thread = threading.Thread(target=run, name="gmail-mirror-sync", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stopped.set()
+
+    def close(self):
+        self.stop()
+        metrics.remove_gauge("gmail_mirror.sync_lag_seconds")
+        with self._lock:
+            self.conn.close()
+
+
+_gmail_mirror = None
+_gmail_mirror_lock = threading.Lock()
+
+def get_gmail_mirror():
+    """Return the process-wide Gmail mirror, or None when it is disabled (GMAIL_MIRROR=false)"""
+    global _gmail_mirror
+    if os.getenv("GMAIL_MIRROR", "false").lower() != "true":
+        return None
+    with _gmail_mirror_lock:
+        if _gmail_mirror is None:
+            _gmail_mirror = GmailMirror()
+        return _gmail_mirror
+
+def start_gmail_mirror():
+    """Start syncing the Gmail mirror in the background when it is enabled"""
+    mirror = get_gmail_mirror()
+    return mirror.start() if mirror else None
@@ -0,0 +1,261 @@
+import os
+import json
+import sqlite3
+import time
+import threading
+from src.metrics import metrics
+from src.db import connect
+
+# Status of an inbox item
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+FAILED = "failed"
+
+# Items that can be claimed: pending ones whose backoff elapsed, or claimed ones never acked in time
+DUE_CONDITION = "((status = 'pending' AND available_at <= ?) OR (status = 'claimed' AND claimed_at <= ?))"
+
+
+class Inbox:
+    """
+    Durable inbox (SQLite, WAL mode) for incoming messages of every channel.
+
+    Messages are enqueued as soon as they are received, deduplicated by their
+    channel's ID (Telegram update_id, Twilio MessageSid, Slack ts), then claimed
+    by the workers and acked once answered. Items claimed by a process that died
+    become pending again after `visibility_timeout` seconds (or at startup through
+    release_claimed) and are redelivered. A live process passes the ids it is still
+    working on as `exclude`, so its own slow items are never claimed a second time.
+
+    With a HashRing, every item is assigned to the worker process owning its
+    conversation, and workers only claim their own items.
+    """
+    def __init__(self, path=None, max_attempts=None, visibility_timeout=None, ring=None):
+        self.path = path or os.getenv("INBOX_PATH", "db/inbox.sqlite")
+        self.ring = ring
+        self.max_attempts = max_attempts or int(os.getenv("INBOX_MAX_ATTEMPTS", "3"))
+        self.visibility_timeout = visibility_timeout or float(os.getenv("INBOX_VISIBILITY_TIMEOUT", "300"))
+        self._lock = threading.Lock()
+        # WAL connection, statements are serialized by the lock
+        self.conn = connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS inbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel TEXT NOT NULL,
+                external_id TEXT NOT NULL,
+                sender TEXT,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                enqueued_at REAL NOT NULL,
+                available_at REAL NOT NULL,
+                claimed_at REAL,
+                worker INTEGER,
+                UNIQUE (channel, external_id)
+            )
+        """)
+        # Inboxes created before worker processes existed
+        if "worker" not in [column["name"] for column in self.conn.execute("PRAGMA table_info(inbox)")]:
+            self.conn.execute("ALTER TABLE inbox ADD COLUMN worker INTEGER")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS inbox_status ON inbox (channel, status, available_at)")
+        self.conn.commit()
+
+    def enqueue_many(self, channel, items):
+        """
+        Store a batch of (external_id, payload, sender) in a single transaction.
+        Returns the number of new items, duplicates are ignored.
+        """
+        now = time.time()
+        rows = [
+            (channel, str(external_id), sender, json.dumps(payload), now, now, self.worker_for(channel, sender))
+            for external_id, payload, sender in items
+        ]
+        with self._lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO inbox (channel, external_id, sender, payload, enqueued_at, available_at, worker) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            inserted = self.conn.total_changes - before
+        metrics.increment(f"inbox.enqueued.{channel}", inserted)
+        metrics.increment("inbox.duplicates", len(rows) - inserted)
+        return inserted
+
+    def enqueue(self, channel, external_id, payload, sender=None):
+        """Store one message, returns False if it was already received"""
+        return self.enqueue_many(channel, [(external_id, payload, sender)]) == 1
+
+    def worker_for(self, channel, sender):
+        """Worker process owning the conversation (None without a ring)"""
+        return self.ring.get(f"{channel}:{sender}") if self.ring else None
+
+    def reassign(self):
+        """Reassign the unfinished items to the ring's workers (after the number of workers changed)"""
+        with self._lock, self.conn:
+            rows = self.conn.execute(
+                "SELECT id, channel, sender FROM inbox WHERE status IN ('pending', 'claimed')"
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE inbox SET worker = ? WHERE id = ?",
+                [(self.worker_for(row["channel"], row["sender"]), row["id"]) for row in rows]
+            )
+        return len(rows)
+
+    def _worker_filter(self, worker):
+        return ("", ()) if worker is None else (" AND worker = ?", (worker,))
+
+    def _exclude_filter(self, exclude):
+        exclude = tuple(exclude)
+        return ("", ()) if not exclude else (f" AND id NOT IN ({', '.join('?' * len(exclude))})", exclude)
+
+    def _mark_claimed(self, rows, now):
+        """Mark the selected rows as claimed (inside the caller's transaction) and return them as items"""
+        self.conn.executemany(
+            "UPDATE inbox SET status = 'claimed', attempts = attempts + 1, claimed_at = ? WHERE id = ?",
+            [(now, row["id"]) for row in rows]
+        )
+        items = []
+        for row in rows:
+            item = dict(row)
+            item["payload"] = json.loads(row["payload"])
+            item["attempts"] += 1
+            if item["attempts"] > 1:
+                metrics.increment("inbox.redeliveries")
+            items.append(item)
+        return items
+
+    def claim(self, channel, limit=1, worker=None, exclude=()):
+        """
+        Claim up to `limit` due items of a channel (and worker), oldest first. Items
+        claimed earlier but never acked within the visibility timeout are claimed again,
+        except the `exclude` ids (the caller's items still in progress).
+        """
+        now = time.time()
+        worker_filter, worker_params = self._worker_filter(worker)
+        exclude_filter, exclude_params = self._exclude_filter(exclude)
+        with self._lock, self.conn:
+            # Take the write lock before reading, so two processes can't claim the same items
+            self.conn.execute("BEGIN IMMEDIATE")
+            rows = self.conn.execute(
+                f"SELECT * FROM inbox WHERE channel = ? AND {DUE_CONDITION}{worker_filter}{exclude_filter} ORDER BY id LIMIT ?",
+                (channel, now, now - self.visibility_timeout, *worker_params, *exclude_params, limit)
+            ).fetchall()
+            return self._mark_claimed(rows, now) if rows else []
+
+    def claim_conversation(self, channel, debounce, max_wait=None, worker=None, exclude=()):
+        """
+        Claim all due items of the sender whose conversation is oldest, once the sender
+        has been quiet for `debounce` seconds (or its first item waited `max_wait`).
+        Messages sent in quick succession are thus returned together, see coalesce.
+        The `exclude` ids (the caller's items still in progress) are never claimed again.
+        """
+        now = time.time()
+        max_wait = max_wait if max_wait is not None else debounce * 5
+        worker_filter, worker_params = self._worker_filter(worker)
+        exclude_filter, exclude_params = self._exclude_filter(exclude)
+        with self._lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            conversation = self.conn.execute(
+                f"SELECT sender FROM inbox WHERE channel = ? AND {DUE_CONDITION}{worker_filter}{exclude_filter} "
+                "GROUP BY sender HAVING MAX(enqueued_at) <= ? OR MIN(enqueued_at) <= ? ORDER BY MIN(id) LIMIT 1",
+                (channel, now, now - self.visibility_timeout, *worker_params, *exclude_params, now - debounce, now - max_wait)
+            ).fetchone()
+            if not conversation:
+                return []
+            rows = self.conn.execute(
+                f"SELECT * FROM inbox WHERE channel = ? AND sender IS ? AND {DUE_CONDITION}{exclude_filter} ORDER BY id",
+                (channel, conversation["sender"], now, now - self.visibility_timeout, *exclude_params)
+            ).fetchall()
+            return self._mark_claimed(rows, now) if rows else []
+
+    def ack(self, item_ids):
+        """Mark an item (or a list of items answered together) as answered"""
+        item_ids = item_ids if isinstance(item_ids, list) else [item_ids]
+        with self._lock, self.conn:
+            self.conn.executemany("UPDATE inbox SET status = 'done' WHERE id = ?", [(item_id,) for item_id in item_ids])
+        metrics.increment("inbox.acked", len(item_ids))
+
+    def retry(self, items):
+        """
+        Make claimed items (an item or a list answered together) pending again after an
+        exponential backoff. Returns False (and marks them failed) once they used all their attempts.
+        """
+        items = items if isinstance(items, list) else [items]
+        ids = [(item["id"],) for item in items]
+        attempts = max(item["attempts"] for item in items)
+        if attempts >= self.max_attempts:
+            with self._lock, self.conn:
+                self.conn.executemany("UPDATE inbox SET status = 'failed' WHERE id = ?", ids)
+            metrics.increment("inbox.failed", len(ids))
+            return False
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE inbox SET status = 'pending', available_at = ? WHERE id = ?",
+                [(time.time() + 2 ** attempts, item_id) for item_id, in ids]
+            )
+        metrics.increment("inbox.retries", len(ids))
+        return True
+
+    def release_claimed(self, channel, worker=None):
+        """Make the items claimed by a previous run of this process pending again (used at startup)"""
+        worker_filter, worker_params = self._worker_filter(worker)
+        with self._lock, self.conn:
+            released = self.conn.execute(
+                f"UPDATE inbox SET status = 'pending' WHERE channel = ? AND status = 'claimed'{worker_filter}",
+                (channel, *worker_params)
+            ).rowcount
+        if released:
+            print(f"Released {released} unfinished {channel} messages from the inbox")
+        return released
+
+    def pending_count(self, channel):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM inbox WHERE channel = ? AND status IN ('pending', 'claimed')", (channel,)
+            ).fetchone()[0]
+
+    def prune(self, older_than=7 * 24 * 3600):
+        """Delete answered and failed items, keeping recent ones so redeliveries are still deduplicated"""
+        with self._lock, self.conn:
+            return self.conn.execute(
+                "DELETE FROM inbox WHERE status IN ('done', 'failed') AND enqueued_at < ?",
+                (time.time() - older_than,)
+            ).rowcount
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def coalesce(items):
+    """
+    Merge the messages of items claimed together into a single message (texts joined
+    in arrival order, date of the last one) answered by one assistant turn.
+    """
+    payloads = [item["payload"] for item in items]
+    message = dict(payloads[-1])
+    message["text"] = "\n".join(payload["text"] for payload in payloads)
+    metrics.increment("coalesce.messages", len(items))
+    metrics.increment("coalesce.turns")
+    return message
+
+
+def coalescing_stats():
+    """
+    Return how many messages were merged per assistant turn and the estimated
+    LLM calls saved (turns avoided times the average LLM calls of a turn).
+    """
+    counters = metrics.snapshot()["counters"]
+    messages = counters.get("coalesce.messages", 0)
+    turns = counters.get("coalesce.turns", 0)
+    assistant_turns = counters.get("assistant.turns", 0)
+    llm_calls_per_turn = counters.get("llm.calls", 0) / assistant_turns if assistant_turns else 0.0
+    return {
+        "messages": messages,
+        "turns": turns,
+        "coalescing_ratio": messages / turns if turns else 0.0,
+        "turns_saved": messages - turns,
+        "llm_calls_saved": (messages - turns) * llm_calls_per_turn
+    }
@@ -0,0 +1,116 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Metrics:
+    """
+    Process-wide, thread-safe store for counters, gauges and latency histograms.
+    Gauges are either set to their current value or read from a function when a
+    snapshot is taken (values that change on their own, like the time since an event).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.gauge_functions = {}
+        self.timings = {}
+
+    def increment(self, name, value=1):
+        """Increment a counter"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """Set a gauge to its current value"""
+        with self._lock:
+            self.gauges[name] = value
+
+    def set_gauge_function(self, name, func):
+        """Read a gauge from func() at every snapshot (a None value leaves the gauge out)"""
+        with self._lock:
+            self.gauge_functions[name] = func
+
+    def remove_gauge(self, name):
+        with self._lock:
+            self.gauges.pop(name, None)
+            self.gauge_functions.pop(name, None)
+
+    def _read_gauge_functions(self):
+        """Current values of the function gauges, read without the lock (they may record metrics)"""
+        with self._lock:
+            functions = dict(self.gauge_functions)
+        values = {}
+        for name, func in functions.items():
+            try:
+                value = func()
+            except Exception as e:
+                print(f"Error reading gauge {name}: {e}")
+                continue
+            if value is not None:
+                values[name] = value
+        return values
+
+    def observe(self, name, seconds):
+        """Record a duration in the histogram of the given name"""
+        with self._lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = {
+                    "count": 0,
+                    "total": 0.0,
+                    "max": 0.0,
+                    "buckets": [0] * (len(LATENCY_BUCKETS) + 1)
+                }
+                self.timings[name] = timing
+            timing["count"] += 1
+            timing["total"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    timing["buckets"][i] += 1
+                    break
+            else:
+                timing["buckets"][-1] += 1
+
+    def average(self, name):
+        """Return the average duration recorded for the given name (0 if none)"""
+        with self._lock:
+            timing = self.timings.get(name)
+            return timing["total"] / timing["count"] if timing else 0.0
+
+    @contextmanager
+    def timer(self, name):
+        """Context manager recording the duration of its block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        """Return a JSON-serializable copy of all metrics"""
+        function_gauges = self._read_gauge_functions()
+        with self._lock:
+            timings = {}
+            for name, timing in self.timings.items():
+                buckets = {f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS, timing["buckets"])}
+                buckets["le_inf"] = timing["buckets"][-1]
+                timings[name] = {
+                    "count": timing["count"],
+                    "avg": timing["total"] / timing["count"] if timing["count"] else 0.0,
+                    "max": timing["max"],
+                    "buckets": buckets
+                }
+            return {
+                "counters": dict(self.counters),
+                "gauges": {**self.gauges, **function_gauges},
+                "timings": timings
+            }
+
+
+# Shared metrics instance for the whole process
+metrics = Metrics()
@@ -1,4 +1,4 @@
-from .manager_agent import ASSISTANT_MANAGER_PROMPT
+from .manager_agent import ASSISTANT_MANAGER_PROMPT, DIRECT_TOOLS_PROMPT
 from .email_agent import EMAIL_AGENT_PROMPT
 from .notion_agent import NOTION_AGENT_PROMPT
 from .calendar_agent import CALENDAR_AGENT_PROMPT
@@ -8,6 +8,7 @@ from .researcher_agent import RESEARCHER_AGENT_PROMPT
 __all__ = [
     'ASSISTANT_MANAGER_PROMPT',
     'CALENDAR_AGENT_PROMPT', 
+    'DIRECT_TOOLS_PROMPT',
     'EMAIL_AGENT_PROMPT', 
     'NOTION_AGENT_PROMPT', 
     'RESEARCHER_AGENT_PROMPT',
@@ -31,6 +31,9 @@ to read or write emails to my contacts.
 
   * You can retrieve a specific email of a specific contact by using the email option in the email field. You will only use the email option if you have been explicitly provided with an email to check.
 
+* **SearchEmails:** Use this tool to find emails about a topic or from a sender when you don't know when they were received,
+by giving words that appear in their subject, sender or content. Give a From date when the emails are known to be recent.
+
 * **SendEmail:** Use this tool to send emails to my contacts on my behalf.
 
 **# Notes**
@@ -58,3 +58,10 @@ Your primary responsibilities include:
 - Avoid **lengthy** messages or paragraphs.
 - **Today’s date is: {date_time}**
 """
+
+DIRECT_TOOLS_PROMPT = """
+# **Direct Tools**
+
+For simple lookups you can call these tools yourself instead of delegating to a subagent: {tools}.
+Use them only when a single call answers the request, delegate anything else to the subagents as usual.
+"""
@@ -0,0 +1,261 @@
+import time
+import signal
+import asyncio
+from contextlib import asynccontextmanager, AsyncExitStack
+from src.channels.dispatcher import OutboundDispatcher
+from src.agents.personal_assistant import conversation_config
+from src.db import aconnect
+from src.worker_pool import KeyedWorkerPool, QueueFull, PoolClosed
+from src.inbox import coalesce, coalescing_stats
+from src.sharding import WakeupSocket, notify_worker
+from src.metrics import metrics
+from src.utils import get_current_date_time
+
+
+def create_channel(name):
+    """Instantiate a channel by name, only the channels in use are imported"""
+    if name == "telegram":
+        from src.channels.telegram import TelegramChannel
+        return TelegramChannel()
+    if name == "slack":
+        from src.channels.slack import SlackChannel
+        return SlackChannel()
+    if name == "whatsapp":
+        from src.channels.whatsapp import WhatsAppChannel
+        return WhatsAppChannel()
+    raise ValueError(f"Unknown channel: {name}")
+
+
+class AssistantRuntime:
+    """
+    Serves every configured channel from one event loop with a single personal
+    assistant, inbox, dispatcher and worker pool:
+
+    - channels receive messages (their listener or the webhook server) and store them in the inbox
+    - the feeder claims them and the workers answer them, one at a time per conversation
+    - answers go back through the dispatcher on the channel they came from
+
+    Without an assistant (the server of launcher.py), messages are only stored and the
+    worker process owning the conversation is woken up. Per-channel metrics:
+    <channel>.poll_to_dispatch, <channel>.turn_seconds, <channel>.answered, <channel>.backlog.
+    """
+    def __init__(self, channels, inbox, personal_assistant=None, db_path=None, workers=4, max_queue=100,
+                 debounce=0.0, debounce_max_wait=10.0, metrics_log_interval=0):
+        self.channels = {channel.name: channel for channel in channels}
+        self.inbox = inbox
+        self.personal_assistant = personal_assistant
+        self.db_path = db_path
+        # Messages of a sender arriving within `debounce` seconds are answered in one turn (0 = disabled)
+        self.debounce = debounce
+        self.debounce_max_wait = debounce_max_wait
+        self.metrics_log_interval = metrics_log_interval
+        # Every answer goes out through the dispatcher (chunking, rate limiting, send latency)
+        self.dispatcher = OutboundDispatcher()
+        for channel in channels:
+            self.dispatcher.register(channel.name, channel.send)
+        # One message at a time per conversation, conversations in parallel
+        self.pool = KeyedWorkerPool(self.process, workers=workers, max_queue=max_queue, name="workers")
+        # Ids of the inbox items claimed by this process and not answered yet: an item can wait
+        # in the pool's queue longer than the visibility timeout, it must not be claimed again
+        self.in_flight = set()
+        self.wakeup = asyncio.Event()
+        self.started_at = time.monotonic()
+
+    @property
+    def front_end_only(self) -> bool:
+        return self.personal_assistant is None
+
+    async def admit(self, channel_name):
+        """
+        Check that a pushed (webhook) message can be accepted: raises PoolClosed while the
+        workers aren't running and QueueFull when too many messages are waiting.
+        """
+        if not self.front_end_only and not self.pool.running:
+            raise PoolClosed("The workers are not running")
+        worker_processes = len(self.inbox.ring.nodes) if self.inbox.ring else 1
+        if await asyncio.to_thread(self.inbox.pending_count, channel_name) >= self.pool.max_queue * worker_processes:
+            metrics.increment(f"{channel_name}.rejected")
+            raise QueueFull(f"Too many {channel_name} messages waiting")
+
+    async def store(self, channel_name, messages):
+        """
+        Save received messages in the inbox (one transaction per batch, redeliveries are ignored)
+        and wake the feeder, or the worker processes owning the conversations, up.
+        Inbox statements run in a thread, they can wait on the file lock held by another process.
+        """
+        channel = self.channels[channel_name]
+        if not messages:
+            return 0
+        rows = [(channel.message_id(message), message, channel.sender(message)) for message in messages]
+        inserted = await asyncio.to_thread(self.inbox.enqueue_many, channel_name, rows)
+        if inserted:
+            if self.front_end_only:
+                for worker in {self.inbox.worker_for(channel_name, sender) for _, _, sender in rows}:
+                    notify_worker(worker)
+            else:
+                self.wakeup.set()
+        await self._update_backlog(channel_name)
+        return inserted
+
+    async def _update_backlog(self, channel_name):
+        metrics.set_gauge(f"{channel_name}.backlog", await asyncio.to_thread(self.inbox.pending_count, channel_name))
+
+    async def process(self, items):
+        """
+        Answer messages of one conversation claimed together from the inbox: invoke the
+        assistant in the sender's thread (failed turns are retried with backoff), send the
+        answer on the channel the messages came from and ack them.
+        """
+        try:
+            await self._answer(items)
+        finally:
+            self.in_flight.difference_update(item["id"] for item in items)
+
+    async def _answer(self, items):
+        item = items[0]
+        channel_name = item["channel"]
+        message = coalesce(items) if self.debounce > 0 else item["payload"]
+        metrics.observe(f"{channel_name}.poll_to_dispatch", time.time() - item["enqueued_at"])
+        print(f"\nProcessing {channel_name} message: {message['text']}")
+        sent_message = (
+            f"Message: {message['text']}\n"
+            f"Current Date/time: {message.get('date') or get_current_date_time()}"
+        )
+
+        try:
+            with metrics.timer(f"{channel_name}.turn_seconds"):
+                answer = await self.personal_assistant.ainvoke(
+                    sent_message, config=conversation_config(channel_name, item["sender"])
+                )
+        except Exception as e:
+            print(f"Error processing message: {str(e)}")
+            if await asyncio.to_thread(self.inbox.retry, items):
+                return
+            answer = f"Sorry, I encountered an error: {str(e)}"
+
+        print(f"Sending response: {answer[:100]}...")
+        await self.dispatcher.dispatch(channel_name, answer, sender=item["sender"])
+        await asyncio.to_thread(self.inbox.ack, [item["id"] for item in items])
+        metrics.increment(f"{channel_name}.answered", len(items))
+        await self._update_backlog(channel_name)
+
+    async def feed(self, worker=None, wakeup_socket=None):
+        """
+        Claim due messages from the inbox and hand them to the workers as they have room.
+        With debounce, a sender's messages are claimed together once they stop coming.
+        A worker process only claims its own conversations and is woken up through its socket.
+        Claims run in a thread with a copy of the in-flight ids, which the workers keep changing.
+        """
+        while True:
+            batches = []
+            for channel_name in self.channels:
+                while self.pool.depth + len(batches) < self.pool.max_queue:
+                    if self.debounce > 0:
+                        items = await asyncio.to_thread(
+                            self.inbox.claim_conversation, channel_name, self.debounce, self.debounce_max_wait,
+                            worker=worker, exclude=list(self.in_flight)
+                        )
+                    else:
+                        items = await asyncio.to_thread(
+                            self.inbox.claim, channel_name, worker=worker, exclude=list(self.in_flight)
+                        )
+                    if not items:
+                        break
+                    self.in_flight.update(item["id"] for item in items)
+                    batches.append(items)
+            for items in batches:
+                self.pool.submit(f"{items[0]['channel']}:{items[0]['sender']}", items)
+            if not batches:
+                # Also wake up regularly for retries whose backoff (or debounce window) has elapsed
+                timeout = min(1, self.debounce / 4) or 1
+                if wakeup_socket:
+                    await wakeup_socket.wait(timeout)
+                    continue
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    def throughput(self):
+        """Messages received, answered and waiting per channel, with the answer rate since startup"""
+        counters = metrics.snapshot()["counters"]
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            channel_name: {
+                "received": counters.get(f"inbox.enqueued.{channel_name}", 0),
+                "answered": counters.get(f"{channel_name}.answered", 0),
+                "answered_per_second": counters.get(f"{channel_name}.answered", 0) / elapsed,
+                "average_turn_seconds": metrics.average(f"{channel_name}.turn_seconds"),
+                "backlog": self.inbox.pending_count(channel_name)
+            }
+            for channel_name in self.channels
+        }
+
+    async def log_metrics(self):
+        """Periodically print a snapshot of the metrics"""
+        while True:
+            await asyncio.sleep(self.metrics_log_interval)
+            print(f"Metrics: {metrics.snapshot()}")
+            print(f"Throughput: {await asyncio.to_thread(self.throughput)}")
+            if self.debounce > 0:
+                print(f"Coalescing: {coalescing_stats()}")
+
+    @asynccontextmanager
+    async def run(self, receive=True, worker=None, wakeup_socket=None):
+        """
+        Start the channels and, with `receive`, their listeners storing messages in the inbox.
+        With an assistant, the async DB connection is opened on the running loop and the
+        inbox's messages are answered (only `worker`'s ones in a worker process).
+        """
+        async with AsyncExitStack() as stack:
+            for channel in self.channels.values():
+                await channel.start(receive)
+                stack.push_async_callback(channel.stop)
+
+            tasks = []
+            if not self.front_end_only:
+                async_conn = await stack.enter_async_context(aconnect(self.db_path))
+                self.personal_assistant.set_async_connection(async_conn)
+                tasks.append(asyncio.create_task(self.personal_assistant.awarm_up()))
+                # Messages left unfinished by a previous run are processed first
+                for channel_name in self.channels:
+                    await asyncio.to_thread(self.inbox.release_claimed, channel_name, worker=worker)
+                self.wakeup.set()
+                self.pool.start()
+                stack.push_async_callback(self.pool.stop)
+                tasks.append(asyncio.create_task(self.feed(worker, wakeup_socket)))
+            if receive:
+                for channel_name, channel in self.channels.items():
+                    on_messages = lambda messages, channel_name=channel_name: self.store(channel_name, messages)
+                    tasks.append(asyncio.create_task(channel.listen(on_messages)))
+            if self.metrics_log_interval > 0:
+                tasks.append(asyncio.create_task(self.log_metrics()))
+
+            self.started_at = time.monotonic()
+            try:
+                yield self
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run_worker(self, index):
+        """
+        Main of a worker process started by launcher.py: answers the messages of the
+        conversations the hash ring assigns to `index` until SIGINT/SIGTERM, the
+        front-end wakes it up through its socket.
+        """
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        wakeup_socket = WakeupSocket(index)
+        wakeup_socket.bind()
+        try:
+            async with self.run(receive=False, worker=index, wakeup_socket=wakeup_socket):
+                print(f"Worker {index} of {len(self.inbox.ring.nodes)} is running")
+                await stop.wait()
+        finally:
+            wakeup_socket.close()
@@ -0,0 +1,86 @@
+import os
+import socket
+import asyncio
+import hashlib
+from bisect import bisect
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping conversation keys to worker processes. Each worker
+    owns `replicas` points of the ring, so changing the number of workers only
+    moves the conversations of the workers added or removed.
+    """
+    def __init__(self, nodes, replicas: int = 100):
+        self.nodes = list(nodes)
+        self.points = sorted(
+            (self._hash(f"{node}#{replica}"), node)
+            for node in self.nodes
+            for replica in range(replicas)
+        )
+        self.hashes = [point for point, _ in self.points]
+
+    def _hash(self, key) -> int:
+        return int.from_bytes(hashlib.md5(str(key).encode()).digest()[:8], "big")
+
+    def get(self, key):
+        """Return the node owning the key"""
+        index = bisect(self.hashes, self._hash(key)) % len(self.points)
+        return self.points[index][1]
+
+
+def launched_worker_processes():
+    """
+    Number of worker processes answering the messages when the app was started by
+    launcher.py (LAUNCHER=1, set for the front-end and its workers), 0 when the app runs
+    on its own and answers the messages itself, whatever WORKER_PROCESSES says.
+    """
+    if os.getenv("LAUNCHER") != "1":
+        return 0
+    return int(os.getenv("WORKER_PROCESSES", "0"))
+
+
+def wakeup_socket_path(worker):
+    return os.path.join(os.getenv("WORKER_SOCKET_DIR", "db"), f"worker-{worker}.sock")
+
+
+class WakeupSocket:
+    """
+    Unix datagram socket a worker process listens on, so the front-end can wake
+    it up as soon as a message is stored for it instead of waiting for its next poll.
+    """
+    def __init__(self, worker):
+        self.path = wakeup_socket_path(worker)
+        self.sock = None
+
+    def bind(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        self.sock.setblocking(False)
+
+    async def wait(self, timeout):
+        """Wait for a notification, or until the timeout to poll for due retries"""
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.wait_for(loop.sock_recv(self.sock, 64), timeout=timeout)
+            # Drain notifications sent meanwhile, one claim pass handles them all
+            while True:
+                self.sock.recv(64)
+        except (asyncio.TimeoutError, BlockingIOError):
+            pass
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+            os.remove(self.path)
+
+
+def notify_worker(worker):
+    """Wake a worker process up, it will still find the message on its next poll if this fails"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        try:
+            sock.sendto(b"1", wakeup_socket_path(worker))
+        except OSError:
+            pass
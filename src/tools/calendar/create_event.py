@@ -5,9 +5,8 @@ from email.utils import parseaddr
 from langsmith import traceable
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from src.utils import get_credentials
+from src.deadline import DeadlineExceeded, check_deadline
+from src.utils import get_credentials, get_google_service
 
 class AddEventToCalendarInput(BaseModel):
     title: str = Field(description="Title of the event")
@@ -20,6 +19,9 @@ class AddEventToCalendarInput(BaseModel):
 @traceable(run_type="tool", name="AddEventToCalendar")
 def add_event_to_calendar(title: str, description: str, start_time: str, duration_minutes: int = 60, attendees: str = ""):
     "Use this to create a new event in my calendar with optional attendees"
+    from googleapiclient.errors import HttpError
+    from src.calendar_store import get_calendar_store
+    check_deadline("AddEventToCalendar")
     try:
         # Log the attempt
         print(f"Attempting to create calendar event: '{title}' at {start_time}")
@@ -31,8 +33,8 @@ def add_event_to_calendar(title: str, description: str, start_time: str, duratio
             print(error_msg)
             return error_msg
             
-        # Build the calendar service
-        service = build("calendar", "v3", credentials=creds)
+        # Shared calendar service client
+        service = get_google_service("calendar", "v3", creds)
 
         # Parse attendees
         attendee_list = []
@@ -96,6 +98,10 @@ def add_event_to_calendar(title: str, description: str, start_time: str, duratio
         try:
             created_event = service.events().insert(calendarId='primary', body=event, sendUpdates='all').execute()
             event_id = created_event.get('id', 'unknown')
+            # Write through to the local calendar store so the event shows up before the next sync
+            store = get_calendar_store()
+            if store:
+                store.put(created_event)
             success_msg = f"SUCCESS: Event '{title}' scheduled for {start_time} with {len(attendee_list)} attendee(s). Event ID: {event_id}"
             print(success_msg)
             return success_msg
@@ -108,6 +114,8 @@ def add_event_to_calendar(title: str, description: str, start_time: str, duratio
         error_message = f"ERROR: Google Calendar API error: {str(error)}"
         print(error_message)
         return error_message
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         error_message = f"ERROR: An unexpected error occurred: {str(e)}"
         print(error_message)
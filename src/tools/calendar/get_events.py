@@ -2,49 +2,90 @@ from datetime import datetime, timezone
 from langsmith import traceable
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from src.utils import get_credentials
+from src.deadline import check_deadline
+from src.utils import get_google_service
+
+# Events requested per events.list page (Calendar allows up to 2500)
+LIST_PAGE_SIZE = 2500
 
 class GetCalendarEventsInput(BaseModel):
     start_date: str = Field(description="Start date for fetching events")
     end_date: str = Field(description="End date for fetching events")
 
+def to_rfc3339(value: datetime):
+    return value.isoformat().replace('+00:00', 'Z')
+
+def event_timestamp(when):
+    """Unix timestamp of an event start/end ({'dateTime': ...} or {'date': ...} for all-day events, taken as UTC)"""
+    value = datetime.fromisoformat(when.get('dateTime') or when['date'])
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def event_fields(event):
+    """Flatten a Calendar event into the fields shown and stored locally"""
+    return {
+        "id": event['id'],
+        "summary": event.get('summary', '(No title)'),
+        "description": event.get('description', ''),
+        "start": event['start'].get('dateTime', event['start'].get('date')),
+        "start_ts": event_timestamp(event['start']),
+        "end_ts": event_timestamp(event['end']),
+    }
+
+def format_event(fields):
+    return f"Event: {fields['summary']}, Description: {fields['description']}, Start: {fields['start']}"
+
+def list_events(service, **params):
+    """Yield the events of the primary calendar returned by events.list, following every page"""
+    page_token = None
+    while True:
+        response = service.events().list(
+            calendarId='primary',
+            maxResults=LIST_PAGE_SIZE,
+            pageToken=page_token,
+            **params
+        ).execute()
+        yield from response.get('items', [])
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return
+
 @tool("GetCalendarEvents", args_schema=GetCalendarEventsInput)
 @traceable(run_type="tool", name="GetCalendarEvents")
 def get_calendar_events(start_date: str, end_date: str):
     "Use this to get all calendars events between 2 time periods"
+    from googleapiclient.errors import HttpError
+    from src.calendar_store import get_calendar_store
+    check_deadline("GetCalendarEvents")
     try:
-        creds = get_credentials()
-        service = build("calendar", "v3", credentials=creds)
-
         # Convert string times to datetime objects and ensure they're in UTC
         start_datetime = datetime.fromisoformat(start_date).replace(tzinfo=timezone.utc)
         end_datetime = datetime.fromisoformat(end_date).replace(tzinfo=timezone.utc)
 
-        # Format date-times in RFC3339 format
-        start_rfc3339 = start_datetime.isoformat().replace('+00:00', 'Z')
-        end_rfc3339 = end_datetime.isoformat().replace('+00:00', 'Z')
-
-        events = service.events().list(
-            calendarId='primary',
-            timeMin=start_rfc3339,
-            timeMax=end_rfc3339,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-
-        if not events:
-            return "No events found in the specified time range."
-
-        event_list = []
-        for event in events['items']:
-            start = event['start'].get('dateTime', event['start'].get('date'))
-            event_list.append(f"Event: {event['summary']}, Description: {event['description']}, Start: {start}")
+        store = get_calendar_store()
+        note = None
+        if store and store.covers(start_datetime.timestamp()):
+            # Served from the local store, kept current by its background sync
+            events = store.query(start_datetime.timestamp(), end_datetime.timestamp())
+            note = store.staleness_note()
+        else:
+            events = [
+                event_fields(event)
+                for event in list_events(
+                    get_google_service("calendar", "v3"),
+                    timeMin=to_rfc3339(start_datetime),
+                    timeMax=to_rfc3339(end_datetime),
+                    singleEvents=True,
+                    orderBy='startTime'
+                )
+                if event.get('status') != 'cancelled'
+            ]
 
-        if event_list:
-            return "\n".join(event_list)
-        return "No event found for this dates"
+        answer = "\n".join(format_event(fields) for fields in events) or "No event found for this dates"
+        if note:
+            answer += f"\n{note}"
+        return answer
 
     except HttpError as error:
-        return f"An error occurred: {error}"
\ No newline at end of file
+        return f"An error occurred: {error}"
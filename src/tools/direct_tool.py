@@ -0,0 +1,41 @@
+import time
+from typing import Optional
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
+from langchain_core.tools import BaseTool
+from src.metrics import metrics
+
+
+class DirectTool(BaseTool):
+    """
+    Wraps a leaf tool (e.g. GetMyTodoList) so the manager agent can call it
+    directly instead of delegating to a sub-agent, and records its latency.
+    """
+    tool: BaseTool
+
+    def __init__(self, tool: BaseTool):
+        super().__init__(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            tool=tool
+        )
+
+    def _record(self, start: float):
+        elapsed = time.perf_counter() - start
+        metrics.increment("direct_tool.calls")
+        metrics.observe(f"direct_tool.{self.name}", elapsed)
+        print(f"Direct tool call {self.name} took {elapsed:.2f}s")
+
+    def _run(self, run_manager: Optional[CallbackManagerForToolRun] = None, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.tool.invoke(kwargs)
+        finally:
+            self._record(start)
+
+    async def _arun(self, run_manager: Optional[AsyncCallbackManagerForToolRun] = None, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await self.tool.ainvoke(kwargs)
+        finally:
+            self._record(start)
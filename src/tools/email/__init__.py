@@ -1,5 +1,6 @@
 from .find_contacts import find_contact_email
 from .read_emails import read_emails
+from .search_emails import search_emails
 from .send_email import send_email
 
-__all__ = ['find_contact_email', 'read_emails', 'send_email']
+__all__ = ['find_contact_email', 'read_emails', 'search_emails', 'send_email']
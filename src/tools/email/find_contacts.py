@@ -2,9 +2,8 @@ import re
 from langsmith import traceable
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from src.utils import get_credentials
+from src.deadline import check_deadline
+from src.utils import get_google_service
 
 class FindContactEmailInput(BaseModel):
     name: str = Field(description="Name of the contact")
@@ -13,9 +12,10 @@ class FindContactEmailInput(BaseModel):
 @traceable(run_type="tool", name="FindContactEmail")
 def find_contact_email(name: str):
     "Use this to get the a contact email from his name"
+    from googleapiclient.errors import HttpError
+    check_deadline("FindContactEmail")
     try:
-        creds = get_credentials()
-        service = build('people', 'v1', credentials=creds)
+        service = get_google_service('people', 'v1')
 
         # Search for the contact
         results = service.people().searchContacts(
@@ -1,26 +1,149 @@
-from datetime import datetime, timezone
+import os
+import time
+from datetime import datetime
 from typing import Optional
 from langsmith import traceable
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from email.utils import parsedate_to_datetime
-from src.utils import get_credentials
+from src.deadline import check_deadline, get_timeout
+from src.metrics import metrics
+from src.utils import get_google_service, new_google_batch
+
+# Most emails returned by one ReadEmails call
+READ_EMAILS_MAX_RESULTS = int(os.getenv("READ_EMAILS_MAX_RESULTS", "100"))
+# Message ids requested per messages.list page (Gmail allows up to 500)
+LIST_PAGE_SIZE = 500
+# messages.get calls sent in one batch request (Gmail advises at most 50)
+GET_BATCH_SIZE = 50
+# Only the headers shown in the answer are requested
+METADATA_HEADERS = ["Subject", "From", "Date"]
+# Times the messages.get calls of a batch failing with a transient error are sent again
+BATCH_RETRIES = 3
+# Seconds before the first retry, doubled for each next one
+BATCH_RETRY_DELAY = 0.5
+# Rate limited (429) or server errors, the other failures won't succeed on retry
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
 
 class ReadEmailsInput(BaseModel):
     from_date: str = Field(description="From date for reading emails")
     to_date: str = Field(description="To date for reading emails. Always after from_date.")
     email: Optional[str] = Field(description="Email of the contact to read emails from")
+    max_results: Optional[int] = Field(default=None, description="Maximum number of emails to read, newest first")
+
+def list_message_ids(service, query, max_results):
+    """Yield the ids of the messages matching the query, newest first, following the pages until max_results"""
+    page_token = None
+    remaining = max_results
+    while remaining > 0:
+        results = service.users().messages().list(
+            userId='me',
+            q=query,
+            maxResults=min(LIST_PAGE_SIZE, remaining),
+            pageToken=page_token
+        ).execute()
+        metrics.increment("gmail.requests")
+        messages = results.get('messages', [])[:remaining]
+        for message in messages:
+            yield message['id']
+        remaining -= len(messages)
+        page_token = results.get('nextPageToken')
+        if not page_token or not messages:
+            return
+
+def error_status(exception):
+    """HTTP status of a failed call (None for errors without a response)"""
+    resp = getattr(exception, 'resp', None)
+    return getattr(resp, 'status', None)
+
+def fetch_messages(service, message_ids, unread=None):
+    """
+    Return the metadata of the given messages (in the same order) fetched with one batch
+    request of messages.get calls. Calls failing with 429 or 5xx are sent again in a new
+    batch, up to BATCH_RETRIES times with exponential backoff. Deleted messages (404) are
+    skipped, the ids of the other messages that still can't be read are added to `unread`.
+    """
+    responses = {}
+    errors = {}
+
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            errors[request_id] = exception
+            return
+        errors.pop(request_id, None)
+        responses[request_id] = response
+
+    pending = list(message_ids)
+    for attempt in range(BATCH_RETRIES + 1):
+        if attempt:
+            # Backoff, the wait is capped by the request deadline
+            time.sleep(get_timeout(BATCH_RETRY_DELAY * 2 ** (attempt - 1)))
+            metrics.increment("gmail.batch_retries", len(pending))
+        batch = new_google_batch(service, 'gmail', 'v1', callback=on_response)
+        for message_id in pending:
+            batch.add(
+                service.users().messages().get(userId='me', id=message_id, format='metadata', metadataHeaders=METADATA_HEADERS),
+                request_id=message_id
+            )
+        check_deadline("ReadEmails")
+        batch.execute()
+        metrics.increment("gmail.requests")
+        pending = [message_id for message_id, exception in errors.items() if error_status(exception) in RETRYABLE_STATUSES]
+        if not pending:
+            break
+
+    for message_id, exception in errors.items():
+        print(f"Error reading email {message_id}: {exception}")
+        metrics.increment("gmail.batch_errors")
+        if unread is not None and error_status(exception) != 404:
+            unread.append(message_id)
+    # Keep the list order, the batch responses may come in any order
+    return [responses[message_id] for message_id in message_ids if message_id in responses]
+
+def iter_messages(service, query, max_results, unread=None):
+    """
+    Yield the metadata (Subject/From/Date headers and snippet) of the messages matching
+    the query, newest first. Each page of ids is fetched with batch requests of
+    GET_BATCH_SIZE messages.get calls instead of one request per message.
+    """
+    pending = []
+    for message_id in list_message_ids(service, query, max_results):
+        pending.append(message_id)
+        if len(pending) == GET_BATCH_SIZE:
+            yield from fetch_messages(service, pending, unread)
+            pending = []
+    if pending:
+        yield from fetch_messages(service, pending, unread)
+
+def message_fields(message):
+    """Flatten a Gmail message (metadata format) into the fields shown and mirrored locally"""
+    headers = {header['name']: header['value'] for header in message.get('payload', {}).get('headers', [])}
+    return {
+        "id": message['id'],
+        "thread_id": message.get('threadId'),
+        "internal_date": int(message.get('internalDate', 0)),
+        "subject": headers.get('Subject', 'No Subject'),
+        "sender": headers.get('From', 'Unknown Sender'),
+        "date": headers.get('Date', ''),
+        "snippet": message.get('snippet', '')
+    }
+
+def format_email(fields):
+    return f"From: {fields['sender']}\nSubject: {fields['subject']}\nDate: {fields['date']}\nSnippet: {fields['snippet']}\n"
+
+def unread_note(unread):
+    """Line added to the answers when some emails couldn't be read (None when all were)"""
+    if not unread:
+        return None
+    return f"Note: {len(unread)} email(s) couldn't be read because of Gmail errors, they are missing from this list."
 
 @tool("ReadEmails", args_schema=ReadEmailsInput)
 @traceable(run_type="tool", name="ReadEmails")
-def read_emails(from_date: str, to_date: str, email: Optional[str] = None):
+def read_emails(from_date: str, to_date: str, email: Optional[str] = None, max_results: Optional[int] = None):
     "Use this to read emails from my inbox"
+    from googleapiclient.errors import HttpError
+    from src.gmail_mirror import get_gmail_mirror
+    check_deadline("ReadEmails")
     try:
-        creds = get_credentials()
-        service = build('gmail', 'v1', credentials=creds)
-
         # Convert datetime objects to timestamps
         from_date = int(datetime.fromisoformat(from_date).timestamp())
         to_date = int(datetime.fromisoformat(to_date).timestamp())
@@ -29,28 +152,23 @@ def read_emails(from_date: str, to_date: str, email: Optional[str] = None):
         if email:
             query += f' from:{email}'
 
-        results = service.users().messages().list(userId='me', q=query).execute()
-        messages = results.get('messages', [])
-
-        if not messages:
-            return "No emails found in the specified time range."
-
-        email_list = []
-        for message in messages:
-            msg = service.users().messages().get(userId='me', id=message['id']).execute()
-
-            subject = next((header['value'] for header in msg['payload']['headers'] if header['name'] == 'Subject'), 'No Subject')
-            from_email = next((header['value'] for header in msg['payload']['headers'] if header['name'] == 'From'), 'Unknown Sender')
-            date = next((header['value'] for header in msg['payload']['headers'] if header['name'] == 'Date'), '')
-            date_obj = parsedate_to_datetime(date)
-            if date_obj.tzinfo is None:
-                date_obj = date_obj.replace(tzinfo=timezone.utc)
-
+        max_results = min(max_results or READ_EMAILS_MAX_RESULTS, READ_EMAILS_MAX_RESULTS)
+        mirror = get_gmail_mirror()
+        unread = []
+        if mirror and mirror.covers(from_date):
+            # Served from the local mirror (it copied this range), kept current by its background sync
+            emails = mirror.query(from_date, to_date, email, max_results)
+        else:
+            emails = [message_fields(message) for message in iter_messages(get_google_service('gmail', 'v1'), query, max_results, unread)]
+        email_list = [format_email(fields) for fields in emails]
+        note = unread_note(unread)
 
-            snippet = msg['snippet']
-            email_list.append(f"From: {from_email}\nSubject: {subject}\nDate: {date}\nSnippet: {snippet}\n")
+        if not email_list:
+            return note or "No emails found in the specified time range."
 
+        if note:
+            email_list.append(note)
         return "\n".join(email_list)
 
     except HttpError as error:
-        return f"An error occurred: {error}"
\ No newline at end of file
+        return f"An error occurred: {error}"
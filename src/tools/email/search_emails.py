@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import Optional
+from langsmith import traceable
+from langchain_core.tools import tool
+from pydantic import BaseModel, Field
+from src.deadline import check_deadline
+from src.utils import get_google_service
+from .read_emails import iter_messages, message_fields, format_email, unread_note, READ_EMAILS_MAX_RESULTS
+
+class SearchEmailsInput(BaseModel):
+    query: str = Field(description="Words to look for in the subject, sender or content of the emails")
+    max_results: Optional[int] = Field(default=10, description="Maximum number of emails to return, best matches first")
+    from_date: Optional[str] = Field(default=None, description="Only search the emails received since this date, empty to search them all")
+
+@tool("SearchEmails", args_schema=SearchEmailsInput)
+@traceable(run_type="tool", name="SearchEmails")
+def search_emails(query: str, max_results: Optional[int] = 10, from_date: Optional[str] = None):
+    "Use this to search my emails by words in their subject, sender or content"
+    from googleapiclient.errors import HttpError
+    from src.gmail_mirror import get_gmail_mirror
+    check_deadline("SearchEmails")
+    try:
+        max_results = min(max_results or 10, READ_EMAILS_MAX_RESULTS)
+        after = int(datetime.fromisoformat(from_date).timestamp()) if from_date else None
+        mirror = get_gmail_mirror()
+        unread = []
+        emails = None
+        if mirror and mirror.ready:
+            # Full-text search over the local mirror. It only holds the recent emails: a search
+            # reaching further back is answered locally only when it found enough of them
+            emails = mirror.search(query, max_results, after)
+            if not mirror.covers(after) and len(emails) < max_results:
+                emails = None
+        if emails is None:
+            api_query = f"{query} after:{after}" if after else query
+            emails = [message_fields(message) for message in iter_messages(get_google_service('gmail', 'v1'), api_query, max_results, unread)]
+        note = unread_note(unread)
+
+        if not emails:
+            return note or f"No emails found matching: {query}"
+
+        email_list = [format_email(fields) for fields in emails]
+        if note:
+            email_list.append(note)
+        return "\n".join(email_list)
+
+    except HttpError as error:
+        return f"An error occurred: {error}"
@@ -3,6 +3,7 @@ import smtplib
 from langsmith import traceable
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
+from src.deadline import DeadlineExceeded, get_timeout
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
@@ -25,11 +26,13 @@ def send_email(to: str, subject: str, body: str):
         msg['Subject'] = subject
         msg.attach(MIMEText(body, 'plain'))
 
-        server = smtplib.SMTP_SSL('smtp.gmail.com', 465)
+        server = smtplib.SMTP_SSL('smtp.gmail.com', 465, timeout=get_timeout(30))
         server.login(sender_email, app_password)
         text = msg.as_string()
         server.sendmail(sender_email, to, text)
         server.quit()
         return "Email sent successfully."
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         return f"Email was not sent successfully, error: {e}"
\ No newline at end of file
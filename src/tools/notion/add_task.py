@@ -4,7 +4,7 @@ import os
 from langsmith import traceable
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
-from notion_client import Client, APIResponseError
+from src.deadline import DeadlineExceeded, get_timeout
 
 class TaskStatus(Enum):
     NOT_STARTED = "Not started"
@@ -19,6 +19,7 @@ class AddTaskInTodoListInput(BaseModel):
 @traceable(run_type="tool", name="AddTaskInTodoList")
 def add_task_in_todo_list(task: str, date: str):
     "Use this to add a new task to my todo list"
+    from notion_client import Client, APIResponseError
     try:
         # Check if environment variables are set
         notion_token = os.getenv("NOTION_TOKEN")
@@ -37,7 +38,7 @@ def add_task_in_todo_list(task: str, date: str):
         print(f"Adding task to Notion: '{task}' for {date}")
         
         # Initialize the Notion client
-        notion = Client(auth=notion_token)
+        notion = Client(auth=notion_token, timeout_ms=int(get_timeout(60) * 1000))
 
         # Create new task
         new_task = {
@@ -61,6 +62,8 @@ def add_task_in_todo_list(task: str, date: str):
             print(error_msg)
             return error_msg
             
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         error_msg = f"ERROR: An unexpected error occurred: {str(e)}"
         print(error_msg)
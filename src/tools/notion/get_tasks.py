@@ -2,7 +2,7 @@ import os
 from langsmith import traceable
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
-from notion_client import Client, APIResponseError
+from src.deadline import DeadlineExceeded, get_timeout
 
 class GetMyTodoListInput(BaseModel):
     status: str = Field(description="Status filter (optional): 'not started', 'in progress', 'completed'", default="")
@@ -11,6 +11,7 @@ class GetMyTodoListInput(BaseModel):
 @traceable(run_type="tool", name="GetMyTodoList")
 def get_my_todo_list(status: str = ""):
     "Use this to get all my tasks from notion database (to-do list)"
+    from notion_client import Client, APIResponseError
     try:
         # Check if environment variables are set
         notion_token = os.getenv("NOTION_TOKEN")
@@ -29,7 +30,7 @@ def get_my_todo_list(status: str = ""):
         print(f"Retrieving Notion tasks with status filter: '{status if status else 'all'}'")
         
         # Initialize the Notion client
-        notion = Client(auth=notion_token)
+        notion = Client(auth=notion_token, timeout_ms=int(get_timeout(60) * 1000))
 
         # Prepare filter if status is provided
         filter_params = {}
@@ -92,6 +93,8 @@ def get_my_todo_list(status: str = ""):
             print(error_msg)
             return error_msg
             
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         error_msg = f"ERROR: An unexpected error occurred while fetching tasks: {str(e)}"
         print(error_msg)
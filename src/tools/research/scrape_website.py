@@ -1,10 +1,9 @@
 import re
-import html2text
 import requests
-from bs4 import BeautifulSoup
 from langsmith import traceable
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
+from src.deadline import check_deadline, get_timeout
 
 class ScrapeWebsiteInput(BaseModel):
     url: str = Field(description="The URL of the website to scrape.")
@@ -15,6 +14,9 @@ def scrape_website_to_markdown(url: str) -> str:
     """
     Use this tool to scrape a website based on its URL.
     """
+    import html2text
+    from bs4 import BeautifulSoup
+    check_deadline("ScrapeWebsite")
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.77 Safari/537.36",
         "Accept-Language": "en-US,en;q=0.5",
@@ -22,7 +24,7 @@ def scrape_website_to_markdown(url: str) -> str:
     }
 
     # Make the HTTP request
-    response = requests.get(url, headers=headers)
+    response = requests.get(url, headers=headers, timeout=get_timeout(30))
     if response.status_code != 200:
         raise Exception(f"Failed to fetch the URL. Status code: {response.status_code}")
 
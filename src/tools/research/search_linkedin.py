@@ -2,21 +2,16 @@ import json
 import os
 import re
 import requests
-import html2text
-import time
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
 from langsmith import traceable
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
+from src.deadline import check_deadline, get_timeout
 from src.utils import get_llm_by_provider
 
 def invoke_llm(system_prompt, user_message, model="openai/gpt-4o-mini"):
+    check_deadline("SearchLinkedin")
     # Get the LLM instance by provider
     llm = get_llm_by_provider(model, temperature=0.1)
     
@@ -41,7 +36,7 @@ def google_search(query):
         'X-API-KEY': os.environ['SERPER_API_KEY'],
         'content-type': 'application/json'
     }
-    response = requests.request("POST", url, headers=headers, data=payload)
+    response = requests.request("POST", url, headers=headers, data=payload, timeout=get_timeout(30))
     results = response.json().get('organic', [])[:5] # Keep only 5 results
     
     # Extract only the title and link
@@ -69,6 +64,16 @@ def scrape_linkedin(linkedin_url):
     """
     Scrapes the LinkedIn profile page and returns the HTML content.
     """
+    # Selenium and the driver manager are heavy, import them only when scraping
+    import html2text
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from webdriver_manager.chrome import ChromeDriverManager
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.support import expected_conditions
+    from selenium.webdriver.support.ui import WebDriverWait
+
     # Set up the Chrome WebDriver with headless mode
     service = Service(ChromeDriverManager().install())
     options = webdriver.ChromeOptions()
@@ -76,25 +81,29 @@ def scrape_linkedin(linkedin_url):
     
     # Launch Chrome
     driver = webdriver.Chrome(service=service, options=options)
-    
-    # Log in to LinkedIn
-    driver.get("https://www.linkedin.com/login")
-    time.sleep(5)
-    username = driver.find_element(By.ID, "username")
-    password = driver.find_element(By.ID, "password")
-    username.send_keys(os.getenv("LINKEDIN_USERNAME"))  # Replace with your email
-    password.send_keys(os.getenv("LINKEDIN_PASSWORD"))  # Replace with your password
-    password.send_keys(Keys.RETURN)
-    time.sleep(5)  # Wait for the login to complete
+    try:
+        driver.set_page_load_timeout(get_timeout(30))
+        
+        # Log in to LinkedIn, waiting for the form instead of sleeping a fixed time
+        driver.get("https://www.linkedin.com/login")
+        WebDriverWait(driver, get_timeout(10)).until(expected_conditions.presence_of_element_located((By.ID, "username")))
+        username = driver.find_element(By.ID, "username")
+        password = driver.find_element(By.ID, "password")
+        username.send_keys(os.getenv("LINKEDIN_USERNAME"))  # Replace with your email
+        password.send_keys(os.getenv("LINKEDIN_PASSWORD"))  # Replace with your password
+        password.send_keys(Keys.RETURN)
+        # Wait for the login to complete
+        WebDriverWait(driver, get_timeout(10)).until(lambda d: "/login" not in d.current_url)
+        check_deadline("SearchLinkedin")
 
-    # Go to a person's profile
-    driver.get(linkedin_url)
-    driver.implicitly_wait(5)
-    
-    # Get the page source
-    html_content = driver.page_source
-    
-    driver.quit()
+        # Go to a person's profile
+        driver.get(linkedin_url)
+        driver.implicitly_wait(min(5, get_timeout(5)))
+        
+        # Get the page source
+        html_content = driver.page_source
+    finally:
+        driver.quit()
     
     # Convert HTML to markdown
     h = html2text.HTML2Text()
@@ -2,7 +2,7 @@ import os
 from langsmith import traceable
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
-from tavily import TavilyClient
+from src.deadline import DeadlineExceeded, get_timeout
 
 class SearchWebInput(BaseModel):
     query: str = Field(description="The search query string")
@@ -13,9 +13,10 @@ def search_web(query: str, search_type: str = "basic", max_results: int = 5):
     """
     Use this tool to perform a web search based on the given query.
     """
+    from tavily import TavilyClient
     try:
         client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-        search_response = client.search(query=query, search_depth=search_type, max_results=max_results)
+        search_response = client.search(query=query, search_depth=search_type, max_results=max_results, timeout=get_timeout(60))
         results = search_response["results"]
 
         if not results:
@@ -34,5 +35,7 @@ def search_web(query: str, search_type: str = "basic", max_results: int = 5):
 
         return formatted_output
 
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         return f"An error occurred: {e}"
\ No newline at end of file
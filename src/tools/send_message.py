@@ -1,10 +1,13 @@
+import time
 from typing import Optional, Type, Dict
-from langchain_core.callbacks import CallbackManagerForToolRun
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
 from langchain_core.messages import HumanMessage
 from langsmith import traceable
 from pydantic import BaseModel
 from langchain.tools import BaseTool
 from src.agents.base import Agent
+from src.deadline import DeadlineExceeded
+from src.metrics import metrics
 
 
 class SendMessage(BaseTool):
@@ -13,18 +16,46 @@ class SendMessage(BaseTool):
     args_schema: Type[BaseModel]
     agent_mapping: Dict[str, "Agent"] = None 
 
-    def send_message(self, recipient: str, message: str) -> str:
-        """Send a message to a sub-agent and get its response"""
-        print(f"SendMessage tool called: recipient={recipient}, message={message[:50]}...")
-        
+    def _get_agent(self, recipient: str):
+        """Return the recipient agent, or an error message if it can't be found"""
         if not self.agent_mapping:
             print("Error: agent_mapping is not set")
-            return "Error: agent_mapping is not set"
+            return None, "Error: agent_mapping is not set"
         
         agent = self.agent_mapping.get(recipient)
         if not agent:
             print(f"Error: recipient '{recipient}' not found in agent_mapping")
-            return f"Error: recipient '{recipient}' not found. Available agents: {list(self.agent_mapping.keys())}"
+            return None, f"Error: recipient '{recipient}' not found. Available agents: {list(self.agent_mapping.keys())}"
+        return agent, None
+
+    def _extract_response(self, recipient: str, response) -> str:
+        """Extract the content of the sub-agent response"""
+        if isinstance(response, dict) and 'messages' in response:
+            messages = response.get('messages', [])
+            if messages:
+                last_message = messages[-1]
+                content = last_message.content if hasattr(last_message, 'content') else str(last_message)
+                print(f"Response from {recipient}: {content[:100]}...")
+                return content
+        
+        # Fallback for other response types
+        result = str(response)
+        print(f"Response from {recipient}: {result[:100]}...")
+        return result
+
+    def _record_time(self, recipient: str, start: float):
+        """Log how long the call to the sub-agent took"""
+        elapsed = time.perf_counter() - start
+        metrics.observe(f"tool_call.{recipient}", elapsed)
+        print(f"SendMessage to {recipient} took {elapsed:.2f}s")
+
+    def send_message(self, recipient: str, message: str) -> str:
+        """Send a message to a sub-agent and get its response"""
+        print(f"SendMessage tool called: recipient={recipient}, message={message[:50]}...")
+        
+        agent, error = self._get_agent(recipient)
+        if error:
+            return error
         
         try:
             # Create a fresh state with the message
@@ -35,19 +66,32 @@ class SendMessage(BaseTool):
             response = agent.invoke(agent_state)
             
             # Extract the response content
-            if isinstance(response, dict) and 'messages' in response:
-                messages = response.get('messages', [])
-                if messages:
-                    last_message = messages[-1]
-                    content = last_message.content if hasattr(last_message, 'content') else str(last_message)
-                    print(f"Response from {recipient}: {content[:100]}...")
-                    return content
+            return self._extract_response(recipient, response)
             
-            # Fallback for other response types
-            result = str(response)
-            print(f"Response from {recipient}: {result[:100]}...")
-            return result
+        except DeadlineExceeded:
+            # Out of time: the tool node lets it through (handle_tool_error) and the whole turn stops
+            raise
+        except Exception as e:
+            error_msg = f"Error sending message to {recipient}: {str(e)}"
+            print(error_msg)
+            return error_msg
+
+    async def asend_message(self, recipient: str, message: str) -> str:
+        """Send a message to a sub-agent asynchronously and get its response"""
+        print(f"SendMessage tool called: recipient={recipient}, message={message[:50]}...")
+        
+        agent, error = self._get_agent(recipient)
+        if error:
+            return error
+        
+        try:
+            agent_state = {"messages": [HumanMessage(content=message)]}
+            print(f"Invoking {recipient} agent...")
+            response = await agent.ainvoke(agent_state)
+            return self._extract_response(recipient, response)
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             error_msg = f"Error sending message to {recipient}: {str(e)}"
             print(error_msg)
@@ -60,4 +104,21 @@ class SendMessage(BaseTool):
         message: str,
         run_manager: Optional[CallbackManagerForToolRun] = None,
     ) -> str:
-        return self.send_message(recipient, message)
\ No newline at end of file
+        start = time.perf_counter()
+        try:
+            return self.send_message(recipient, message)
+        finally:
+            self._record_time(recipient, start)
+
+    @traceable(run_type="tool", name="SendMessage")
+    async def _arun(
+        self,
+        recipient: str,
+        message: str,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> str:
+        start = time.perf_counter()
+        try:
+            return await self.asend_message(recipient, message)
+        finally:
+            self._record_time(recipient, start)
\ No newline at end of file
@@ -3,8 +3,7 @@ import re
 from langsmith import traceable
 from pydantic import BaseModel
 from langchain_core.tools import tool
-from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
+from src.deadline import get_timeout
 
 class GetMessagesInput(BaseModel):
     """Input schema for get_messages tool."""
@@ -16,10 +15,12 @@ def get_slack_messages():
     """
     Use this tool to retrieve unread messages from Slack.
     """
+    from slack_sdk import WebClient
+    from slack_sdk.errors import SlackApiError
     try:
         messages = []
         # Get unread DMs
-        client = WebClient(token=os.getenv("SLACK_BOT_TOKEN"))
+        client = WebClient(token=os.getenv("SLACK_BOT_TOKEN"), timeout=max(1, int(get_timeout(30))))
         dms_response = client.conversations_list(types="im", exclude_archived=True)
         for channel in dms_response["channels"]:
           try:
@@ -2,8 +2,7 @@ import os
 from langsmith import traceable
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
-from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
+from src.deadline import get_timeout
 
 class SendSlackMessageInput(BaseModel):
     channel: str = Field(..., description="The ID or name of the channel to send the message to.")
@@ -15,8 +14,10 @@ def send_slack_message(channel: str, message: str):
     """
     Use this tool to send a message to a specific Slack channel.
     """
+    from slack_sdk import WebClient
+    from slack_sdk.errors import SlackApiError
     try:
-        client = WebClient(token=os.getenv("SLACK_BOT_TOKEN"))
+        client = WebClient(token=os.getenv("SLACK_BOT_TOKEN"), timeout=max(1, int(get_timeout(30))))
         response = client.chat_postMessage(channel=channel, text=message)
         if response["ok"]:
             return f"Message sent to #{channel} successfully."
@@ -1,8 +1,11 @@
 import os 
-from datetime import datetime
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
+import json
+import asyncio
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from src.metrics import metrics
 
 SCOPES = [
     "https://www.googleapis.com/auth/calendar.events",
@@ -12,14 +15,56 @@ SCOPES = [
 
 def get_current_date_time():
     return datetime.now().strftime("%Y-%m-%d %H:%M")
+
+@contextmanager
+def _token_file_lock(token_path):
+    """
+    Exclusive lock on token.json shared by the processes using it (launcher.py's workers),
+    held while the credentials are loaded or refreshed. Without fcntl it only does nothing.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(f"{token_path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _save_credentials(creds, token_path):
+    """Write token.json through a temporary file renamed over it, so it is never read half written"""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(token_path)), prefix=".token-", suffix=".json")
+    try:
+        with os.fdopen(fd, 'w') as token:
+            token.write(creds.to_json())
+        os.replace(temp_path, token_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
         
-def get_credentials():
+def _has_refreshable_token(token_path):
+    """Whether token.json holds a refresh token (read without the file lock, it is replaced atomically)"""
+    try:
+        with open(token_path) as token:
+            return bool(json.load(token).get("refresh_token"))
+    except (OSError, ValueError):
+        return False
+
+def _load_credentials(token_path, interactive=True):
     """
-    Get and refresh Google Contacts API credentials
+    Load the Google credentials from token.json, refreshing them if they expired,
+    or run the OAuth flow when there are none (raises RuntimeError instead unless `interactive`)
     """
+    # Google auth libraries are imported on first use to keep startup fast
+    from google.oauth2.credentials import Credentials
+    from google.auth.transport.requests import Request
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
     creds = None
-    token_path = 'token.json'
-    
+
     # Check if token exists and is valid
     if os.path.exists(token_path):
         try:
@@ -42,6 +87,8 @@ def get_credentials():
         if creds and creds.expired and creds.refresh_token:
             print("Refreshing expired credentials...")
             creds.refresh(Request())
+        elif not interactive:
+            raise RuntimeError("No usable Google credentials in token.json, authorize the app through the OAuth flow run at startup")
         else:
             print("Creating new OAuth credentials...")
             flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
@@ -67,24 +114,299 @@ def get_credentials():
                 print("WARNING: No refresh token received. Authentication may need to be repeated.")
         
         # Save the credentials
-        with open(token_path, 'w') as token:
-            token.write(creds.to_json())
-            print(f"Credentials saved to {token_path}")
+        _save_credentials(creds, token_path)
+        print(f"Credentials saved to {token_path}")
             
         return creds
     except Exception as e:
         print(f"Error in authentication process: {e}")
         raise
 
+# Seconds before expiry at which the background thread refreshes the access token
+GOOGLE_CREDENTIALS_REFRESH_MARGIN = int(os.getenv("GOOGLE_CREDENTIALS_REFRESH_MARGIN", "300"))
+# Seconds before retrying a failed background refresh
+GOOGLE_CREDENTIALS_RETRY_INTERVAL = 30
+
+
+class CredentialManager:
+    """
+    Process-wide holder of the Google credentials. They are read from token.json (or
+    obtained through the OAuth flow) once, kept in memory and refreshed by a background
+    thread before they expire, so tool calls get valid credentials without disk I/O or
+    refresh latency. Loading and refreshing are serialized by a lock, and across the
+    processes sharing token.json by a file lock.
+    """
+    def __init__(self, token_path="token.json", refresh_margin=GOOGLE_CREDENTIALS_REFRESH_MARGIN):
+        self.token_path = token_path
+        self.refresh_margin = refresh_margin
+        self.creds = None
+        self._lock = threading.Lock()
+        self._refresher = None
+        self._stopped = threading.Event()
+
+    def get(self):
+        """
+        Return valid credentials, only the first call (or a missed refresh) waits. The
+        interactive OAuth flow only runs at startup (see start): without a refreshable
+        token.json, this raises RuntimeError right away instead of waiting for the user.
+        """
+        creds = self.creds
+        if creds is not None and creds.valid:
+            return creds
+        with self._lock:
+            if self.creds is None:
+                self.creds = self._load(interactive=False)
+            elif not self.creds.valid:
+                # The background refresh didn't happen in time (e.g. the machine was asleep)
+                print("Refreshing expired credentials...")
+                self._refresh()
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_loop, name="google-credentials-refresh", daemon=True)
+                self._refresher.start()
+            return self.creds
+
+    def _load(self, interactive):
+        """Read token.json (refreshing it if needed), or run the OAuth flow when `interactive`"""
+        if not interactive and not _has_refreshable_token(self.token_path):
+            raise RuntimeError("No usable Google credentials in token.json, authorize the app through the OAuth flow run at startup")
+        # Processes starting together refresh (or authorize) once, the others read the result
+        with _token_file_lock(self.token_path):
+            return _load_credentials(self.token_path, interactive)
+
+    def _refresh(self):
+        """
+        Refresh the access token and persist it, the caller holds the lock. Under the file
+        lock, a token already refreshed by another process is reused instead.
+        """
+        from google.auth.transport.requests import Request
+        with _token_file_lock(self.token_path):
+            if self._reload_refreshed():
+                metrics.increment("google_credentials.reloads")
+                return
+            with metrics.timer("google_credentials.refresh_seconds"):
+                self.creds.refresh(Request())
+            metrics.increment("google_credentials.refreshes")
+            try:
+                _save_credentials(self.creds, self.token_path)
+            except OSError as e:
+                print(f"Error saving refreshed credentials: {e}")
+
+    def _reload_refreshed(self):
+        """Take the token saved in token.json if it expires later than ours and isn't due for a refresh"""
+        from google.oauth2.credentials import Credentials
+        try:
+            stored = Credentials.from_authorized_user_file(self.token_path, SCOPES)
+        except (OSError, ValueError):
+            return False
+        if stored.expiry is None or (self.creds.expiry is not None and stored.expiry <= self.creds.expiry):
+            return False
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if (stored.expiry - now).total_seconds() <= self.refresh_margin:
+            return False
+        # Updated in place: the service clients are built for this credentials object
+        self.creds.token = stored.token
+        self.creds.expiry = stored.expiry
+        return True
+
+    def _seconds_until_refresh(self):
+        """Seconds until the token is within the refresh margin of its expiry (None if it can't be refreshed)"""
+        if self.creds.expiry is None or not self.creds.refresh_token:
+            return None
+        # google-auth stores the expiry as a naive UTC datetime
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return (self.creds.expiry - now).total_seconds() - self.refresh_margin
+
+    def _refresh_loop(self):
+        while True:
+            with self._lock:
+                delay = self._seconds_until_refresh()
+                if delay is not None and delay <= 0:
+                    try:
+                        self._refresh()
+                        delay = self._seconds_until_refresh()
+                    except Exception as e:
+                        print(f"Error refreshing credentials in the background: {e}")
+                        metrics.increment("google_credentials.refresh_errors")
+                        delay = GOOGLE_CREDENTIALS_RETRY_INTERVAL
+            # Tokens that can't be refreshed are checked again hourly
+            if self._stopped.wait(3600 if delay is None else max(delay, 1)):
+                return
+
+    def start(self):
+        """
+        Load the credentials in a background thread, so the OAuth flow (if needed) runs
+        while the app starts rather than during a tool call, then keep them fresh.
+        The flow runs outside the lock, tool calls meanwhile fail instead of waiting for it.
+        """
+        def load():
+            try:
+                creds = self._load(interactive=True)
+                with self._lock:
+                    if self.creds is None:
+                        self.creds = creds
+                self.get()
+            except Exception as e:
+                print(f"Error loading Google credentials: {e}")
+
+        thread = threading.Thread(target=load, name="google-credentials", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stopped.set()
+
+
+_credential_manager = None
+_credential_manager_lock = threading.Lock()
+
+def get_credential_manager():
+    global _credential_manager
+    with _credential_manager_lock:
+        if _credential_manager is None:
+            _credential_manager = CredentialManager()
+        return _credential_manager
+
+def get_credentials():
+    """
+    Get the Google API credentials (Gmail, Calendar, Contacts), kept in memory and
+    refreshed in the background by the shared CredentialManager
+    """
+    return get_credential_manager().get()
+
+def start_credential_manager():
+    """Load and keep the Google credentials fresh from startup, if the app is set up for Google"""
+    if os.path.exists("token.json") or os.path.exists("credentials.json"):
+        return get_credential_manager().start()
+    return None
+
+# Shared Google API service clients keyed by (API, version, credentials), see get_google_service
+_google_services = {}
+_google_sessions = {}
+_google_services_lock = threading.Lock()
+
+
+class PooledHttp:
+    """
+    httplib2-compatible transport for googleapiclient over a google-auth AuthorizedSession.
+    Unlike httplib2.Http, it can be shared by threads: requests keeps a pool of
+    keep-alive connections and the session adds (and refreshes) the OAuth token.
+    """
+    def __init__(self, session, timeout=60):
+        self.session = session
+        self.timeout = timeout
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        import httplib2
+        response = self.session.request(method, uri, data=body, headers=headers, timeout=self.timeout)
+        info = {name.lower(): value for name, value in response.headers.items()}
+        info["status"] = str(response.status_code)
+        return httplib2.Response(info), response.content
+
+    def close(self):
+        # The session is shared by every service client using these credentials
+        pass
+
+
+def get_google_session(creds):
+    """Return the pooled AuthorizedSession shared by the service clients of the credentials"""
+    with _google_services_lock:
+        if id(creds) not in _google_sessions:
+            from google.auth.transport.requests import AuthorizedSession
+            from requests.adapters import HTTPAdapter
+            session = AuthorizedSession(creds)
+            pool_size = int(os.getenv("GOOGLE_HTTP_POOL_SIZE", "10"))
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            # The credentials are kept referenced so their id can't be reused by other ones
+            _google_sessions[id(creds)] = (session, creds)
+        return _google_sessions[id(creds)][0]
+
+def _google_api_url(api, version, batch=False):
+    """URL of the API (or of its batch endpoint) on the GOOGLE_API_BASE_URL server, with the paths it has on Google's servers"""
+    import json
+    from urllib.parse import urlparse
+    from googleapiclient.discovery_cache import get_static_doc
+    document = json.loads(get_static_doc(api, version))
+    url = document["rootUrl"] + (document.get("batchPath", "batch") if batch else document["servicePath"])
+    return os.getenv("GOOGLE_API_BASE_URL").rstrip("/") + urlparse(url).path
+
+def get_google_service(api, version, creds=None):
+    """
+    Return the shared googleapiclient service for the API and version, built once per
+    credentials from the discovery document bundled with the library (no discovery
+    request) on the pooled, thread-safe transport. GOOGLE_API_BASE_URL points every
+    API to another server (e.g. a local fake).
+    """
+    creds = creds or get_credentials()
+    key = (api, version, id(creds))
+    with _google_services_lock:
+        service = _google_services.get(key)
+    if service is None:
+        from googleapiclient.discovery import build
+        client_options = {"api_endpoint": _google_api_url(api, version)} if os.getenv("GOOGLE_API_BASE_URL") else None
+        service = build(
+            api, version,
+            http=PooledHttp(get_google_session(creds)),
+            static_discovery=True,
+            cache_discovery=False,
+            client_options=client_options
+        )
+        metrics.increment("google_services.created")
+        with _google_services_lock:
+            service = _google_services.setdefault(key, service)
+    return service
+
+def new_google_batch(service, api, version, callback=None):
+    """
+    Create a batch request (up to 100 calls sent in one HTTP request) for a service
+    of get_google_service, sent to GOOGLE_API_BASE_URL when it is set
+    """
+    if not os.getenv("GOOGLE_API_BASE_URL"):
+        return service.new_batch_http_request(callback=callback)
+    from googleapiclient.http import BatchHttpRequest
+    return BatchHttpRequest(callback=callback, batch_uri=_google_api_url(api, version, batch=True))
+
 def extract_provider_and_model(model_string: str):
     return model_string.split("/", 1)
 
-def get_llm_by_provider(model_string, temperature=0.1):
-    llm_provider, model = extract_provider_and_model(model_string)
-    # Else find provider
+# Shared LLM clients keyed by (provider, model, temperature), see get_llm_by_provider
+_llm_clients = {}
+_http_clients = {}
+_llm_clients_lock = threading.Lock()
+
+# Base URLs used to warm up the connection pool of each provider
+PROVIDER_BASE_URLS = {
+    "openai": "https://api.openai.com/v1",
+    "groq": "https://api.groq.com",
+}
+
+def get_http_clients(llm_provider):
+    """
+    Return the (sync, async) httpx clients shared by every LLM of a provider.
+    Pool sizes and keep-alive are configured with LLM_HTTP_MAX_CONNECTIONS,
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS and LLM_HTTP_KEEPALIVE_EXPIRY (seconds).
+    """
+    with _llm_clients_lock:
+        if llm_provider not in _http_clients:
+            import httpx
+            limits = httpx.Limits(
+                max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20")),
+                max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", "10")),
+                keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "120"))
+            )
+            timeout = httpx.Timeout(600.0, connect=10.0)
+            _http_clients[llm_provider] = (
+                httpx.Client(limits=limits, timeout=timeout),
+                httpx.AsyncClient(limits=limits, timeout=timeout)
+            )
+        return _http_clients[llm_provider]
+
+def _create_llm(llm_provider, model, temperature):
     if llm_provider == "openai":
         from langchain_openai import ChatOpenAI
-        llm = ChatOpenAI(model=model, temperature=temperature)
+        http_client, http_async_client = get_http_clients(llm_provider)
+        llm = ChatOpenAI(model=model, temperature=temperature, http_client=http_client, http_async_client=http_async_client)
     # elif llm_provider == "anthropic":
         # from langchain_anthropic import ChatAnthropic
         # llm = ChatAnthropic(model=model, temperature=temperature)  # Use the correct model name
@@ -93,8 +415,83 @@ def get_llm_by_provider(model_string, temperature=0.1):
         llm = ChatGoogleGenerativeAI(model=model, temperature=temperature)  # Correct model name
     elif llm_provider == "groq":
         from langchain_groq import ChatGroq
-        llm = ChatGroq(model=model, temperature=temperature)
+        http_client, http_async_client = get_http_clients(llm_provider)
+        llm = ChatGroq(model=model, temperature=temperature, http_client=http_client, http_async_client=http_async_client)
     # ... add elif blocks for other providers ...
     else:
         raise ValueError(f"Unsupported LLM provider: {llm_provider}")
-    return llm
\ No newline at end of file
+    return llm
+
+_llm_call_counter = None
+
+def get_llm_call_counter():
+    """Return the callback handler counting LLM calls in the llm.calls metric"""
+    global _llm_call_counter
+    if _llm_call_counter is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class LLMCallCounter(BaseCallbackHandler):
+            def on_chat_model_start(self, serialized, messages, **kwargs):
+                metrics.increment("llm.calls")
+
+            def on_llm_start(self, serialized, prompts, **kwargs):
+                metrics.increment("llm.calls")
+
+        _llm_call_counter = LLMCallCounter()
+    return _llm_call_counter
+
+def get_llm_by_provider(model_string, temperature=0.1):
+    """
+    Return the shared LLM client for the model and temperature, creating it on
+    first use. Clients of a provider share a pooled keep-alive HTTP connection pool.
+    """
+    llm_provider, model = extract_provider_and_model(model_string)
+    key = (llm_provider, model, temperature)
+    with _llm_clients_lock:
+        llm = _llm_clients.get(key)
+    if llm is None:
+        llm = _create_llm(llm_provider, model, temperature)
+        llm.callbacks = [get_llm_call_counter()]
+        metrics.increment("llm_clients.created")
+        with _llm_clients_lock:
+            llm = _llm_clients.setdefault(key, llm)
+    return llm
+
+def _warm_up_targets(model_strings):
+    """(provider, base URL) of the providers used by the given models that can be warmed up"""
+    llm_providers = {extract_provider_and_model(model_string)[0] for model_string in model_strings}
+    return [(llm_provider, PROVIDER_BASE_URLS[llm_provider]) for llm_provider in llm_providers if llm_provider in PROVIDER_BASE_URLS]
+
+def warm_up_llm_clients(model_strings):
+    """
+    Open the TLS connections of the providers used by the given models in a
+    background thread, so the first LLM calls don't pay for the handshake.
+    The async clients are warmed up on the runtime's loop, see awarm_up_llm_clients.
+    """
+    def warm_up():
+        for llm_provider, base_url in _warm_up_targets(model_strings):
+            try:
+                http_client, _ = get_http_clients(llm_provider)
+                http_client.head(base_url)
+                print(f"Warmed up {llm_provider} connection pool")
+            except Exception as e:
+                print(f"Error warming up {llm_provider} connection pool: {e}")
+
+    thread = threading.Thread(target=warm_up, name="llm-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+async def awarm_up_llm_clients(model_strings):
+    """
+    Async version of warm_up_llm_clients for the async httpx clients used by ainvoke.
+    Must run on the event loop that makes the LLM calls, its connections belong to it.
+    """
+    async def warm_up(llm_provider, base_url):
+        try:
+            _, http_async_client = get_http_clients(llm_provider)
+            await http_async_client.head(base_url)
+            print(f"Warmed up {llm_provider} async connection pool")
+        except Exception as e:
+            print(f"Error warming up {llm_provider} async connection pool: {e}")
+
+    await asyncio.gather(*(warm_up(llm_provider, base_url) for llm_provider, base_url in _warm_up_targets(model_strings)))
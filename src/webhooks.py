@@ -0,0 +1,71 @@
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Form, Request, Response
+from src.worker_pool import QueueFull, PoolClosed
+
+
+def create_webhook_app(runtime, lifespan=None):
+    """
+    FastAPI server receiving the messages pushed to the runtime's webhook channels
+    (Twilio WhatsApp, Telegram in webhook mode). The runtime runs for the server's
+    lifetime, unless another `lifespan` is given.
+    """
+    @asynccontextmanager
+    async def run_runtime(app):
+        async with runtime.run():
+            yield
+
+    app = FastAPI(lifespan=lifespan or run_runtime)
+
+    async def store_message(channel_name, message):
+        """
+        Save a received message in the inbox. Returns a response when it can't be accepted:
+        503 while the workers aren't running, 429 when too many messages are waiting.
+        """
+        try:
+            await runtime.admit(channel_name)
+        except PoolClosed:
+            return Response("Service unavailable", status_code=503)
+        except QueueFull:
+            return Response("Too many messages, try again later", status_code=429, headers={"Retry-After": "5"})
+        await runtime.store(channel_name, [message])
+        return None
+
+    @app.post("/whatsapp/webhook")
+    async def whatsapp_webhook(Body: str = Form(...), From: str = Form(...), MessageSid: str = Form(None)):
+        """
+        Webhook endpoint that handles incoming messages from WhatsApp.
+        Stores the message in the inbox (Twilio retries are deduplicated by MessageSid),
+        the workers answer it behind the sender's previous messages.
+        """
+        whatsapp = runtime.channels.get("whatsapp")
+        if whatsapp is None:
+            return Response(status_code=404)
+        print(f"Message received from {From}: {Body}")
+
+        error_response = await store_message("whatsapp", whatsapp.parse_webhook_message(Body, From, MessageSid))
+        if error_response:
+            return error_response
+
+        # Respond with a status indicating that the message was received
+        return "Message received", 200
+
+    @app.post("/telegram/webhook")
+    async def telegram_webhook(request: Request):
+        """
+        Webhook endpoint that receives updates pushed by Telegram.
+        Stores the message in the inbox and answers right away so Telegram doesn't retry.
+        """
+        telegram = runtime.channels.get("telegram")
+        if telegram is None or telegram.mode != "webhook":
+            return Response(status_code=404)
+        if telegram.webhook_secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != telegram.webhook_secret:
+            return Response(status_code=403)
+
+        message = telegram.parse_webhook_update(await request.json())
+        if message:
+            error_response = await store_message("telegram", message)
+            if error_response:
+                return error_response
+        return Response(status_code=200)
+
+    return app
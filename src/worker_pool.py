@@ -0,0 +1,81 @@
+import time
+import asyncio
+from collections import deque
+from src.metrics import metrics
+
+
+class QueueFull(Exception):
+    """Raised when a message is submitted while the pool's queue is full"""
+
+
+class PoolClosed(Exception):
+    """Raised when a message is submitted to a pool that isn't running"""
+
+
+class KeyedWorkerPool:
+    """
+    Fixed number of asyncio workers fed by a bounded queue. Items sharing a key
+    (e.g. the sender's number) are handled one at a time in arrival order, items
+    of different keys run in parallel.
+
+    Metrics (prefixed by `name`): queue_depth gauge, wait_seconds and
+    service_seconds histograms, rejected counter.
+    """
+    def __init__(self, handler, workers: int = 4, max_queue: int = 100, name: str = "worker_pool"):
+        self.handler = handler
+        self.workers = workers
+        self.max_queue = max_queue
+        self.name = name
+        # Pending items of each key, a key is in `ready` only while no worker holds it
+        self.pending = {}
+        self.ready = asyncio.Queue()
+        self.depth = 0
+        self.tasks = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self.tasks)
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        tasks, self.tasks = self.tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def submit(self, key, *args):
+        """Queue handler(*args) behind the other items of the same key"""
+        if not self.running:
+            raise PoolClosed(f"{self.name} is not running")
+        if self.depth >= self.max_queue:
+            metrics.increment(f"{self.name}.rejected")
+            raise QueueFull(f"{self.name} queue is full ({self.max_queue} items)")
+
+        if key not in self.pending:
+            self.pending[key] = deque()
+            self.ready.put_nowait(key)
+        self.pending[key].append((time.monotonic(), args))
+        self.depth += 1
+        metrics.set_gauge(f"{self.name}.queue_depth", self.depth)
+
+    async def _worker(self):
+        while True:
+            key = await self.ready.get()
+            items = self.pending[key]
+            enqueued_at, args = items.popleft()
+            self.depth -= 1
+            metrics.set_gauge(f"{self.name}.queue_depth", self.depth)
+            metrics.observe(f"{self.name}.wait_seconds", time.monotonic() - enqueued_at)
+            try:
+                with metrics.timer(f"{self.name}.service_seconds"):
+                    await self.handler(*args)
+            except Exception as e:
+                print(f"Error in {self.name} worker: {e}")
+            finally:
+                # Hand the key back only now, so the next item of this sender waits for this one
+                if items:
+                    self.ready.put_nowait(key)
+                else:
+                    del self.pending[key]
@@ -0,0 +1,53 @@
+import os
+import sys
+import socket
+import pytest
+from types import SimpleNamespace
+
+from tests.fakes.google import serve, write_token
+from tests.fakes.gmail import FakeGmail
+from tests.fakes.google_calendar import FakeCalendar
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def fake_google_server(tmp_path_factory):
+    """
+    Fake Gmail and Calendar APIs on one server shared by the tests: the app's Google calls go
+    to it (GOOGLE_API_BASE_URL) with the valid token.json written in the working directory,
+    where the credentials are read.
+    """
+    from fastapi import FastAPI
+    directory = tmp_path_factory.mktemp("google")
+    os.chdir(directory)
+    write_token("token.json")
+    google = SimpleNamespace(gmail=FakeGmail(), calendar=FakeCalendar())
+    app = FastAPI()
+    app.include_router(google.gmail.app.router)
+    app.include_router(google.calendar.app.router)
+    os.environ["GOOGLE_API_BASE_URL"] = serve(app, free_port())
+    return google
+
+
+@pytest.fixture
+def gmail(fake_google_server, monkeypatch):
+    """The fake Gmail API, emptied for the test, with the local mirror disabled and no retry delay"""
+    fake_google_server.gmail.reset()
+    monkeypatch.setenv("GMAIL_MIRROR", "false")
+    # The email package exports the tools under their module names
+    import src.tools.email.read_emails
+    monkeypatch.setattr(sys.modules["src.tools.email.read_emails"], "BATCH_RETRY_DELAY", 0)
+    return fake_google_server.gmail
+
+
+@pytest.fixture
+def calendar(fake_google_server, monkeypatch):
+    """The fake Calendar API, emptied for the test, with the calendar store disabled"""
+    fake_google_server.calendar.reset()
+    monkeypatch.setenv("CALENDAR_STORE", "false")
+    return fake_google_server.calendar
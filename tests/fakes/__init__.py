@@ -0,0 +1,4 @@
+"""
+Fake LLMs and Google API servers used by the tests and by the benchmarks in scripts/,
+so they run offline and measure the app's own overhead.
+"""
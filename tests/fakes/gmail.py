@@ -0,0 +1,205 @@
+import re
+import json
+import time
+
+from tests.fakes.google import error
+
+TOPICS = ["invoice", "meeting", "vacation", "budget", "launch"]
+# Key of the changes of each history type in a history record
+HISTORY_KEYS = {
+    "messageAdded": "messagesAdded",
+    "messageDeleted": "messagesDeleted",
+    "labelAdded": "labelsAdded",
+    "labelRemoved": "labelsRemoved"
+}
+
+
+class FakeGmail:
+    """
+    Fake Gmail API (user "me") served by `app`: messages.list (with after:/before:/from:/
+    newer_than: and plain words in `q`, without trash and spam), messages.get, the batch endpoint, getProfile and
+    history.list. Every change is recorded in the history; history.list answers 404 for
+    a startHistoryId older than the history kept (see expire_history), like Gmail.
+
+    `failures` maps a message id to the HTTP statuses its next gets answer before it is
+    returned, e.g. {"m3": [429, 503]}. `calls` counts the requests per method (a batch
+    counts once, plus once per get inside it).
+    """
+    def __init__(self):
+        self.reset()
+        self.app = self._create_app()
+
+    def reset(self):
+        """Empty the mailbox, its history and the counters"""
+        self.messages = {}
+        self.failures = {}
+        self.calls = {}
+        self.history = []
+        self.history_id = 100
+        self.oldest_history_id = 0
+        self.history_page_size = 100
+
+    def _record(self, **change):
+        self.history_id += 1
+        self.history.append({"id": str(self.history_id), **change})
+
+    def add(self, message_id, subject, sender, snippet, internal_date=None, labels=("INBOX",)):
+        """Add a message, internal_date in milliseconds (now by default)"""
+        self.messages[message_id] = {
+            "id": message_id,
+            "threadId": f"t-{message_id}",
+            "labelIds": list(labels),
+            "internalDate": str(internal_date or int(time.time() * 1000)),
+            "snippet": snippet,
+            "payload": {"headers": [
+                {"name": "Subject", "value": subject},
+                {"name": "From", "value": sender},
+                {"name": "Date", "value": time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.gmtime(int(internal_date or time.time() * 1000) / 1000))}
+            ]}
+        }
+        self._record(messagesAdded=[{"message": {"id": message_id, "labelIds": list(labels)}}])
+        return self.messages[message_id]
+
+    def delete(self, message_id):
+        """Delete a message for good (messages moved to the trash keep existing)"""
+        self.messages.pop(message_id)
+        self._record(messagesDeleted=[{"message": {"id": message_id}}])
+
+    def label(self, message_id, add=(), remove=()):
+        """Add and remove labels of a message (e.g. add=["TRASH"] moves it to the trash)"""
+        message = self.messages[message_id]
+        labels = [label for label in message["labelIds"] if label not in remove]
+        message["labelIds"] = labels + [label for label in add if label not in labels]
+        summary = {"id": message_id, "labelIds": list(message["labelIds"])}
+        if add:
+            self._record(labelsAdded=[{"message": summary, "labelIds": list(add)}])
+        if remove:
+            self._record(labelsRemoved=[{"message": summary, "labelIds": list(remove)}])
+
+    def expire_history(self):
+        """Forget the history recorded so far, history.list then answers 404 for the historyIds given before"""
+        self.oldest_history_id = self.history_id + 1
+
+    def add_messages(self, count, start=None, minutes_apart=60):
+        """Add `count` messages m0, m1... `minutes_apart` apart from `start` (milliseconds, a day ago by default)"""
+        start = start or int(time.time() * 1000) - 24 * 3600 * 1000
+        for index in range(count):
+            topic = TOPICS[index % len(TOPICS)]
+            self.add(
+                f"m{index}",
+                subject=f"{topic.title()} {index}",
+                sender=f"Person {index % 7} <person{index % 7}@example.com>",
+                snippet=f"About the {topic} number {index}",
+                internal_date=start + index * minutes_apart * 60 * 1000
+            )
+
+    def _hit(self, method):
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+    def _matches(self, message, query):
+        """Whether a message matches a Gmail search query (the operators the app uses)"""
+        headers = {header["name"]: header["value"] for header in message["payload"]["headers"]}
+        seconds = int(message["internalDate"]) / 1000
+        for term in query.split():
+            operator, _, value = term.partition(":")
+            if operator == "after" and value:
+                if seconds < int(value):
+                    return False
+            elif operator == "before" and value:
+                if seconds >= int(value):
+                    return False
+            elif operator == "newer_than" and value:
+                if seconds < time.time() - int(value.rstrip("d")) * 24 * 3600:
+                    return False
+            elif operator == "from" and value:
+                if value.lower() not in headers.get("From", "").lower():
+                    return False
+            elif term.lower() not in " ".join([headers.get("Subject", ""), headers.get("From", ""), message["snippet"]]).lower():
+                return False
+        return True
+
+    def _get(self, message_id):
+        """(status, body) of messages.get"""
+        self._hit("get")
+        statuses = self.failures.get(message_id)
+        if statuses:
+            status = statuses.pop(0)
+            return status, {"error": {"code": status, "message": "Injected failure"}}
+        if message_id not in self.messages:
+            return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+        return 200, self.messages[message_id]
+
+    def _create_app(self):
+        from fastapi import FastAPI, Request, Response
+        app = FastAPI()
+
+        @app.get("/gmail/v1/users/me/messages")
+        async def list_messages(maxResults: int = 100, pageToken: str = None, q: str = "", includeSpamTrash: bool = False):
+            self._hit("list")
+            ids = [
+                message["id"]
+                for message in sorted(self.messages.values(), key=lambda message: -int(message["internalDate"]))
+                if self._matches(message, q)
+                and (includeSpamTrash or not {"TRASH", "SPAM"} & set(message["labelIds"]))
+            ]
+            start = int(pageToken or 0)
+            end = min(start + maxResults, len(ids))
+            page = {"messages": [{"id": message_id, "threadId": f"t-{message_id}"} for message_id in ids[start:end]]}
+            if end < len(ids):
+                page["nextPageToken"] = str(end)
+            return page
+
+        @app.get("/gmail/v1/users/me/profile")
+        async def get_profile():
+            self._hit("profile")
+            return {"emailAddress": "me@example.com", "historyId": str(self.history_id)}
+
+        @app.get("/gmail/v1/users/me/history")
+        async def list_history(request: Request):
+            self._hit("history")
+            query = request.query_params
+            start_history_id = int(query["startHistoryId"])
+            if start_history_id < self.oldest_history_id:
+                return error(404, "Requested entity was not found.")
+            # History records holding a change of one of the requested types
+            keys = {HISTORY_KEYS[history_type] for history_type in query.getlist("historyTypes")}
+            records = [
+                record for record in self.history
+                if int(record["id"]) > start_history_id and (not keys or keys & set(record))
+            ]
+            start = int(query.get("pageToken") or 0)
+            page = {"history": records[start:start + self.history_page_size], "historyId": str(self.history_id)}
+            if start + self.history_page_size < len(records):
+                page["nextPageToken"] = str(start + self.history_page_size)
+            return page
+
+        @app.get("/gmail/v1/users/me/messages/{message_id}")
+        async def get_message(message_id: str):
+            status, body = self._get(message_id)
+            return body if status == 200 else error(status, body["error"]["message"])
+
+        @app.post("/batch")
+        async def batch(request: Request):
+            self._hit("batch")
+            body = (await request.body()).decode()
+            boundary = re.search(r'boundary="?([^";]+)', request.headers["content-type"]).group(1)
+            parts = []
+            for part in body.split(f"--{boundary}"):
+                content_id = re.search(r"Content-ID: <(.+?)>", part)
+                if not content_id:
+                    continue
+                message_id = re.search(r"/messages/([^?\s/]+)", part).group(1)
+                status, response = self._get(message_id)
+                reason = "OK" if status == 200 else "Error"
+                parts.append(
+                    f"--response-boundary\r\nContent-Type: application/http\r\n"
+                    f"Content-ID: <response-{content_id.group(1)}>\r\n\r\n"
+                    f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n"
+                    f"{json.dumps(response)}\r\n"
+                )
+            return Response(
+                "".join(parts) + "--response-boundary--\r\n",
+                media_type="multipart/mixed; boundary=response-boundary"
+            )
+
+        return app
@@ -0,0 +1,44 @@
+import json
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+
+from src.utils import SCOPES
+
+
+def write_token(path, hours=1):
+    """Write a token.json valid for `hours`, so the app uses it without refreshing or running the OAuth flow"""
+    expiry = (datetime.now(timezone.utc) + timedelta(hours=hours)).replace(tzinfo=None)
+    with open(path, "w") as token:
+        json.dump({
+            "token": "fake-token",
+            "refresh_token": "fake-refresh-token",
+            "client_id": "fake-client",
+            "client_secret": "fake-secret",
+            "scopes": SCOPES,
+            "expiry": expiry.isoformat() + "Z"
+        }, token)
+
+
+def serve(app, port):
+    """
+    Run an ASGI app (a fake Google API) on 127.0.0.1:port in a daemon thread, point the
+    app's Google API calls at it (set GOOGLE_API_BASE_URL to the returned URL) and
+    return once it accepts connections.
+    """
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, name=f"fake-google-{port}", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+def error(status, message):
+    """JSON error body of the Google APIs, as googleapiclient's HttpError parses it"""
+    from fastapi import Response
+    return Response(
+        json.dumps({"error": {"code": status, "message": message}}),
+        status_code=status,
+        media_type="application/json"
+    )
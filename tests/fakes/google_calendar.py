@@ -0,0 +1,117 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from tests.fakes.google import error
+
+# Events per events.list page
+PAGE_SIZE = 100
+
+
+def rfc3339(value):
+    return value.isoformat().replace("+00:00", "Z")
+
+
+def _timestamp(when):
+    return datetime.fromisoformat(when.get("dateTime") or f"{when['date']}T00:00:00+00:00").timestamp()
+
+
+class FakeCalendar:
+    """
+    Fake Google Calendar API (primary calendar) served by `app`: events.list with
+    timeMin/timeMax, pages and sync tokens ("s-<sequence>", 410 Gone once expired) and
+    events.insert. `calls` counts the requests per method and `connections` the client
+    ports seen, to count the TCP connections opened by the app.
+    """
+    def __init__(self):
+        self.reset()
+        self.app = self._create_app()
+
+    def reset(self):
+        """Empty the calendar and the counters"""
+        self.events = {}
+        self.calls = {}
+        self.connections = set()
+        self.sequence = 0
+        self.expired_tokens = set()
+
+    def put(self, event):
+        """Add or change an event, it is returned by the next incremental sync"""
+        self.sequence += 1
+        self.events[event["id"]] = {**event, "_sequence": self.sequence}
+
+    def add_events(self, count, start=None, hours_apart=3):
+        """Add `count` 45 minute events (every 50th one a 3 day all-day event) starting at `start`"""
+        start = start or datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        for index in range(count):
+            begins = start + timedelta(hours=hours_apart * index)
+            event = {
+                "id": f"e{index}",
+                "status": "confirmed",
+                "summary": f"Meeting {index}",
+                "description": f"Agenda {index}",
+                "start": {"dateTime": rfc3339(begins)},
+                "end": {"dateTime": rfc3339(begins + timedelta(minutes=45))}
+            }
+            if index % 50 == 0:
+                event["start"] = {"date": begins.date().isoformat()}
+                event["end"] = {"date": (begins.date() + timedelta(days=3)).isoformat()}
+            self.put(event)
+
+    def cancel(self, event_id):
+        self.put({**self.events[event_id], "status": "cancelled"})
+
+    def expire_sync_tokens(self):
+        """Make every sync token given so far answer 410 Gone"""
+        self.expired_tokens.update(f"s-{sequence}" for sequence in range(self.sequence + 1))
+
+    def _hit(self, request, method):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        self.connections.add(request.client.port)
+
+    def _page(self, events, page_token):
+        start = int(page_token or 0)
+        page = {"items": [
+            {key: value for key, value in event.items() if key != "_sequence"}
+            for event in events[start:start + PAGE_SIZE]
+        ]}
+        if start + PAGE_SIZE < len(events):
+            page["nextPageToken"] = str(start + PAGE_SIZE)
+        else:
+            page["nextSyncToken"] = f"s-{self.sequence}"
+        return page
+
+    def _create_app(self):
+        from fastapi import FastAPI, Request
+        app = FastAPI()
+
+        @app.get("/calendar/v3/calendars/primary/events")
+        async def list_events(request: Request):
+            self._hit(request, "list")
+            query = request.query_params
+            if "syncToken" in query:
+                if query["syncToken"] in self.expired_tokens:
+                    return error(410, "Sync token is no longer valid, a full sync is required.")
+                since = int(query["syncToken"].split("-")[1])
+                events = sorted(
+                    (event for event in self.events.values() if event["_sequence"] > since),
+                    key=lambda event: event["_sequence"]
+                )
+            else:
+                events = [event for event in self.events.values() if event["status"] != "cancelled"]
+                if "timeMin" in query:
+                    time_min = datetime.fromisoformat(query["timeMin"]).timestamp()
+                    events = [event for event in events if _timestamp(event["end"]) > time_min]
+                if "timeMax" in query:
+                    time_max = datetime.fromisoformat(query["timeMax"]).timestamp()
+                    events = [event for event in events if _timestamp(event["start"]) < time_max]
+                events.sort(key=lambda event: _timestamp(event["start"]))
+            return self._page(events, query.get("pageToken"))
+
+        @app.post("/calendar/v3/calendars/primary/events")
+        async def insert_event(request: Request):
+            self._hit(request, "insert")
+            event = {**await request.json(), "id": uuid.uuid4().hex, "status": "confirmed"}
+            self.put(event)
+            return {key: value for key, value in event.items() if key != "_sequence"}
+
+        return app
@@ -0,0 +1,76 @@
+import time
+import asyncio
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatResult, ChatGeneration
+
+# Model of the manager agent, see PersonalAssistant
+MANAGER_MODEL = "openai/gpt-4o"
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model answering like the real agents would, after `latency` seconds:
+    the manager delegates the last user message to `delegate_to` and then returns
+    what the sub-agent answered, sub-agents answer straight away.
+    """
+    role: str = "sub"
+    latency: float = 0.0
+    delegate_to: str = "calendar_agent"
+
+    @property
+    def _llm_type(self):
+        return "fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _reply(self, messages):
+        human = [message for message in messages if isinstance(message, HumanMessage)][-1].content
+        if self.role == "manager":
+            if isinstance(messages[-1], ToolMessage):
+                return AIMessage(content=f"ANSWER {messages[-1].content}")
+            return AIMessage(content="", tool_calls=[{
+                "name": "SendMessage",
+                "args": {"recipient": self.delegate_to, "message": human},
+                "id": "call_1"
+            }])
+        return AIMessage(content=f"sub-agent saw: {human.splitlines()[0]}")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+
+def install_fake_llms(latency=0.0):
+    """Make every agent use a FakeChatModel instead of calling an LLM provider"""
+    import src.agents.base.agent as agent_module
+
+    def get_fake_llm(model, temperature=0.1):
+        return FakeChatModel(role="manager" if model == MANAGER_MODEL else "sub", latency=latency)
+
+    agent_module.get_llm_by_provider = get_fake_llm
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model returning the given replies in order, one per call (e.g. a manager delegating twice)"""
+    replies: list = []
+
+    @property
+    def _llm_type(self):
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=self.replies.pop(0))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self._generate(messages, stop, run_manager, **kwargs)
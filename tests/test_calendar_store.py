@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+
+import src.calendar_store
+from src.calendar_store import CalendarStore
+from src.metrics import metrics
+from src.tools.calendar import add_event_to_calendar, get_calendar_events
+from tests.fakes.google_calendar import rfc3339
+
+# Midnight (UTC) of a day in a week, the events of the tests are on that day
+DAY = (datetime.now(timezone.utc) + timedelta(days=7)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def at(hour, days=0):
+    return DAY + timedelta(days=days, hours=hour)
+
+
+def timed(event_id, start, end, summary=None, description=None):
+    event = {
+        "id": event_id,
+        "status": "confirmed",
+        "summary": summary or event_id.title(),
+        "start": {"dateTime": rfc3339(start)},
+        "end": {"dateTime": rfc3339(end)}
+    }
+    if description is not None:
+        event["description"] = description
+    return event
+
+
+def all_day(event_id, first_day, days):
+    return {
+        "id": event_id,
+        "status": "confirmed",
+        "summary": event_id.title(),
+        "start": {"date": first_day.date().isoformat()},
+        "end": {"date": (first_day + timedelta(days=days)).date().isoformat()}
+    }
+
+
+def ids(events):
+    return [event["id"] for event in events]
+
+
+@pytest.fixture
+def store(calendar, tmp_path):
+    store = CalendarStore(path=str(tmp_path / "calendar.sqlite"), days=30, sync_interval=60)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def tools_store(store, monkeypatch):
+    """The store, used by the GetCalendarEvents and AddEventToCalendar tools"""
+    monkeypatch.setenv("CALENDAR_STORE", "true")
+    monkeypatch.setattr(src.calendar_store, "_calendar_store", store)
+    return store
+
+
+def test_query_returns_the_events_overlapping_the_range(calendar, store):
+    calendar.put(timed("standup", at(9), at(9.25), description="Daily"))
+    calendar.put(timed("review", at(14), at(15), description="Budget"))
+    calendar.put(timed("late", at(23), at(1, days=1), description="Release"))
+    # Started two days before the range and still going on
+    calendar.put(all_day("offsite", DAY - timedelta(days=2), days=3))
+    calendar.put(all_day("past_offsite", DAY - timedelta(days=4), days=2))
+    calendar.put(timed("tomorrow", at(9, days=1), at(10, days=1)))
+
+    assert store.sync() == 6
+    assert store.covers(DAY.timestamp())
+
+    afternoon = store.query(at(12).timestamp(), at(24).timestamp())
+    assert ids(afternoon) == ["offsite", "review", "late"]
+    assert afternoon[0]["start"] == (DAY - timedelta(days=2)).date().isoformat()
+    # The store keeps the duration of its longest event to look back far enough
+    assert store._get_state("longest") == str(float(3 * 24 * 3600))
+    assert ids(store.query(at(9.5).timestamp(), at(10).timestamp())) == ["offsite"]
+
+
+def test_incremental_sync_applies_changes_and_deletes_cancelled_events(calendar, store):
+    calendar.put(timed("standup", at(9), at(9.25)))
+    calendar.put(timed("review", at(14), at(15)))
+    store.sync()
+    calendar.calls.clear()
+
+    calendar.cancel("standup")
+    calendar.put(timed("review", at(16), at(17), summary="Moved review"))
+    assert store.sync() == 2
+    assert calendar.calls == {"list": 1}
+
+    events = store.query(DAY.timestamp(), at(24).timestamp())
+    assert [(event["id"], event["summary"]) for event in events] == [("review", "Moved review")]
+    assert store.stats()["events"] == 1
+
+
+def test_expired_sync_token_triggers_a_full_sync(calendar, store):
+    calendar.put(timed("standup", at(9), at(9.25)))
+    store.sync()
+    full_syncs = metrics.snapshot()["counters"]["calendar_store.full_syncs"]
+
+    calendar.expire_sync_tokens()
+    calendar.cancel("standup")
+    calendar.put(timed("review", at(14), at(15)))
+    calendar.calls.clear()
+
+    assert store.sync() == 1
+    # The incremental list answered 410 Gone, then the events were listed again
+    assert calendar.calls == {"list": 2}
+    assert metrics.snapshot()["counters"]["calendar_store.full_syncs"] == full_syncs + 1
+    assert ids(store.query(DAY.timestamp(), at(24).timestamp())) == ["review"]
+    assert store.sync_token == f"s-{calendar.sequence}"
+
+
+def test_created_events_are_written_through_before_the_next_sync(calendar, tools_store):
+    tools_store.sync()
+
+    answer = add_event_to_calendar.invoke({
+        "title": "Dentist",
+        "description": "Check-up",
+        "start_time": at(10).strftime("%Y-%m-%d %H:%M")
+    })
+
+    assert answer.startswith("SUCCESS")
+    events = tools_store.query(DAY.timestamp(), at(24).timestamp())
+    assert [(event["summary"], event["description"]) for event in events] == [("Dentist", "Check-up")]
+    # The next sync gets it again and keeps a single copy
+    assert tools_store.sync() == 1
+    assert tools_store.stats()["events"] == 1
+
+
+def test_tool_answers_from_the_store_and_notes_when_it_is_stale(calendar, tools_store):
+    calendar.put(timed("lunch", at(12), at(13)))
+    tools_store.sync()
+    calendar.calls.clear()
+    range_ = {"start_date": DAY.date().isoformat(), "end_date": (DAY + timedelta(days=1)).date().isoformat()}
+
+    # An event without a description is shown with an empty one
+    assert get_calendar_events.invoke(range_) == f"Event: Lunch, Description: , Start: {rfc3339(at(12))}"
+    assert calendar.calls == {}
+    assert tools_store.staleness_note() is None
+
+    # The background sync failed for 5 intervals
+    with tools_store.conn:
+        tools_store.conn.execute(
+            "UPDATE sync_state SET value = ? WHERE key = 'synced_at'",
+            (str(datetime.now(timezone.utc).timestamp() - 5 * 60),)
+        )
+    note = "Note: calendar last synced 5 minutes ago, recent changes may be missing."
+    assert tools_store.staleness_note() == note
+    assert get_calendar_events.invoke(range_).splitlines()[-1] == note
+    assert metrics.snapshot()["gauges"]["calendar_store.sync_lag_seconds"] >= 300
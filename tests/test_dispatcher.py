@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+
+import src.channels.dispatcher as dispatcher_module
+from src.channels.dispatcher import OutboundDispatcher, TokenBucket, split_message
+
+
+class Clock:
+    """Replaces the time module of the dispatcher: sleeping moves the clock forward"""
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(dispatcher_module, "time", clock)
+    return clock
+
+
+def test_token_bucket_allows_a_burst_then_spaces_the_sends(clock):
+    bucket = TokenBucket(rate=2.0, capacity=3)
+
+    assert [bucket._reserve() for _ in range(5)] == [0.0, 0.0, 0.0, 0.5, 1.0]
+    # Reserved tokens are paid back before new ones are available
+    clock.now += 1.0
+    assert bucket._reserve() == 0.5
+    # Idle time refills the bucket up to its capacity only
+    clock.now += 60
+    assert [bucket._reserve() for _ in range(4)] == [0.0, 0.0, 0.0, 0.5]
+
+
+def test_token_bucket_wait_sleeps_for_the_missing_token(clock):
+    bucket = TokenBucket(rate=1.0, capacity=1)
+    bucket.wait()
+    bucket.wait()
+    assert clock.slept == [1.0]
+
+
+def test_split_message_prefers_paragraphs_then_lines_then_words():
+    assert split_message("short", 10) == ["short"]
+    assert split_message("first paragraph\n\nsecond one", 20) == ["first paragraph", "second one"]
+    assert split_message("line one\nline two here", 16) == ["line one", "line two here"]
+    # The window holds the separator, a word ending at the limit goes to the next chunk
+    assert split_message("several words in one long line", 13) == ["several", "words in one", "long line"]
+    assert split_message("several words in one long line", 12) == ["several", "words in", "one long", "line"]
+    # A word longer than the limit is cut
+    assert split_message("abcdefghij", 4) == ["abcd", "efgh", "ij"]
+    assert all(len(chunk) <= 4000 for chunk in split_message(("word " * 300 + "\n") * 10, 4000))
+
+
+def test_dispatch_sends_the_chunks_in_order(clock):
+    sent = []
+
+    async def send(text, sender=None):
+        sent.append((sender, text))
+
+    dispatcher = OutboundDispatcher()
+    dispatcher.register("telegram", send, max_chars=13, rate=1.0, burst=3)
+    dispatcher.register("whatsapp", lambda text, sender=None: sent.append(("sync", text)))
+    asyncio.run(dispatcher.dispatch("telegram", "several words in one long line", sender="42"))
+
+    assert sent == [("42", "several"), ("42", "words in one"), ("42", "long line")]
+    assert dispatcher.channels["telegram"]["bucket"].tokens == 0
+    assert dispatcher.dispatch_sync("whatsapp", "hello") == [None]
+    assert sent[-1] == ("sync", "hello")
@@ -0,0 +1,179 @@
+import time
+import pytest
+
+import src.gmail_mirror
+from src.gmail_mirror import GmailMirror
+from src.metrics import metrics
+from src.tools.email import read_emails, search_emails
+
+DAY = 24 * 3600
+
+
+@pytest.fixture
+def mirror(gmail, tmp_path):
+    mirror = GmailMirror(path=str(tmp_path / "gmail.sqlite"), days=2)
+    yield mirror
+    mirror.close()
+
+
+@pytest.fixture
+def tools_mirror(mirror, monkeypatch):
+    """The mirror, used by the ReadEmails and SearchEmails tools"""
+    monkeypatch.setenv("GMAIL_MIRROR", "true")
+    monkeypatch.setattr(src.gmail_mirror, "_gmail_mirror", mirror)
+    return mirror
+
+
+def ids(messages):
+    return sorted(message["id"] for message in messages)
+
+
+def test_full_sync_copies_the_recent_messages(gmail, mirror):
+    gmail.add_messages(5)
+    assert not mirror.ready
+    assert mirror.sync() == 5
+    assert mirror.ready
+    assert mirror.history_id == str(gmail.history_id)
+    assert mirror.stats()["messages"] == 5
+    assert gmail.calls == {"profile": 1, "list": 1, "batch": 1, "get": 5}
+
+
+def test_search_matches_every_word(gmail, mirror):
+    gmail.add_messages(10)
+    mirror.sync()
+    assert ids(mirror.search("budget")) == ["m3", "m8"]
+    assert ids(mirror.search("budget 8")) == ["m8"]
+    assert ids(mirror.search("person1")) == ["m1", "m8"]
+    # FTS5 operators in the text are searched as words
+    assert mirror.search("budget OR launch") == []
+
+
+def test_incremental_sync_applies_the_history(gmail, mirror):
+    gmail.add_messages(5)
+    mirror.sync()
+    gmail.history_page_size = 2
+    gmail.add("new1", "Quarterly budget", "Boss <boss@example.com>", "Numbers for the quarter")
+    gmail.add("new2", "Lunch", "Friend <friend@example.com>", "Are you free?")
+    gmail.delete("m3")
+    gmail.add("gone", "Spam", "Spammer <spam@example.com>", "Deleted right away")
+    gmail.delete("gone")
+    gmail.calls.clear()
+
+    assert mirror.sync() == 4
+    assert gmail.calls.get("profile") is None and gmail.calls.get("list") is None
+    assert gmail.calls["history"] == 3
+    # Only the messages still there are fetched
+    assert gmail.calls["get"] == 2
+    assert ids(mirror.search("budget")) == ["new1"]
+    assert mirror.history_id == str(gmail.history_id)
+    assert mirror.stats()["messages"] == 6
+
+
+def test_expired_history_syncs_again(gmail, mirror):
+    gmail.add_messages(3)
+    mirror.sync()
+    gmail.delete("m0")
+    gmail.add("new", "Invoice", "Shop <shop@example.com>", "Your order")
+    gmail.expire_history()
+    gmail.calls.clear()
+
+    assert mirror.sync() == 3
+    assert gmail.calls["history"] == 1 and gmail.calls["profile"] == 1
+    assert ids(mirror.query(0, 2 ** 32)) == ["m1", "m2", "new"]
+
+
+def test_covers_the_window_of_the_full_sync(gmail, mirror):
+    gmail.add_messages(5)
+    assert not mirror.covers(time.time() - DAY)
+    mirror.sync()
+    assert mirror.covers(time.time() - DAY)
+    assert not mirror.covers(time.time() - 3 * DAY)
+    assert not mirror.covers(None)
+
+
+def test_capped_full_sync_covers_from_the_oldest_message_kept(gmail, tmp_path):
+    gmail.add_messages(5)
+    mirror = GmailMirror(path=str(tmp_path / "capped.sqlite"), days=2, max_messages=3)
+    mirror.sync()
+    oldest_kept = int(gmail.messages["m2"]["internalDate"]) / 1000
+    assert mirror.stats()["messages"] == 3
+    assert mirror.covers(oldest_kept + 1)
+    assert not mirror.covers(oldest_kept - 60)
+    mirror.close()
+
+
+def read(days, email=None):
+    since = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(time.time() - days * DAY))
+    until = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(time.time() + 60))
+    return read_emails.invoke({"from_date": since, "to_date": until, "email": email})
+
+
+def test_read_emails_uses_the_mirror_only_inside_its_window(gmail, tools_mirror):
+    gmail.add_messages(5)
+    gmail.add("old", "Old invoice", "Shop <shop@example.com>", "From last week", internal_date=int((time.time() - 7 * DAY) * 1000))
+    tools_mirror.sync()
+    gmail.calls.clear()
+
+    answer = read(1)
+    assert "Launch 4" in answer and "Old invoice" not in answer
+    assert gmail.calls == {}
+
+    # Before the mirrored window: read through the API
+    answer = read(10)
+    assert "Old invoice" in answer and "Launch 4" in answer
+    assert gmail.calls["list"] == 1
+
+
+def test_search_emails_falls_back_to_the_api_beyond_the_window(gmail, tools_mirror):
+    gmail.add_messages(10)
+    gmail.add("old", "Old budget", "Shop <shop@example.com>", "From last week", internal_date=int((time.time() - 7 * DAY) * 1000))
+    tools_mirror.sync()
+    gmail.calls.clear()
+
+    # Enough matches among the mirrored emails
+    answer = search_emails.invoke({"query": "budget", "max_results": 2})
+    assert "Budget 3" in answer and "Budget 8" in answer
+    assert gmail.calls == {}
+
+    # A search reaching into the mirrored window only
+    since = time.strftime("%Y-%m-%d", time.localtime(time.time() - DAY))
+    answer = search_emails.invoke({"query": "budget", "max_results": 10, "from_date": since})
+    assert "Old budget" not in answer and gmail.calls == {}
+
+    # Fewer matches than asked: older emails may match too
+    answer = search_emails.invoke({"query": "budget", "max_results": 10})
+    assert "Old budget" in answer and "Budget 3" in answer
+    assert gmail.calls["list"] == 1
+
+
+def test_trash_and_spam_leave_the_mirror_until_restored(gmail, mirror):
+    gmail.add_messages(5)
+    gmail.add("spam", "Budget offer", "Spammer <spam@example.com>", "Win money", labels=["SPAM"])
+    mirror.sync()
+    assert ids(mirror.search("budget")) == ["m3"]
+
+    gmail.label("m3", add=["TRASH"], remove=["INBOX"])
+    gmail.label("m1", add=["SPAM"])
+    gmail.label("m1", remove=["SPAM"])
+    gmail.add("new", "Budget review", "Boss <boss@example.com>", "Please check", labels=["SPAM"])
+    mirror.sync()
+    assert ids(mirror.search("budget")) == []
+    assert "m1" in ids(mirror.query(0, 2 ** 32))
+
+    # Restored from the trash
+    gmail.label("m3", add=["INBOX"], remove=["TRASH"])
+    mirror.sync()
+    assert ids(mirror.search("budget")) == ["m3"]
+
+
+def test_sync_lag_is_read_when_the_metrics_are(gmail, mirror, monkeypatch):
+    gmail.add_messages(2)
+    mirror.sync()
+    lag = metrics.snapshot()["gauges"]["gmail_mirror.sync_lag_seconds"]
+    assert 0 <= lag < 5
+    # No sync since, the lag keeps growing
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 600)
+    assert metrics.snapshot()["gauges"]["gmail_mirror.sync_lag_seconds"] >= 600
+    mirror.close()
+    assert "gmail_mirror.sync_lag_seconds" not in metrics.snapshot()["gauges"]
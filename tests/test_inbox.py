@@ -0,0 +1,117 @@
+import pytest
+
+import src.inbox as inbox_module
+from src.inbox import Inbox, coalesce
+
+
+class Clock:
+    """Replaces the time module of src.inbox, the tests move it forward"""
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(inbox_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def inbox(tmp_path, clock):
+    inbox = Inbox(str(tmp_path / "inbox.sqlite"), max_attempts=3, visibility_timeout=60)
+    yield inbox
+    inbox.close()
+
+
+def message(text):
+    return {"text": text, "date": "2026-10-17 09:00"}
+
+
+def status(inbox, item_id):
+    return inbox.conn.execute("SELECT status FROM inbox WHERE id = ?", (item_id,)).fetchone()[0]
+
+
+def test_redeliveries_are_ignored_and_items_are_claimed_oldest_first(inbox):
+    assert inbox.enqueue_many("telegram", [(1, message("first"), "a"), (2, message("second"), "b")]) == 2
+    # Redelivered by the channel, in the same or another batch
+    assert inbox.enqueue_many("telegram", [(1, message("first"), "a"), (3, message("third"), "a")]) == 1
+    assert not inbox.enqueue("telegram", 2, message("second"), "b")
+    # The same id on another channel is another message
+    assert inbox.enqueue("slack", 1, message("other channel"), "c")
+
+    first = inbox.claim("telegram")
+    assert [item["payload"]["text"] for item in first] == ["first"]
+    assert first[0]["attempts"] == 1
+    assert [item["payload"]["text"] for item in inbox.claim("telegram", limit=5)] == ["second", "third"]
+    assert inbox.claim("telegram") == []
+    assert inbox.pending_count("telegram") == 3
+
+    inbox.ack([item["id"] for item in first])
+    assert inbox.pending_count("telegram") == 2
+
+
+def test_unacked_items_are_claimed_again_after_the_visibility_timeout_unless_excluded(inbox, clock):
+    inbox.enqueue("telegram", 1, message("slow"), "a")
+    inbox.enqueue("telegram", 2, message("lost"), "b")
+    slow, lost = inbox.claim("telegram", limit=2)
+
+    clock.now += 59
+    assert inbox.claim("telegram", limit=2) == []
+
+    # The process still working on `slow` excludes it, `lost` was claimed by a process that died
+    clock.now += 2
+    reclaimed = inbox.claim("telegram", limit=2, exclude=[slow["id"]])
+    assert [item["id"] for item in reclaimed] == [lost["id"]]
+    assert reclaimed[0]["attempts"] == 2
+
+
+def test_failed_turns_are_retried_with_backoff_then_marked_failed(inbox, clock):
+    inbox.enqueue("telegram", 1, message("hello"), "a")
+
+    for attempt in (1, 2):
+        item, = inbox.claim("telegram")
+        assert item["attempts"] == attempt
+        assert inbox.retry(item)
+        assert status(inbox, item["id"]) == "pending"
+        # Pending again after 2 ** attempts seconds
+        clock.now += 2 ** attempt - 1
+        assert inbox.claim("telegram") == []
+        clock.now += 1
+
+    item, = inbox.claim("telegram")
+    assert item["attempts"] == 3
+    assert not inbox.retry(item)
+    assert status(inbox, item["id"]) == "failed"
+    clock.now += 3600
+    assert inbox.claim("telegram") == []
+    assert inbox.pending_count("telegram") == 0
+
+
+def test_release_claimed_makes_the_items_of_a_previous_run_pending(inbox):
+    inbox.enqueue_many("telegram", [(1, message("one"), "a"), (2, message("two"), "b")])
+    inbox.enqueue("slack", 1, message("three"), "c")
+    claimed = inbox.claim("telegram", limit=2) + inbox.claim("slack")
+
+    assert inbox.release_claimed("telegram") == 2
+    assert [status(inbox, item["id"]) for item in claimed] == ["pending", "pending", "claimed"]
+    assert [item["payload"]["text"] for item in inbox.claim("telegram", limit=2)] == ["one", "two"]
+
+
+def test_messages_of_a_quiet_sender_are_claimed_and_coalesced_together(inbox, clock):
+    inbox.enqueue("telegram", 1, message("Hi"), "a")
+    clock.now += 1
+    inbox.enqueue("telegram", 2, message("other sender"), "b")
+    clock.now += 1
+    inbox.enqueue("telegram", 3, {"text": "are you free tomorrow?", "date": "2026-10-17 09:02"}, "a")
+
+    # "a" is still typing
+    assert inbox.claim_conversation("telegram", debounce=2) == []
+    clock.now += 2
+    items = inbox.claim_conversation("telegram", debounce=2)
+    assert [item["external_id"] for item in items] == ["1", "3"]
+    assert coalesce(items) == {"text": "Hi\nare you free tomorrow?", "date": "2026-10-17 09:02"}
+    assert [item["sender"] for item in inbox.claim_conversation("telegram", debounce=2)] == ["b"]
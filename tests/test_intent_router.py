@@ -0,0 +1,64 @@
+import pytest
+
+from src.agents.base import IntentRouter, IntentRule
+from src.agents.personal_assistant import FAST_PATH_RULES
+from src.metrics import metrics
+
+
+@pytest.fixture
+def router():
+    return IntentRouter(FAST_PATH_RULES)
+
+
+@pytest.mark.parametrize("message, agent_name", [
+    ("What's on my calendar today?", "calendar_agent"),
+    ("Do I have any meetings tomorrow", "calendar_agent"),
+    ("Show my tasks", "notion_agent"),
+    ("Check my inbox", "email_agent"),
+    ("Any new slack messages?", "slack_agent"),
+    # Channels add the date after the text, only the text is routed on
+    ("Message: show my to-do list\nCurrent Date/time: 2026-10-17 09:00 and more", "notion_agent"),
+])
+def test_unambiguous_reads_go_to_their_agent(router, message, agent_name):
+    assert router.route(message) == agent_name
+
+
+@pytest.mark.parametrize("message", [
+    # Writes are excluded from the read-only rules
+    "Add a meeting to my calendar for Friday",
+    "Cancel the events on Monday",
+    "Schedule a meeting with Anna",
+    "Add a task to buy milk",
+    "Send an email to my inbox contacts",
+    "Reply to the last mail",
+    "Post the summary on slack",
+])
+def test_writes_are_left_to_the_manager(router, message):
+    assert router.route(message) is None
+
+
+@pytest.mark.parametrize("message", [
+    "Check my email and show my calendar",
+    "Show my calendar, then list my tasks",
+    "List my meetings; check my inbox",
+    "Read my emails as well",
+])
+def test_multi_intent_messages_are_left_to_the_manager(router, message):
+    assert router.route(message) is None
+
+
+def test_messages_matching_several_agents_are_left_to_the_manager(router):
+    assert router.route("Show my calendar events from my emails") is None
+    assert router.route("Tell me a joke") is None
+
+
+def test_stats_count_hits_and_misses():
+    counters = metrics.snapshot()["counters"]
+    hits, misses = counters.get("router.hits", 0), counters.get("router.misses", 0)
+    router = IntentRouter([IntentRule("calendar_agent", [r"\bcalendar\b"])], multi_intent_patterns=[])
+
+    assert router.route("calendar and more") == "calendar_agent"
+    assert router.route("inbox") is None
+
+    counters = metrics.snapshot()["counters"]
+    assert (counters["router.hits"], counters["router.misses"]) == (hits + 1, misses + 1)
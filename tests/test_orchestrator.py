@@ -0,0 +1,148 @@
+import time
+import asyncio
+import threading
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.agents.base import Agent, AgentsOrchestrator, PassThroughPolicy
+from src.deadline import DeadlineExceeded
+from src.metrics import metrics
+from tests.fakes.llm import FakeChatModel, ScriptedChatModel
+
+# Guards the counters of CountingChatModel, shared by the tool call threads
+counter_lock = threading.Lock()
+
+MESSAGE = "Find the invoice email and put the payment date in my calendar"
+
+
+def delegate(*calls):
+    """Manager reply sending one SendMessage per (recipient, message)"""
+    return AIMessage(content="", tool_calls=[
+        {"name": "SendMessage", "args": {"recipient": recipient, "message": message}, "id": f"call_{index}"}
+        for index, (recipient, message) in enumerate(calls)
+    ])
+
+
+class CountingChatModel(FakeChatModel):
+    """Sub-agent model recording how many of its calls run at the same time"""
+    active: list = [0]
+    peak: list = [0]
+
+    def _enter(self):
+        with counter_lock:
+            self.active[0] += 1
+            self.peak[0] = max(self.peak[0], self.active[0])
+
+    def _leave(self):
+        with counter_lock:
+            self.active[0] -= 1
+
+    def _generate(self, *args, **kwargs):
+        self._enter()
+        try:
+            return super()._generate(*args, **kwargs)
+        finally:
+            self._leave()
+
+    async def _agenerate(self, *args, **kwargs):
+        self._enter()
+        try:
+            return await super()._agenerate(*args, **kwargs)
+        finally:
+            self._leave()
+
+
+@pytest.fixture
+def build(monkeypatch):
+    """Build an orchestrator whose manager returns the given replies, over email_agent and calendar_agent"""
+    import src.agents.base.agent as agent_module
+    # Sub-agents without tools share a compiled graph, compile them with this test's models
+    monkeypatch.setattr(agent_module, "_compiled_agents", {})
+
+    def build_orchestrator(replies, sub_model=None, sub_tools=(), **kwargs):
+        manager_model = ScriptedChatModel(replies=list(replies))
+        sub_model = sub_model or FakeChatModel(role="sub")
+        monkeypatch.setattr(
+            agent_module, "get_llm_by_provider",
+            lambda model, temperature=0.1: manager_model if model == "test/manager" else sub_model
+        )
+
+        def sub_agent(name):
+            return Agent(name, f"{name} description", "Sub-agent", list(sub_tools), [], "test/sub", 0.0)
+
+        email_agent, calendar_agent = sub_agent("email_agent"), sub_agent("calendar_agent")
+        saver = MemorySaver()
+        manager = Agent(
+            "manager_agent", "Manager", "Manager", [], [email_agent, calendar_agent], "test/manager", 0.0,
+            memory=saver, async_memory=saver
+        )
+        return AgentsOrchestrator(main_agent=manager, agents=[manager, email_agent, calendar_agent], **kwargs)
+
+    return build_orchestrator
+
+
+def run(orchestrator, message, config, use_async):
+    if use_async:
+        return asyncio.run(orchestrator.ainvoke(message, config=config))
+    return orchestrator.invoke(message, config=config)
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_manager_delegating_twice_answers_with_its_final_message(build, use_async):
+    orchestrator = build([
+        delegate(("email_agent", "Find the invoice email")),
+        delegate(("calendar_agent", "Add the payment on 2026-10-20")),
+        AIMessage(content="The invoice is due on 2026-10-20, I added it to your calendar.")
+    ], pass_through=PassThroughPolicy())
+    config = {"configurable": {"thread_id": f"two-delegations-{use_async}"}}
+
+    # The multi-step request is not passed through, the manager is resumed and delegates again
+    answer = run(orchestrator, MESSAGE, config, use_async)
+
+    assert answer == "The invoice is due on 2026-10-20, I added it to your calendar."
+    messages = orchestrator.main_agent.agent.get_state(config).values["messages"]
+    assert [message.content for message in messages if message.type == "tool"] == [
+        "sub-agent saw: Find the invoice email",
+        "sub-agent saw: Add the payment on 2026-10-20"
+    ]
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+@pytest.mark.parametrize("max_parallel_tool_calls", [1, 2])
+def test_tool_calls_of_a_turn_run_at_most_max_parallel_tool_calls_at_a_time(build, use_async, max_parallel_tool_calls):
+    sub_model = CountingChatModel(role="sub", latency=0.05, active=[0], peak=[0])
+    orchestrator = build([
+        delegate(*[("email_agent", f"Find email {index}") for index in range(4)]),
+        AIMessage(content="Found them")
+    ], sub_model=sub_model, max_parallel_tool_calls=max_parallel_tool_calls)
+    config = {"configurable": {"thread_id": f"fan-out-{use_async}-{max_parallel_tool_calls}"}}
+    timed_before = metrics.snapshot()["timings"].get("tool_call.email_agent", {}).get("count", 0)
+
+    assert run(orchestrator, "Find my four emails", config, use_async) == "Found them"
+    assert sub_model.peak[0] == max_parallel_tool_calls
+    assert metrics.snapshot()["timings"]["tool_call.email_agent"]["count"] == timed_before + 4
+
+
+@tool
+def read_inbox() -> str:
+    """Read the inbox"""
+    raise DeadlineExceeded("ReadInbox")
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_deadline_passed_in_a_tool_stops_the_turn(build, use_async):
+    sub_model = ScriptedChatModel(replies=[
+        AIMessage(content="", tool_calls=[{"name": "read_inbox", "args": {}, "id": "call_read"}]),
+        AIMessage(content="The inbox could not be read")
+    ])
+    orchestrator = build([
+        delegate(("email_agent", "Read my inbox")),
+        AIMessage(content="Sorry, the inbox could not be read")
+    ], sub_model=sub_model, sub_tools=[read_inbox])
+    config = {"configurable": {"thread_id": f"deadline-{use_async}"}}
+
+    # Neither the sub-agent nor the manager is asked to answer after the deadline
+    assert run(orchestrator, "Read my inbox", config, use_async) == "Sorry, I ran out of time before finishing your request."
+    assert len(sub_model.replies) == 1
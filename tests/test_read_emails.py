@@ -0,0 +1,44 @@
+import time
+
+from src.tools.email.read_emails import read_emails, BATCH_RETRIES
+
+
+def read_last_days(days=2):
+    today = time.strftime("%Y-%m-%d", time.localtime(time.time() + 24 * 3600))
+    since = time.strftime("%Y-%m-%d", time.localtime(time.time() - days * 24 * 3600))
+    return read_emails.invoke({"from_date": since, "to_date": today, "email": None})
+
+
+def test_reads_every_email_with_batch_requests(gmail):
+    gmail.add_messages(5)
+    answer = read_last_days()
+    assert all(f"Subject: {subject}" in answer for subject in ["Invoice 0", "Meeting 1", "Launch 4"])
+    assert gmail.calls == {"list": 1, "batch": 1, "get": 5}
+    assert "Note:" not in answer
+
+
+def test_retries_rate_limited_and_server_errors(gmail):
+    gmail.add_messages(5)
+    gmail.failures = {"m1": [429], "m3": [503, 500]}
+    answer = read_last_days()
+    assert "Meeting 1" in answer and "Budget 3" in answer
+    assert gmail.calls["batch"] == 3
+    assert "Note:" not in answer
+
+
+def test_notes_the_emails_that_still_cant_be_read(gmail):
+    gmail.add_messages(5)
+    gmail.failures = {"m2": [503] * (BATCH_RETRIES + 1)}
+    answer = read_last_days()
+    assert "Vacation 2" not in answer and "Invoice 0" in answer
+    assert answer.endswith("Note: 1 email(s) couldn't be read because of Gmail errors, they are missing from this list.")
+
+
+def test_does_not_retry_deleted_emails(gmail):
+    gmail.add_messages(3)
+    gmail.failures = {"m0": [404], "m1": [403]}
+    answer = read_last_days()
+    assert "Invoice 0" not in answer and "Meeting 1" not in answer and "Vacation 2" in answer
+    assert gmail.calls["batch"] == 1
+    # The deleted email is just gone, the one refused can't be read
+    assert "Note: 1 email(s)" in answer
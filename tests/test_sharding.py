@@ -0,0 +1,54 @@
+import asyncio
+
+from src.sharding import HashRing, WakeupSocket, launched_worker_processes, notify_worker
+
+KEYS = [f"whatsapp:+3360000{index:04d}" for index in range(2000)]
+
+
+def test_keys_are_spread_over_the_workers_and_always_map_the_same():
+    ring = HashRing(range(4))
+    owners = [ring.get(key) for key in KEYS]
+
+    # Another process builds the same ring
+    rebuilt = HashRing(range(4))
+    assert owners == [rebuilt.get(key) for key in KEYS]
+    for worker in range(4):
+        assert 300 < owners.count(worker) < 700
+
+
+def test_adding_a_worker_only_moves_keys_to_it():
+    before = HashRing(range(4))
+    after = HashRing(range(5))
+
+    moved = [key for key in KEYS if before.get(key) != after.get(key)]
+    assert all(after.get(key) == 4 for key in moved)
+    # About a fifth of the conversations move to the new worker
+    assert 250 < len(moved) < 550
+
+
+def test_launched_worker_processes_only_counts_under_the_launcher(monkeypatch):
+    monkeypatch.setenv("WORKER_PROCESSES", "3")
+    monkeypatch.delenv("LAUNCHER", raising=False)
+    assert launched_worker_processes() == 0
+    monkeypatch.setenv("LAUNCHER", "1")
+    assert launched_worker_processes() == 3
+
+
+def test_notified_worker_wakes_up(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORKER_SOCKET_DIR", str(tmp_path))
+
+    async def main():
+        wakeup_socket = WakeupSocket(0)
+        wakeup_socket.bind()
+        try:
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.05, notify_worker, 0)
+            started = loop.time()
+            await wakeup_socket.wait(timeout=5)
+            return loop.time() - started
+        finally:
+            wakeup_socket.close()
+
+    assert asyncio.run(main()) < 1
+    # Notifying a worker that isn't listening is not an error
+    notify_worker(1)
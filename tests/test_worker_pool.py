@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+
+from src.worker_pool import KeyedWorkerPool, PoolClosed, QueueFull
+
+
+def test_items_of_a_key_run_one_at_a_time_in_order_and_keys_run_in_parallel():
+    log = []
+    active = {}
+
+    async def handler(key, index):
+        active[key] = active.get(key, 0) + 1
+        assert active[key] == 1, f"two items of {key} at once"
+        log.append(("start", key, index))
+        await asyncio.sleep(0.01 * (3 - index))
+        log.append(("end", key, index))
+        active[key] -= 1
+
+    async def main():
+        pool = KeyedWorkerPool(handler, workers=3, max_queue=10)
+        pool.start()
+        for index in range(3):
+            for key in ("alice", "bob"):
+                pool.submit(key, key, index)
+        while len(log) < 12:
+            await asyncio.sleep(0.005)
+        await pool.stop()
+
+    asyncio.run(main())
+
+    for key in ("alice", "bob"):
+        assert [(event, index) for event, k, index in log if k == key] == [
+            ("start", 0), ("end", 0), ("start", 1), ("end", 1), ("start", 2), ("end", 2)
+        ]
+    # bob's first item started before alice's first one ended
+    assert log.index(("start", "bob", 0)) < log.index(("end", "alice", 0))
+
+
+def test_submit_is_bounded_and_needs_running_workers():
+    async def main():
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def handler(index):
+            started.set()
+            await release.wait()
+
+        pool = KeyedWorkerPool(handler, workers=1, max_queue=2, name="test_pool")
+        with pytest.raises(PoolClosed):
+            pool.submit("alice", 0)
+
+        pool.start()
+        pool.submit("alice", 0)
+        await started.wait()
+        # The item being handled no longer counts, two more fit in the queue
+        pool.submit("alice", 1)
+        pool.submit("bob", 2)
+        with pytest.raises(QueueFull):
+            pool.submit("carol", 3)
+        assert pool.depth == 2
+
+        release.set()
+        while pool.pending:
+            await asyncio.sleep(0.005)
+        await pool.stop()
+        assert not pool.running
+
+    asyncio.run(main())
+
+
+def test_a_failing_item_does_not_block_its_key():
+    handled = []
+
+    async def handler(index):
+        if index == 0:
+            raise RuntimeError("boom")
+        handled.append(index)
+
+    async def main():
+        pool = KeyedWorkerPool(handler, workers=1, max_queue=5)
+        pool.start()
+        pool.submit("alice", 0)
+        pool.submit("alice", 1)
+        while len(handled) < 1:
+            await asyncio.sleep(0.005)
+        await pool.stop()
+        assert pool.pending == {}
+
+    asyncio.run(main())
+    assert handled == [1]